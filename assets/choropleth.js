@@ -0,0 +1,25 @@
+// Clientside callbacks for the choropleth map (registered in src/app.py)
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    choropleth: {
+        // Swap the map's values, hover data and title to another metric using
+        // choropleth-matrix-store; the colour range follows the new values.
+        // Without data for the current dataset, leave the map to update_choropleth
+        // by writing choropleth-fallback-store.
+        switch_metric: function (metric, matrix, dataset, figure) {
+            const noUpdate = window.dash_clientside.no_update;
+            if (!matrix || matrix.dataset !== dataset || !(metric in matrix.metrics) || !figure || !figure.data) {
+                return [noUpdate, noUpdate, noUpdate, noUpdate, {metric: metric, dataset: dataset, at: Date.now()}];
+            }
+
+            const values = matrix.metrics[metric];
+            const trace = Object.assign({}, figure.data[0], {
+                locations: matrix.countries,
+                hovertext: matrix.countries,
+                z: values,
+                customdata: matrix.countries.map((country, i) => [country, values[i], matrix.respondents[i]]),
+            });
+            const newFigure = Object.assign({}, figure, {data: [trace].concat(figure.data.slice(1))});
+            return [newFigure, metric, matrix.titles[metric], {display: "none"}, noUpdate];
+        }
+    }
+});
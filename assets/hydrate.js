@@ -0,0 +1,44 @@
+// Clientside callbacks for deferred chart hydration (registered in src/app.py)
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    hydrate: {
+        // Watch the charts whose ids are passed and, once one scrolls into view,
+        // write its id to its own <id>-visible-store, which has the server send
+        // that chart's figure. Each chart is reported once. Without
+        // IntersectionObserver, all charts are reported at once.
+        observe_charts: function (...ids) {
+            const report = (visible) => {
+                visible.forEach((id) => window.dash_clientside.set_props(`${id}-visible-store`, {data: id}));
+            };
+            if (!('IntersectionObserver' in window)) {
+                report(ids);
+                return window.dash_clientside.no_update;
+            }
+
+            const observer = new window.IntersectionObserver((entries) => {
+                const visible = entries.filter((entry) => entry.isIntersecting).map((entry) => entry.target.id);
+                visible.forEach((id) => observer.unobserve(document.getElementById(id)));
+                if (visible.length) {
+                    report(visible);
+                }
+            });
+
+            // The graphs may not be in the DOM yet when the page's first callbacks run
+            const watch = (remaining, attempts) => {
+                const missing = remaining.filter((id) => {
+                    const element = document.getElementById(id);
+                    if (element) {
+                        observer.observe(element);
+                    }
+                    return !element;
+                });
+                if (missing.length && attempts > 0) {
+                    window.setTimeout(() => watch(missing, attempts - 1), 100);
+                } else if (missing.length) {
+                    report(missing);
+                }
+            };
+            watch(ids, 50);
+            return window.dash_clientside.no_update;
+        }
+    }
+});
@@ -0,0 +1,234 @@
+"""
+Admission control for the data-heavy callbacks.
+
+With MHV_ADMISSION=1, at most MHV_ADMISSION_SLOTS heavy callbacks (those
+registered with heavy_callback()) run at once per worker process. Further ones
+wait in a queue of at most MHV_ADMISSION_QUEUE requests for up to
+MHV_ADMISSION_TIMEOUT_MS; beyond that they are shed with a fast
+"503 Service Unavailable" and a Retry-After header, which leaves the charts
+showing their previous figures. Cheap UI callbacks never wait for a slot, so as
+long as slots plus queue stay below the worker's threads they are always served.
+
+Slot usage, queue depth, wait times and shed counts are served at /_debug/admission
+(with MHV_DEBUG_TOKEN, see debug.py).
+"""
+import asyncio
+import json
+import math
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+import flask
+
+from . import config
+from .debug import add_debug_route
+
+# Wait times (ms) of the most recent admission decisions, for percentiles
+RECENT_WAITS = 1000
+
+_slots = None
+_lock = threading.Lock()
+
+# Current and highest number of requests waiting for a slot, and requests holding one
+_queued = 0
+_max_queued = 0
+_running = 0
+
+# Counters per callback name
+_callback_stats = {}
+_recent_waits = deque(maxlen=RECENT_WAITS)
+
+
+def _get_slots():
+    """Create the semaphore lazily, so the configured slot count is read at first use."""
+    global _slots
+    if _slots is None:
+        _slots = threading.BoundedSemaphore(config.ADMISSION_SLOTS)
+    return _slots
+
+
+def _record(name, outcome, wait_ms):
+    stats = _callback_stats.setdefault(
+        name, {'admitted': 0, 'shed_queue_full': 0, 'shed_timeout': 0, 'wait_ms_total': 0.0, 'wait_ms_max': 0.0}
+    )
+    stats[outcome] += 1
+    stats['wait_ms_total'] += wait_ms
+    stats['wait_ms_max'] = max(stats['wait_ms_max'], wait_ms)
+    _recent_waits.append(wait_ms)
+
+
+def _shed(name, reason, wait_ms):
+    """Record a shed request and answer it with 503 Busy."""
+    with _lock:
+        _record(name, f"shed_{reason}", wait_ms)
+    retry_after = max(1, math.ceil(config.ADMISSION_TIMEOUT_MS / 1000))
+    flask.abort(flask.Response(
+        json.dumps({'error': 'busy', 'reason': reason}),
+        status=503, mimetype='application/json', headers={'Retry-After': str(retry_after)},
+    ))
+
+
+def _acquire(name):
+    """
+    Take a heavy callback slot, waiting in the queue if none is free.
+
+    Raises:
+        werkzeug.exceptions.HTTPException: 503 if the queue is full or no slot
+            became free within MHV_ADMISSION_TIMEOUT_MS
+    """
+    global _queued, _max_queued, _running
+
+    slots = _get_slots()
+    start = time.monotonic()
+
+    # Fast path: a free slot, no queueing
+    acquired = slots.acquire(blocking=False)
+    if not acquired:
+        with _lock:
+            if _queued >= config.ADMISSION_QUEUE:
+                full = True
+            else:
+                full = False
+                _queued += 1
+                _max_queued = max(_max_queued, _queued)
+        if full:
+            _shed(name, "queue_full", 0.0)
+        try:
+            acquired = slots.acquire(timeout=config.ADMISSION_TIMEOUT_MS / 1000)
+        finally:
+            with _lock:
+                _queued -= 1
+        if not acquired:
+            _shed(name, "timeout", (time.monotonic() - start) * 1000)
+
+    with _lock:
+        _record(name, 'admitted', (time.monotonic() - start) * 1000)
+        _running += 1
+
+
+def _release():
+    """Give back a slot taken by _acquire()."""
+    global _running
+    with _lock:
+        _running -= 1
+    _get_slots().release()
+
+
+@contextmanager
+def admitted(name):
+    """
+    Hold one of the heavy callback slots for the duration of the block.
+
+    Does nothing unless MHV_ADMISSION is set.
+
+    Args:
+        name (str): Callback name, for the statistics
+
+    Raises:
+        werkzeug.exceptions.HTTPException: 503 if the queue is full or no slot
+            became free within MHV_ADMISSION_TIMEOUT_MS
+    """
+    if not config.ADMISSION:
+        yield
+        return
+
+    _acquire(name)
+    try:
+        yield
+    finally:
+        _release()
+
+
+@asynccontextmanager
+async def admitted_async(name):
+    """
+    Like admitted(), for async callbacks: the wait for a slot runs in a thread,
+    so a queued request does not block the event loop.
+
+    Args:
+        name (str): Callback name, for the statistics
+
+    Raises:
+        werkzeug.exceptions.HTTPException: 503 as for admitted()
+    """
+    if not config.ADMISSION:
+        yield
+        return
+
+    acquiring = asyncio.get_running_loop().run_in_executor(None, _acquire, name)
+    try:
+        await asyncio.shield(acquiring)
+    except asyncio.CancelledError:
+        # The slot may still be taken after the request gave up: give it back then
+        acquiring.add_done_callback(_release_if_acquired)
+        raise
+    try:
+        yield
+    finally:
+        _release()
+
+
+def _release_if_acquired(future):
+    if not future.cancelled() and future.exception() is None:
+        _release()
+
+
+def _percentile(values, fraction):
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+
+def get_admission_report():
+    """
+    Return the current admission state and statistics.
+
+    Returns:
+        dict: {'slots', 'running', 'queued', 'max_queued', 'queue_limit',
+               'wait_ms': {'p50', 'p95', 'max'} over recent decisions,
+               'callbacks': {name: {'admitted', 'shed_queue_full', 'shed_timeout',
+                                    'wait_ms_mean', 'wait_ms_max'}}}
+    """
+    with _lock:
+        waits = sorted(_recent_waits)
+        callbacks = {}
+        for name, stats in _callback_stats.items():
+            decisions = stats['admitted'] + stats['shed_queue_full'] + stats['shed_timeout']
+            callbacks[name] = {
+                'admitted': stats['admitted'],
+                'shed_queue_full': stats['shed_queue_full'],
+                'shed_timeout': stats['shed_timeout'],
+                'wait_ms_mean': round(stats['wait_ms_total'] / decisions, 2) if decisions else 0.0,
+                'wait_ms_max': round(stats['wait_ms_max'], 2),
+            }
+        return {
+            'slots': config.ADMISSION_SLOTS,
+            'running': _running,
+            'queued': _queued,
+            'max_queued': _max_queued,
+            'queue_limit': config.ADMISSION_QUEUE,
+            'wait_ms': {
+                'p50': round(_percentile(waits, 0.5), 2),
+                'p95': round(_percentile(waits, 0.95), 2),
+                'max': round(waits[-1], 2) if waits else 0.0,
+            },
+            'callbacks': callbacks,
+        }
+
+
+def init_admission(server):
+    """
+    Serve get_admission_report() at /_debug/admission if admission control is enabled.
+
+    The endpoint needs MHV_DEBUG_TOKEN (see debug.py).
+
+    Args:
+        server (flask.Flask): The Dash app's server
+
+    Returns:
+        bool: True if the endpoint was registered
+    """
+    if not config.ADMISSION:
+        return False
+
+    return add_debug_route(server, "/_debug/admission", "debug_admission", lambda: flask.jsonify(get_admission_report()))
@@ -0,0 +1,183 @@
+"""
+JSON API over the dashboard's aggregates, for tools that need the numbers
+without the Dash callback protocol.
+
+    GET /api/v1/datasets
+    GET /api/v1/metrics?country=Canada&country=India&metric=treatment_rate
+    GET /api/v1/radar?country=Canada&country=India
+    GET /api/v1/butterfly?country=Canada
+    GET /api/v1/stacked_bar
+
+Repeat ?country= to query several countries in one call (all countries when
+omitted); /metrics also accepts repeated ?metric= (all metrics when omitted).
+Every endpoint takes ?dataset=<name>. Answers are read from the cached
+aggregates and serialized once per distinct query; responses carry an ETag
+and Cache-Control, so a reverse proxy can serve repeats without the app.
+"""
+import hashlib
+import json
+
+import flask
+
+from . import config
+from .cache import cached, get_dataset_version
+from .datasets import get_dataset, get_dataset_names
+from .preprocessing import (
+    get_available_metrics, get_choropleth_table,
+    RADAR_LABELS, get_radar_country_values,
+    DAYS_INDOORS_ORDER, get_butterfly_country_data,
+    SOCIAL_WEAKNESS_ORDER, INTERVIEW_RESPONSES_ORDER, get_stacked_bar_country_data,
+)
+
+API_PREFIX = "/api/v1"
+
+# Serialized responses: (dataset version, endpoint, query) -> (etag, body); bounded, oldest dropped first
+_responses = {}
+RESPONSE_CACHE_SIZE = 4096
+
+
+class ApiError(Exception):
+    """Invalid request; answered as {"error": message} with the given status."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+@cached
+def get_country_index(df):
+    """Return {country: {'respondents': n, <metric>: value, ...}} for every country."""
+    records = get_choropleth_table(df).to_dict('records')
+    return {record.pop('Country'): record for record in records}
+
+
+def _countries(df, requested):
+    """Validate the requested countries; all countries (sorted) if none were given."""
+    known = get_country_index(df)
+    if not requested:
+        return sorted(known)
+    unknown = [country for country in requested if country not in known]
+    if unknown:
+        raise ApiError(f"Unknown countries: {unknown}", status=404)
+    return requested
+
+
+def _metrics_payload(df, args):
+    metrics = args.getlist('metric') or list(get_available_metrics())
+    unknown = [metric for metric in metrics if metric not in get_available_metrics()]
+    if unknown:
+        raise ApiError(f"Unknown metrics: {unknown}")
+
+    index = get_country_index(df)
+    return {
+        'metrics': metrics,
+        'countries': {
+            country: {'respondents': index[country]['respondents'],
+                      **{metric: index[country][metric] for metric in metrics}}
+            for country in _countries(df, args.getlist('country'))
+        },
+    }
+
+
+def _radar_payload(df, args):
+    return {
+        'labels': RADAR_LABELS,
+        'countries': {
+            country: get_radar_country_values(df, country)
+            for country in _countries(df, args.getlist('country'))
+        },
+    }
+
+
+def _butterfly_payload(df, args):
+    return {
+        'days_indoors_order': DAYS_INDOORS_ORDER,
+        'countries': {
+            country: get_butterfly_country_data(df, country)
+            for country in _countries(df, args.getlist('country'))
+        },
+    }
+
+
+def _stacked_bar_payload(df, args):
+    return {
+        'social_weakness_order': SOCIAL_WEAKNESS_ORDER,
+        'interview_responses': INTERVIEW_RESPONSES_ORDER,
+        'countries': {
+            country: get_stacked_bar_country_data(df, country)
+            for country in _countries(df, args.getlist('country'))
+        },
+    }
+
+
+ENDPOINTS = {
+    'metrics': _metrics_payload,
+    'radar': _radar_payload,
+    'butterfly': _butterfly_payload,
+    'stacked_bar': _stacked_bar_payload,
+}
+
+
+def _json_response(etag, body, status=200):
+    response = flask.Response(body, status=status, mimetype='application/json')
+    response.headers['Cache-Control'] = f"public, max-age={config.API_MAX_AGE}"
+    if etag is not None:
+        response.set_etag(etag)
+    return response
+
+
+def _error(message, status):
+    return flask.Response(json.dumps({'error': message}), status=status, mimetype='application/json')
+
+
+def _serialize(payload):
+    body = json.dumps(payload, separators=(',', ':')).encode()
+    return hashlib.sha1(body).hexdigest(), body
+
+
+def _query(endpoint):
+    args = flask.request.args
+    if endpoint == 'datasets':
+        etag, body = _serialize({'datasets': get_dataset_names()})
+    elif endpoint in ENDPOINTS:
+        try:
+            df = get_dataset(args.get('dataset'))
+        except KeyError:
+            return _error(f"Unknown dataset {args.get('dataset')!r}", 404)
+
+        version = get_dataset_version(df)
+        key = (version, endpoint, tuple(sorted((k, tuple(v)) for k, v in args.lists())))
+        cached_response = _responses.get(key) if version is not None else None
+        if cached_response is None:
+            try:
+                cached_response = _serialize(ENDPOINTS[endpoint](df, args))
+            except ApiError as e:
+                return _error(str(e), e.status)
+            if version is not None:
+                if len(_responses) >= RESPONSE_CACHE_SIZE:
+                    _responses.pop(next(iter(_responses)), None)
+                _responses[key] = cached_response
+        etag, body = cached_response
+    else:
+        return _error(f"Unknown endpoint {endpoint!r}", 404)
+
+    if flask.request.if_none_match.contains(etag):
+        return _json_response(etag, b"", status=304)
+    return _json_response(etag, body)
+
+
+def init_api(server):
+    """
+    Register the JSON API on the Flask server if it is enabled.
+
+    Args:
+        server (flask.Flask): The Dash app's server
+
+    Returns:
+        bool: True if the endpoints were registered
+    """
+    if not config.API:
+        return False
+
+    server.add_url_rule(f"{API_PREFIX}/<endpoint>", "api", _query)
+    return True
@@ -1,15 +1,32 @@
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import dash
-from dash import Dash, html, dcc, callback, Output, Input, State, ctx
+import flask
+from dash import Dash, html, dcc, callback, Output, Input, State, ctx, ClientsideFunction
 import dash_bootstrap_components as dbc
 import plotly.express as px
 import pandas as pd
 
-from .layouts import create_layout, METRIC_OPTIONS, POPUP_DESC, CHOROPLETH_TITLES
-from .preprocessing import clean_and_convert_types, get_choropleth_data, get_butterfly_data, get_radar_data,  get_stacked_bar_data
+from . import config
+from .background import heavy_callback
+from .prefetch import prefetch_after_selection
+from .profiling import init_profiling, attributed
+from .export import init_exports
+from .api import init_api
+from .memory import start_tracing, init_memory_debug
+from .admission import init_admission
+from .drilldown import get_response_table
+from .layouts import create_layout, approximate_label, METRIC_OPTIONS, POPUP_DESC, CHOROPLETH_TITLES
+from .cache import is_cached, get_dataset_version
+from .datasets import get_dataset, get_dataset_names, get_default_dataset, init_hot_reload
+from .preprocessing import get_choropleth_data, get_choropleth_matrix, get_countries, get_butterfly_data, get_radar_data,  get_stacked_bar_data, get_association_table
+from .progressive import get_choropleth_progressive, get_global_progressive, max_error
 from .figures.choropleth import create_choropleth
 from .figures.radar import create_radar_chart
 from .figures.stacked_bar import create_stacked_bar_chart
 from .figures.butterfly import create_butterfly_chart
+from .figures.association import create_association_heatmap
 
 
 GOOGLE_FONTS = "https://fonts.googleapis.com/css2?family=Roboto:wght@400;500;700&display=swap"
@@ -18,7 +35,9 @@ app = Dash(
     __name__,
     external_stylesheets=[dbc.themes.BOOTSTRAP, dbc.icons.BOOTSTRAP, GOOGLE_FONTS],
     assets_folder="../assets",
-    title="Mental Health Dashboard"
+    title="Mental Health Dashboard",
+    # Never switch to async dispatch just because asgiref happens to be installed
+    use_async=config.ASYNC_CALLBACKS
 )
 
 app.index_string = '''
@@ -41,41 +60,202 @@ app.index_string = '''
 </html>
 '''
     
-# Load and clean data
-df_clean = clean_and_convert_types()
+# Trace allocations from the very first load when memory tracing is enabled
+start_tracing()
 
-# Generate initial choropleth data for treatment rate
-choropleth_df = get_choropleth_data(df_clean, 'treatment_rate')
-butterfly_df = get_butterfly_data(df_clean)
-stacked_df = get_stacked_bar_data(df_clean)
-radar_df = get_radar_data(df_clean)
+def create_initial_figures(df):
+    """
+    Build the figures hydrated right after page load (cached, so hydration only sends them).
 
+    In progressive mode they may be built from sample estimates.
+    """
+    # Generate initial choropleth data for treatment rate
+    choropleth_df, _ = get_choropleth_progressive(df, 'treatment_rate')
+    global_data, global_errors = get_global_progressive(df)
 
-figures = {
-    'choropleth': create_choropleth(choropleth_df, 'treatment_rate'),
-    'radar': create_radar_chart(radar_df),
-    'stacked_bar': create_stacked_bar_chart(stacked_df),
-    'butterfly': create_butterfly_chart(butterfly_df)
-}
+    figures = {
+        'choropleth': create_choropleth(choropleth_df, 'treatment_rate'),
+        'radar': create_radar_chart(global_data['radar']),
+        'stacked_bar': create_stacked_bar_chart(global_data['stacked_bar']),
+        'butterfly': create_butterfly_chart(global_data['butterfly'])
+    }
+    return figures
 
-app.layout = create_layout(figures)
 
-# Callback to update choropleth based on dropdown selection
-@callback(
+def get_metric_matrix(df, dataset):
+    """
+    Data of choropleth-matrix-store, from which the browser switches map metrics.
+
+    None when clientside switching is disabled, or in progressive mode while the
+    exact values of all metrics are not computed yet; metric changes then go
+    through update_choropleth.
+    """
+    if not config.CLIENTSIDE_METRICS:
+        return None
+    if config.PROGRESSIVE and not is_cached(get_choropleth_matrix, df):
+        return None
+    return {'dataset': dataset, 'titles': CHOROPLETH_TITLES, **get_choropleth_matrix(df)}
+
+
+def serve_layout():
+    """
+    Build the page for the current snapshot of the default dataset (it may be hot reloaded).
+
+    The charts start as placeholders without data: update_choropleth draws the map
+    on page load and hydrate_secondary_graphs the comparison charts once they
+    scroll into view.
+    """
+    return create_layout(datasets=get_dataset_names(), countries=get_countries(get_dataset()))
+
+
+# Serialized /_dash-layout responses by version of the default dataset: the layout
+# holds no figures, so it is the same for every visitor until the data changes
+_layout_payloads = {}
+
+
+def serve_layout_payload():
+    """
+    Answer /_dash-layout from the layout serialized once per default dataset version.
+
+    Installed with before_request, so it returns None (letting Dash handle the
+    request) for every other request.
+    """
+    if flask.request.method != "GET" or flask.request.path != app.config.routes_pathname_prefix + "_dash-layout":
+        return None
+
+    df = get_dataset()
+    key = get_dataset_version(df) or id(df)
+    entry = _layout_payloads.get(key)
+    if entry is None:
+        payload = app.serve_layout().get_data()
+        entry = (payload, hashlib.sha1(payload).hexdigest())
+        _layout_payloads.clear()
+        _layout_payloads[key] = entry
+
+    payload, etag = entry
+    response = flask.Response(payload, mimetype="application/json")
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response.make_conditional(flask.request)
+
+
+def warm_initial_page(df):
+    """
+    Build the data and figures of the initial page up front from exact data.
+
+    Nobody is waiting yet, and forked workers inherit the results.
+    """
+    for get_initial_data in (get_butterfly_data, get_stacked_bar_data, get_radar_data):
+        get_initial_data(df)
+    get_choropleth_data(df, 'treatment_rate')
+    if config.CLIENTSIDE_METRICS:
+        get_choropleth_matrix(df)
+    create_initial_figures(df)
+
+
+# Load and clean the default dataset (optionally as weighted unique rows); other
+# editions are loaded on first selection. Only the registry holds on to it, so
+# eviction and hot reload can release it along with its cached aggregates.
+warm_initial_page(get_dataset())
+app.layout = serve_layout
+
+# Builds comparison charts next to the request thread, which builds one itself, so
+# that a request's three charts are built concurrently. Shared by all requests of
+# a worker; each running update_secondary_graphs queues at most two jobs, so the
+# queue is bounded by the worker's threads. Threads are only started on first use,
+# i.e. after gunicorn has forked the workers
+chart_executor = ThreadPoolExecutor(max_workers=config.CHART_WORKERS, thread_name_prefix="charts")
+
+# Comparison charts: graph id, key in get_global_progressive() data, data function, figure builder
+SECONDARY_CHARTS = (
+    ("stacked-bar", 'stacked_bar', get_stacked_bar_data, create_stacked_bar_chart),
+    ("butterfly", 'butterfly', get_butterfly_data, create_butterfly_chart),
+    ("radar", 'radar', get_radar_data, create_radar_chart),
+)
+
+
+def submit_chart_work(func, *args):
+    """
+    Run func(*args) on the chart executor; returns a future of its result.
+
+    If the request is profiled, the work counts towards its profile.
+    """
+    return chart_executor.submit(attributed(func), *args)
+
+
+def build_chart(df, get_chart_data, create_chart, countries):
+    """Aggregate and build one comparison chart (per-country aggregates are cached separately)."""
+    return create_chart(get_chart_data(df, *countries))
+
+# Switch the map metric in the browser from choropleth-matrix-store (assets/choropleth.js);
+# without matching data there it writes choropleth-fallback-store, which runs update_choropleth
+app.clientside_callback(
+    ClientsideFunction(namespace='choropleth', function_name='switch_metric'),
+    Output('choropleth', 'figure', allow_duplicate=True),
+    Output('sel-metric-store', 'data', allow_duplicate=True),
+    Output('choropleth-title', 'children', allow_duplicate=True),
+    Output('choropleth-approx', 'style', allow_duplicate=True),
+    Output('choropleth-fallback-store', 'data'),
+    Input('metric-dropdown', 'value'),
+    State('choropleth-matrix-store', 'data'),
+    State('dataset-dropdown', 'value'),
+    State('choropleth', 'figure'),
+    prevent_initial_call=True
+)
+
+# Callback to update choropleth on a dataset change, or a metric change the browser cannot handle
+@heavy_callback(
     Output('choropleth', 'figure'),
     Output('sel-metric-store', 'data'),
     Output('choropleth-title', 'children'),
-    Input('metric-dropdown', 'value')
+    Output('choropleth-approx', 'children'),
+    Output('choropleth-approx', 'style'),
+    Output('choropleth-refine-store', 'data'),
+    Output('choropleth-matrix-store', 'data'),
+    Input('dataset-dropdown', 'value'),
+    Input('choropleth-fallback-store', 'data'),
+    State('metric-dropdown', 'value'),
+    progress=[Output('choropleth-progress', 'value'), Output('choropleth-progress', 'label')],
+    running=[(Output('choropleth-progress', 'style'), {"display": "flex"}, {"display": "none"})],
 )
 
-def update_choropleth(selected_metric):
+def update_choropleth(report_progress, dataset, fallback, selected_metric):
     # Get label for the selected metric
     
-    # Generate new choropleth data
-    choropleth_data = get_choropleth_data(df_clean, selected_metric)
+    # Generate new choropleth data (a sample estimate if the exact data takes too long)
+    df = get_dataset(dataset)
+    choropleth_data, errors = get_choropleth_progressive(df, selected_metric)
+    report_progress(1, 2)
+    
+    # Mark estimates and have refine_choropleth replace them with the exact data
+    if errors is not None:
+        approx = approximate_label(max_error(errors)), {}, {'metric': selected_metric, 'dataset': dataset}
+    else:
+        approx = None, {"display": "none"}, dash.no_update
+    
+    # Create and return the updated figure, metric, and title, and the data for
+    # switching this dataset's metrics in the browser
+    figure = create_choropleth(choropleth_data, selected_metric)
+    metric_matrix = get_metric_matrix(df, dataset)
+    return figure, selected_metric, CHOROPLETH_TITLES[selected_metric], *approx, metric_matrix
+
+# Replace an estimated map with the exact data once it is computed
+@app.callback(
+    Output('choropleth', 'figure', allow_duplicate=True),
+    Output('choropleth-approx', 'style', allow_duplicate=True),
+    Input('choropleth-refine-store', 'data'),
+    State('sel-metric-store', 'data'),
+    State('dataset-dropdown', 'value'),
+    prevent_initial_call=True
+)
+def refine_choropleth(refine, selected_metric, dataset):
+    # The user moved on to another metric or dataset: its own update handles the map
+    if not refine or (refine['metric'], refine['dataset']) != (selected_metric, dataset):
+        raise dash.exceptions.PreventUpdate
     
-    # Create and return the updated figure, metric, and title
-    return create_choropleth(choropleth_data, selected_metric), selected_metric, CHOROPLETH_TITLES[selected_metric]
+    # Joins the computation started by update_choropleth
+    choropleth_data = get_choropleth_data(get_dataset(dataset), selected_metric)
+    return create_choropleth(choropleth_data, selected_metric), {"display": "none"}
 
 # Callback to display popup on country click
 @callback(
@@ -126,9 +306,11 @@ def close_popup(clicks):
     Input("btn-sel1", "n_clicks"),
     Input("btn-sel2", "n_clicks"),
     State("temp-click-store", "data"),
+    State("dataset-dropdown", "value"),
+    State("compare-more-dropdown", "value"),
     prevent_initial_call=True,
 )
-def save_selection(btn1, btn2, temp_country):
+def save_selection(btn1, btn2, temp_country, dataset, more_countries):
     triggered_id = ctx.triggered_id
     
     # Initialize outputs (keep existing data if not updating that slot)
@@ -137,34 +319,195 @@ def save_selection(btn1, btn2, temp_country):
     
     if triggered_id == "btn-sel1":
         out_slot1 = temp_country
+        prefetch_after_selection(get_dataset(dataset), temp_country, slot=1, more_countries=more_countries)
     elif triggered_id == "btn-sel2":
         out_slot2 = temp_country
+        prefetch_after_selection(get_dataset(dataset), temp_country, slot=2, more_countries=more_countries)
 
     return out_slot1, out_slot2, { "display": "none",}
 
-# Update secondary graphs based on selected countries
+# Open the responses table of the popup's country
 @app.callback(
+    Output("responses-modal", "is_open"),
+    Output("responses-country-store", "data"),
+    Output("responses-title", "children"),
+    Output("responses-table", "page_current"),
+    Output("responses-table", "sort_by"),
+    Output("responses-table", "filter_query"),
+    Output("popup", "style", allow_duplicate=True),
+    Input("btn-responses", "n_clicks"),
+    State("temp-click-store", "data"),
+    prevent_initial_call=True,
+)
+def open_responses(clicks, country):
+    if not country:
+        raise dash.exceptions.PreventUpdate
+    return True, country, f"Responses from {country}", 0, [], "", {"display": "none"}
+
+# Serve the visible page of the responses table (paged, sorted and filtered on the server)
+@app.callback(
+    Output("responses-table", "data"),
+    Output("responses-table", "columns"),
+    Output("responses-table", "page_count"),
+    Output("responses-count", "children"),
+    Input("responses-country-store", "data"),
+    Input("responses-table", "page_current"),
+    Input("responses-table", "page_size"),
+    Input("responses-table", "sort_by"),
+    Input("responses-table", "filter_query"),
+    State("dataset-dropdown", "value"),
+    prevent_initial_call=True,
+)
+def update_responses(country, page, page_size, sort_by, filter_query, dataset):
+    if not country:
+        raise dash.exceptions.PreventUpdate
+    return get_response_table(get_dataset(dataset), country, page, page_size, sort_by, filter_query)
+
+# Update secondary graphs based on selected countries
+@heavy_callback(
     Output("stacked-bar", "figure"),
     Output("butterfly", "figure"),
     Output("radar", "figure"),
+    Output("secondary-approx", "style", allow_duplicate=True),
     Input("selected-ctry1-store", "data"),
     Input("selected-ctry2-store", "data"),
+    Input("compare-more-dropdown", "value"),
+    Input("dataset-dropdown", "value"),
+    progress=[Output("secondary-progress", "value"), Output("secondary-progress", "label")],
+    running=[(Output("secondary-progress", "style"), {"display": "flex"}, {"display": "none"})],
     prevent_initial_call=True
 )
-def update_secondary_graphs(country_name1, country_name2):
-    # Update stacked bar chart
-    stacked_data = get_stacked_bar_data(df_clean, country_name1, country_name2)
-    stacked_fig = create_stacked_bar_chart(stacked_data)
+def update_secondary_graphs(report_progress, country_name1, country_name2, more_countries, dataset):
+    # Update stacked bar, butterfly and radar charts in parallel: the first in this
+    # thread, the others on the chart threads. Each chart's values for all countries
+    # come from one cached grouped count, so adding countries to the comparison
+    # costs next to nothing.
+    df = get_dataset(dataset)
+    countries = (country_name1, country_name2, *(more_countries or []))
+    (_, _, get_first, create_first), *others = SECONDARY_CHARTS
+    futures = [submit_chart_work(build_chart, df, get_data, create, countries) for _, _, get_data, create in others]
+    figures = [build_chart(df, get_first, create_first, countries)]
+    report_progress(1, len(SECONDARY_CHARTS))
+    for done, _ in enumerate(as_completed(futures), start=2):
+        report_progress(done, len(SECONDARY_CHARTS))
+
+    figures += [future.result() for future in futures]
+    return *figures, {"display": "none"}
+
+# Draw each comparison chart once it scrolls into view: assets/hydrate.js sets the
+# chart's visible store to its id, which runs that chart's own hydration callback
+app.clientside_callback(
+    ClientsideFunction(namespace='hydrate', function_name='observe_charts'),
+    *(Output(f'{graph_id}-visible-store', 'data') for graph_id, *_ in SECONDARY_CHARTS),
+    *(Input(graph_id, 'id') for graph_id, *_ in SECONDARY_CHARTS),
+)
+
+def register_hydration(graph_id, chart, get_chart_data, create_chart):
+    """
+    Register the callback that draws one comparison chart when it scrolls into view.
+
+    One callback per chart, so a chart that comes into view is sent on its own and
+    never cancels or repeats the hydration of another.
+    """
+    @heavy_callback(
+        Output(graph_id, "figure", allow_duplicate=True),
+        Output("secondary-approx", "children", allow_duplicate=True),
+        Output("secondary-approx", "style", allow_duplicate=True),
+        Output("secondary-refine-store", "data", allow_duplicate=True),
+        Input(f"{graph_id}-visible-store", "data"),
+        State("selected-ctry1-store", "data"),
+        State("selected-ctry2-store", "data"),
+        State("compare-more-dropdown", "value"),
+        State("dataset-dropdown", "value"),
+        prevent_initial_call=True
+    )
+    def hydrate_secondary_graph(report_progress, visible, country_name1, country_name2, more_countries, dataset):
+        if not visible:
+            raise dash.exceptions.PreventUpdate
+        
+        df = get_dataset(dataset)
+        countries = (country_name1, country_name2, *(more_countries or []))
+        if any(countries):
+            return build_chart(df, get_chart_data, create_chart, countries), dash.no_update, dash.no_update, dash.no_update
+        
+        # All respondents, estimated in progressive mode while the exact data is computed
+        data, errors = get_global_progressive(df)
+        figure = create_chart(data[chart])
+        if errors is None:
+            return figure, dash.no_update, dash.no_update, dash.no_update
+        return figure, approximate_label(max_error(errors)), {}, True
+
+for secondary_chart in SECONDARY_CHARTS:
+    register_hydration(*secondary_chart)
+
+# Replace estimated initial (all respondents) charts with the exact data once it is computed
+@app.callback(
+    Output("stacked-bar", "figure", allow_duplicate=True),
+    Output("butterfly", "figure", allow_duplicate=True),
+    Output("radar", "figure", allow_duplicate=True),
+    Output("secondary-approx", "style", allow_duplicate=True),
+    Input("secondary-refine-store", "data"),
+    State("selected-ctry1-store", "data"),
+    State("selected-ctry2-store", "data"),
+    State("compare-more-dropdown", "value"),
+    State("dataset-dropdown", "value"),
+    *(State(f"{graph_id}-visible-store", "data") for graph_id, *_ in SECONDARY_CHARTS),
+    prevent_initial_call='initial_duplicate'
+)
+def refine_secondary_graphs(refine, country_name1, country_name2, more_countries, dataset, *visible):
+    if not refine:
+        raise dash.exceptions.PreventUpdate
     
-    # Update butterfly chart
-    butterfly_data = get_butterfly_data(df_clean, country_name1, country_name2)
-    butterfly_fig = create_butterfly_chart(butterfly_data)
+    # Countries were picked meanwhile: update_secondary_graphs shows exact data for them
+    if country_name1 or country_name2 or more_countries:
+        return dash.no_update, dash.no_update, dash.no_update, {"display": "none"}
     
-    # Update radar chart
-    radar_data = get_radar_data(df_clean, country_name1, country_name2)
-    radar_fig = create_radar_chart(radar_data)
+    # Charts not in view yet are hydrated from the exact data when they are
+    df = get_dataset(dataset)
+    figures = [create(get_data(df)) if shown else dash.no_update
+               for (_, _, get_data, create), shown in zip(SECONDARY_CHARTS, visible)]
+    return *figures, {"display": "none"}
 
-    return stacked_fig, butterfly_fig, radar_fig
+# Offer the countries of the selected dataset for further comparisons and associations
+@app.callback(
+    Output("compare-more-dropdown", "options"),
+    Output("compare-more-dropdown", "value"),
+    Output("associations-scope", "options"),
+    Output("associations-scope", "value"),
+    Input("dataset-dropdown", "value"),
+    State("compare-more-dropdown", "value"),
+    State("associations-scope", "value"),
+    prevent_initial_call=True
+)
+def update_country_options(dataset, more_countries, association_country):
+    countries = get_countries(get_dataset(dataset))
+    # Keep the selection (and avoid redrawing the charts) unless a country is missing from this dataset
+    kept = [country for country in more_countries or [] if country in countries]
+    scope = None if association_country and association_country not in countries else dash.no_update
+    return countries, kept if kept != (more_countries or []) else dash.no_update, countries, scope
+
+# Open the association heatmap
+@app.callback(
+    Output("associations-modal", "is_open"),
+    Input("associations-btn", "n_clicks"),
+    prevent_initial_call=True,
+)
+def open_associations(clicks):
+    return True
+
+# Association strength of all column pairs, for all respondents or one country
+@app.callback(
+    Output("associations-heatmap", "figure"),
+    Input("associations-modal", "is_open"),
+    Input("associations-scope", "value"),
+    Input("dataset-dropdown", "value"),
+    prevent_initial_call=True,
+)
+def update_associations(is_open, country, dataset):
+    if not is_open:
+        raise dash.exceptions.PreventUpdate
+    table = get_association_table(get_dataset(dataset), country or None)
+    return create_association_heatmap(table, country or "All countries")
 
 # Update country labels based on selections
 @app.callback(
@@ -214,5 +557,19 @@ def remove_country_2(clicks):
 # Expose Flask server for Render
 server = app.server
 
+# Download endpoints and JSON API for the data behind the charts
+init_exports(server)
+init_api(server)
+
+# Opt-in request profiling, memory accounting, admission statistics and data hot reload
+# (no hooks are installed unless configured)
+init_profiling(server)
+init_memory_debug(server)
+init_admission(server)
+init_hot_reload(server)
+
+# Serve the layout pre-serialized instead of serializing it on every page load
+server.before_request(serve_layout_payload)
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=8080)
@@ -0,0 +1,108 @@
+"""
+Optional background execution of heavy callbacks.
+
+With MHV_BACKGROUND_CALLBACKS=1 the data-heavy callbacks run as Dash background
+callbacks on a local diskcache (SQLite) job manager instead of inside the web
+worker's request. No external broker is needed; install the extras with
+pip install "dash[diskcache]".
+"""
+import asyncio
+import contextvars
+import functools
+from pathlib import Path
+
+import dash
+
+from . import config
+from .admission import admitted, admitted_async
+from .datasets import get_registry_version
+
+_manager = None
+
+
+def get_background_manager():
+    """
+    Return the shared DiskcacheManager, or None if background callbacks are disabled.
+
+    Results are cached by callback inputs together with the content version of
+    all datasets, so a changed data file never serves results computed from the old one.
+    """
+    global _manager
+
+    if not config.BACKGROUND_CALLBACKS:
+        return None
+
+    if _manager is None:
+        import diskcache
+
+        cache_dir = Path(__file__).parent.parent / config.JOB_CACHE_DIR
+        _manager = dash.DiskcacheManager(
+            diskcache.Cache(str(cache_dir)),
+            cache_by=[get_registry_version],
+            expire=config.JOB_CACHE_EXPIRE,
+        )
+    return _manager
+
+
+def _no_progress(done, total):
+    """Progress reporter used when the callback runs synchronously."""
+
+
+def heavy_callback(*dependencies, progress=None, running=None, **kwargs):
+    """
+    Register a data-heavy callback, in the background job manager when enabled.
+
+    The decorated function receives a report_progress(done, total) function as its
+    first argument in all modes; it only has an effect in background mode, where
+    it drives the `progress` output with (percent, label). With MHV_ASYNC_CALLBACKS
+    it is registered as an async callback that runs the (synchronous) function in a
+    thread, off the event loop; otherwise it is a plain callback. Re-triggering the callback
+    while a job is running terminates the old job, so a stale selection never
+    finishes computing. Synchronous and async heavy callbacks go through admission
+    control (see admission.py); async ones wait for a slot off the event loop.
+
+    Args:
+        *dependencies: Output/Input/State objects as for dash.callback
+        progress (list, optional): Two outputs receiving the percentage and label
+        running (list, optional): (Output, value_while_running, value_when_done) tuples
+        **kwargs: Further keyword arguments passed to dash.callback
+    """
+    def decorator(func):
+        manager = get_background_manager()
+
+        if manager is None and config.ASYNC_CALLBACKS:
+            @functools.wraps(func)
+            async def run_async(*args):
+                async with admitted_async(func.__name__):
+                    # In the request's context, for the callback context and profiling
+                    context = contextvars.copy_context()
+                    return await asyncio.get_running_loop().run_in_executor(
+                        None, context.run, func, _no_progress, *args
+                    )
+
+            return dash.callback(*dependencies, **kwargs)(run_async)
+
+        if manager is None:
+            @functools.wraps(func)
+            def run_sync(*args):
+                with admitted(func.__name__):
+                    return func(_no_progress, *args)
+
+            return dash.callback(*dependencies, **kwargs)(run_sync)
+
+        @functools.wraps(func)
+        def run_background(set_progress, *args):
+            def report_progress(done, total):
+                set_progress((round(done / total * 100), f"{done}/{total}"))
+            return func(report_progress, *args)
+
+        return dash.callback(
+            *dependencies,
+            background=True,
+            manager=manager,
+            progress=progress,
+            running=running,
+            **kwargs
+        )(run_background)
+
+    return decorator
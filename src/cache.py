@@ -0,0 +1,260 @@
+"""
+Two-tier memoisation of aggregate results and figures.
+
+The first tier lives in process memory, keyed by the source dataframe. The
+optional second tier (MHV_SHARED_CACHE=1) is a store shared by all workers and
+restarts, keyed by a content hash of the function, its arguments and the
+dataset version, so a result computed by any worker is reused by all others.
+"""
+import functools
+import hashlib
+import hmac
+import json
+import pickle
+import weakref
+from pathlib import Path
+
+from . import config
+from .result_store import SQLiteStore, RedisStore
+from .singleflight import SingleFlight
+
+# Code versions in every shared key, so that entries computed by older code are not
+# served after a deploy. Bump RESULTS_VERSION whenever an aggregation function
+# (preprocessing.py, progressive.py) changes its results, and FIGURES_VERSION
+# whenever a figure builder, theme.py or the skeletons change the figures they
+# produce; the data itself is versioned by data_loader.CLEANING_VERSION.
+RESULTS_VERSION = "1"
+FIGURES_VERSION = "1"
+
+# Per-dataframe result caches: id(df) -> (weakref to df, {call key: result}, dataset version)
+_aggregate_cache = {}
+
+# Origin of the results of @cached calls on versioned datasets, by id(result):
+# id -> (id(df), call key, shared key). Figures built from such a result are keyed
+# by its shared key instead of a hash of its content
+_result_origins = {}
+
+# Serialized figures by content key (bounded, oldest dropped first)
+_figure_cache = {}
+FIGURE_CACHE_SIZE = 256
+
+_shared_store = None
+
+# Length of the HMAC prepended to every result and figure in the shared store
+SIGNATURE_SIZE = hashlib.sha256().digest_size
+
+# Concurrent misses for the same key wait for one computation instead of repeating it
+_flight = SingleFlight()
+
+
+def _results_for(df):
+    """Return the cache entry for df, dropping it automatically once df is garbage collected."""
+    df_id = id(df)
+    entry = _aggregate_cache.get(df_id)
+    if entry is not None and entry[0]() is df:
+        return entry
+
+    ref = weakref.ref(df, lambda _ref: _forget(df_id))
+    entry = (ref, {}, None)
+    _aggregate_cache[df_id] = entry
+    return entry
+
+
+def _forget(df_id):
+    """Drop the results of a garbage collected dataframe and their origins."""
+    _aggregate_cache.pop(df_id, None)
+    for result_id, (origin_df_id, _, _) in list(_result_origins.items()):
+        if origin_df_id == df_id:
+            _result_origins.pop(result_id, None)
+
+
+def _origin_key(value):
+    """Return the shared key of the @cached call whose result is value, or None."""
+    origin = _result_origins.get(id(value))
+    if origin is None:
+        return None
+
+    # The id may have been reused by another object since the origin was recorded
+    df_id, key, shared_key = origin
+    entry = _aggregate_cache.get(df_id)
+    if entry is None or entry[0]() is None or entry[1].get(key) is not value:
+        return None
+    return shared_key
+
+
+def set_dataset_version(df, version):
+    """
+    Mark df as the dataset identified by version.
+
+    Only marked dataframes use the shared tier; the version becomes part of every
+    shared key, so results from another version of the data are never reused.
+    Datasets loaded from a file are versioned by data_loader.get_content_version().
+    """
+    ref, results, _ = _results_for(df)
+    _aggregate_cache[id(df)] = (ref, results, version)
+
+
+def get_dataset_version(df):
+    """Return the version df was marked with by set_dataset_version(), or None."""
+    return _results_for(df)[2]
+
+
+def get_shared_store():
+    """Return the shared result store, or None if the shared tier is disabled."""
+    global _shared_store
+
+    if not config.SHARED_CACHE:
+        return None
+
+    if _shared_store is None:
+        if config.SHARED_CACHE_URL:
+            if not config.SHARED_CACHE_SECRET:
+                raise RuntimeError("MHV_SHARED_CACHE_URL needs MHV_SHARED_CACHE_SECRET to authenticate cached results")
+            _shared_store = RedisStore(config.SHARED_CACHE_URL, ttl=config.SHARED_CACHE_TTL,
+                                       prefix=config.SHARED_CACHE_PREFIX)
+        else:
+            path = Path(__file__).parent.parent / config.SHARED_CACHE_PATH
+            _shared_store = SQLiteStore(path, max_bytes=config.SHARED_CACHE_MAX_MB * 1024**2)
+    return _shared_store
+
+
+def set_shared_store(store):
+    """Install a custom shared store (any object with get(key) and set(key, value) methods)."""
+    global _shared_store
+    _shared_store = store
+
+
+def content_key(namespace, *parts):
+    """Return a stable hash of namespace and the pickled parts."""
+    digest = hashlib.sha256(namespace.encode())
+    for part in parts:
+        digest.update(pickle.dumps(part, protocol=pickle.HIGHEST_PROTOCOL))
+    return f"{namespace}:{digest.hexdigest()}"
+
+
+def _sign(payload):
+    """Prepend the HMAC of payload under MHV_SHARED_CACHE_SECRET."""
+    signature = hmac.new(config.SHARED_CACHE_SECRET.encode(), payload, hashlib.sha256).digest()
+    return signature + payload
+
+
+def _verified(signed):
+    """Return the payload of a _sign() result, or None if its HMAC does not match."""
+    signature, payload = signed[:SIGNATURE_SIZE], signed[SIGNATURE_SIZE:]
+    expected = hmac.new(config.SHARED_CACHE_SECRET.encode(), payload, hashlib.sha256).digest()
+    return payload if hmac.compare_digest(signature, expected) else None
+
+
+def cached(func):
+    """
+    Memoise an aggregation function with signature func(df, *args, **kwargs).
+
+    Results are stored per dataframe object, so a re-cleaned dataframe never sees
+    results computed from an older one. Cached results are shared between callers
+    and must be treated as read-only. Concurrent misses for the same call are
+    computed once.
+    """
+    @functools.wraps(func)
+    def wrapper(df, *args, **kwargs):
+        _, results, version = _results_for(df)
+        key = (func.__name__, args, tuple(sorted(kwargs.items())))
+        if key in results:
+            return results[key]
+
+        def compute():
+            # Another thread may have finished this call just before we got here
+            if key in results:
+                return results[key]
+
+            shared_key = content_key(func.__qualname__, RESULTS_VERSION, version, key) if version is not None else None
+            store = get_shared_store() if version is not None else None
+            if store is None:
+                result = func(df, *args, **kwargs)
+            else:
+                signed = store.get(shared_key)
+                # Only unpickle what this app wrote; anything else is recomputed and overwritten
+                payload = _verified(signed) if signed is not None else None
+                if payload is not None:
+                    result = pickle.loads(payload)
+                else:
+                    result = func(df, *args, **kwargs)
+                    store.set(shared_key, _sign(pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)))
+
+            results[key] = result
+            if shared_key is not None:
+                _result_origins[id(result)] = (id(df), key, shared_key)
+            return result
+
+        return _flight.do((id(df), key), compute)
+
+    return wrapper
+
+
+def is_cached(func, df, *args, **kwargs):
+    """Return True if the @cached func already holds the result of func(df, *args, **kwargs)."""
+    _, results, _ = _results_for(df)
+    return (func.__name__, args, tuple(sorted(kwargs.items()))) in results
+
+
+def cached_figure(builder):
+    """
+    Memoise a figure builder by the origin or content of its inputs.
+
+    An input returned by a @cached call on a versioned dataset is identified by
+    that call's shared key (function, arguments and dataset version), so the data
+    is not hashed again on every call. Other inputs, such as the small per-chart
+    dicts assembled from several cached calls or sample estimates, are identified
+    by a hash of their content.
+
+    The wrapped builder returns the figure as a plain dict (ready for dcc.Graph),
+    which is what gets stored in memory and in the shared tier. Concurrent misses
+    for the same inputs are built once.
+    """
+    @functools.wraps(builder)
+    def wrapper(*args):
+        parts = []
+        for arg in args:
+            origin = _origin_key(arg)
+            parts.append(arg if origin is None else ("result", origin))
+        key = content_key(builder.__qualname__, FIGURES_VERSION, tuple(parts))
+        figure = _figure_cache.get(key)
+        if figure is not None:
+            return figure
+
+        def build():
+            figure = _figure_cache.get(key)
+            if figure is not None:
+                return figure
+
+            store = get_shared_store()
+            signed = store.get(key) if store is not None else None
+            # As for results, only load what this app wrote
+            payload = _verified(signed) if signed is not None else None
+            if payload is not None:
+                figure = json.loads(payload)
+            else:
+                # Builders return either a go.Figure or an already plain dict (fast path)
+                figure = builder(*args)
+                if not isinstance(figure, dict):
+                    figure = json.loads(figure.to_json())
+                if store is not None:
+                    store.set(key, _sign(json.dumps(figure).encode()))
+
+            if len(_figure_cache) >= FIGURE_CACHE_SIZE:
+                _figure_cache.pop(next(iter(_figure_cache)), None)
+            _figure_cache[key] = figure
+            return figure
+
+        return _flight.do(key, build)
+
+    return wrapper
+
+
+def clear_cache():
+    """Drop all memoised results, including the shared tier."""
+    _aggregate_cache.clear()
+    _result_origins.clear()
+    _figure_cache.clear()
+    store = get_shared_store()
+    if store is not None:
+        store.clear()
@@ -0,0 +1,262 @@
+"""Runtime configuration read from environment variables."""
+import os
+
+
+def _env_int(name, default=None):
+    """Read an integer environment variable, falling back to default if unset or empty."""
+    value = os.environ.get(name, "").strip()
+    return int(value) if value else default
+
+
+def _env_float(name, default=None):
+    """Read a float environment variable, falling back to default if unset or empty."""
+    value = os.environ.get(name, "").strip()
+    return float(value) if value else default
+
+
+def _env_mapping(name, default):
+    """Read a "key=value,key=value" environment variable into an ordered dict."""
+    value = os.environ.get(name, "").strip()
+    if not value:
+        return dict(default)
+    pairs = (item.split("=", 1) for item in value.split(",") if item.strip())
+    return {key.strip(): val.strip() for key, val in pairs}
+
+
+def _env_bool(name, default=False):
+    """Read a boolean environment variable (1/true/yes/on)."""
+    value = os.environ.get(name, "").strip().lower()
+    if not value:
+        return default
+    return value in ("1", "true", "yes", "on")
+
+
+# ============================================================================
+# PRODUCTION SERVER (src/serve.py)
+# ============================================================================
+
+HOST = os.environ.get("HOST", "0.0.0.0")
+PORT = _env_int("PORT", 8080)
+
+# Worker/thread counts; None means "derive from available cores and memory"
+WORKERS = _env_int("WEB_CONCURRENCY")
+THREADS = _env_int("MHV_THREADS")
+
+# Expected private memory of one forked worker; None means "estimate from master RSS"
+WORKER_MEMORY_MB = _env_float("MHV_WORKER_MEMORY_MB")
+
+# Seconds before gunicorn kills a silent worker
+TIMEOUT = _env_int("MHV_TIMEOUT", 60)
+
+
+# ============================================================================
+# BACKGROUND CALLBACKS (src/background.py)
+# ============================================================================
+
+# Run heavy callbacks on the local diskcache job manager (needs dash[diskcache])
+BACKGROUND_CALLBACKS = _env_bool("MHV_BACKGROUND_CALLBACKS")
+
+# Job and result store, relative to the project root
+JOB_CACHE_DIR = os.environ.get("MHV_JOB_CACHE_DIR", ".cache/jobs")
+
+# Seconds a cached callback result is kept after its last use
+JOB_CACHE_EXPIRE = _env_int("MHV_JOB_CACHE_EXPIRE", 24 * 3600)
+
+
+# ============================================================================
+# ADMISSION CONTROL (src/admission.py)
+# ============================================================================
+
+# Limit concurrently running heavy callbacks per worker and shed the excess with 503 Busy
+ADMISSION = _env_bool("MHV_ADMISSION")
+
+# Heavy callbacks running at once, and requests allowed to wait for a slot
+# (keep both together below the worker's threads so cheap callbacks always get one)
+ADMISSION_SLOTS = _env_int("MHV_ADMISSION_SLOTS", 2)
+ADMISSION_QUEUE = _env_int("MHV_ADMISSION_QUEUE", 2)
+
+# Milliseconds a queued request waits for a slot before it is shed
+ADMISSION_TIMEOUT_MS = _env_int("MHV_ADMISSION_TIMEOUT_MS", 2000)
+
+
+# ============================================================================
+# SHARED RESULT CACHE (src/cache.py)
+# ============================================================================
+
+# Keep aggregate results and figures in a store shared by all workers and restarts
+SHARED_CACHE = _env_bool("MHV_SHARED_CACHE")
+
+# Local SQLite file (relative to the project root) and its size bound
+SHARED_CACHE_PATH = os.environ.get("MHV_SHARED_CACHE_PATH", ".cache/results.sqlite3")
+SHARED_CACHE_MAX_MB = _env_int("MHV_SHARED_CACHE_MAX_MB", 256)
+
+# Optional remote store instead of the local file, e.g. redis://localhost:6379/0
+SHARED_CACHE_URL = os.environ.get("MHV_SHARED_CACHE_URL", "")
+SHARED_CACHE_TTL = _env_int("MHV_SHARED_CACHE_TTL", 7 * 24 * 3600)
+# Namespace of this app's keys in the remote store (clearing deletes only these)
+SHARED_CACHE_PREFIX = os.environ.get("MHV_SHARED_CACHE_PREFIX", "mhv:")
+
+# Key authenticating pickled results in the shared store (HMAC-SHA256), so that
+# whoever can write to the store cannot make workers unpickle arbitrary data;
+# required with a remote store
+SHARED_CACHE_SECRET = os.environ.get("MHV_SHARED_CACHE_SECRET", "")
+
+
+# ============================================================================
+# DATASETS (src/datasets.py)
+# ============================================================================
+
+# Selectable survey editions as "name=path" pairs (paths relative to the project root);
+# the first one is shown on page load
+DATASETS = _env_mapping("MHV_DATASETS", {"OSMI 2014": "data/mental_dataset.csv"})
+
+# Total size of cleaned datasets kept in memory; least recently used ones are dropped beyond it
+DATASET_MEMORY_MB = _env_float("MHV_DATASET_MEMORY_MB", 1024)
+
+# Watch the loaded dataset files and swap in a rebuilt snapshot when one changes
+HOT_RELOAD = _env_bool("MHV_HOT_RELOAD")
+
+# Seconds between checks of the files' size and modification time
+HOT_RELOAD_INTERVAL = _env_float("MHV_HOT_RELOAD_INTERVAL", 10)
+
+
+# ============================================================================
+# DATA REPRESENTATION (src/preprocessing.py)
+# ============================================================================
+
+# Serve from unique rows plus a weight column instead of one row per response
+COMPRESS_DUPLICATES = _env_bool("MHV_COMPRESS_DUPLICATES")
+
+
+# ============================================================================
+# SQL BACKEND (src/sql_backend.py)
+# ============================================================================
+
+# Where aggregations run: "pandas" (in memory), "sqlite" or "duckdb" (database file, needs duckdb)
+BACKEND = os.environ.get("MHV_BACKEND", "pandas")
+
+# Directory (relative to the project root) holding the database files
+SQL_DIR = os.environ.get("MHV_SQL_DIR", ".cache/sql")
+
+
+# ============================================================================
+# SPECULATIVE PREFETCH (src/prefetch.py)
+# ============================================================================
+
+# Precompute likely country pairs after a selection
+PREFETCH = _env_bool("MHV_PREFETCH")
+
+# Likely partners per selection, threads building them and maximum queued pairs
+PREFETCH_TOP_N = _env_int("MHV_PREFETCH_TOP_N", 5)
+PREFETCH_WORKERS = _env_int("MHV_PREFETCH_WORKERS", 1)
+PREFETCH_QUEUE = _env_int("MHV_PREFETCH_QUEUE", 20)
+
+# Skip prefetching while the 1-minute load average per core is above this
+PREFETCH_MAX_LOAD = _env_float("MHV_PREFETCH_MAX_LOAD", 0.75)
+
+# Scheduling niceness of prefetch threads (Linux only)
+PREFETCH_NICENESS = _env_int("MHV_PREFETCH_NICENESS", 10)
+
+
+# ============================================================================
+# CALLBACKS (src/app.py)
+# ============================================================================
+
+# Threads building comparison charts concurrently (shared by all requests of a worker)
+CHART_WORKERS = _env_int("MHV_CHART_WORKERS", 8)
+
+# Serve the heavy callbacks as async callbacks (needs dash[async]); their aggregation
+# work is awaited on the chart threads instead of blocking the request
+ASYNC_CALLBACKS = _env_bool("MHV_ASYNC_CALLBACKS")
+
+# Build figures by filling cached plain-JSON skeletons instead of validated plotly.py objects
+FAST_FIGURES = _env_bool("MHV_FAST_FIGURES", True)
+
+# Send the country x metric table with the page and switch map metrics in the browser
+CLIENTSIDE_METRICS = _env_bool("MHV_CLIENTSIDE_METRICS", True)
+
+# Rows per page of the responses drill-down table (src/drilldown.py)
+DRILLDOWN_PAGE_SIZE = _env_int("MHV_DRILLDOWN_PAGE_SIZE", 250)
+
+
+# ============================================================================
+# PROGRESSIVE AGGREGATION (src/progressive.py)
+# ============================================================================
+
+# Show sample estimates with error bounds first when exact aggregates are not ready in time
+PROGRESSIVE = _env_bool("MHV_PROGRESSIVE")
+
+# Milliseconds to wait for the exact result before answering with an estimate
+PROGRESSIVE_BUDGET_MS = _env_float("MHV_PROGRESSIVE_BUDGET_MS", 150)
+
+# Rows sampled per country for estimates
+PROGRESSIVE_SAMPLE_PER_COUNTRY = _env_int("MHV_PROGRESSIVE_SAMPLE_PER_COUNTRY", 400)
+
+# Threads computing exact results in the background
+PROGRESSIVE_WORKERS = _env_int("MHV_PROGRESSIVE_WORKERS", 2)
+
+
+# ============================================================================
+# DATA EXPORTS (src/export.py)
+# ============================================================================
+
+# Serve the tables behind the charts and filtered rows as CSV/Parquet under /export/
+EXPORTS = _env_bool("MHV_EXPORTS", True)
+
+# Rows serialized per streamed chunk (one Parquet row group each)
+EXPORT_CHUNK_ROWS = _env_int("MHV_EXPORT_CHUNK_ROWS", 50_000)
+
+# Seconds clients and proxies may reuse an export without revalidating
+EXPORT_MAX_AGE = _env_int("MHV_EXPORT_MAX_AGE", 3600)
+
+
+# ============================================================================
+# JSON API (src/api.py)
+# ============================================================================
+
+# Serve the aggregates as JSON under /api/v1/
+API = _env_bool("MHV_API", True)
+
+# Seconds clients and proxies may reuse an API response without revalidating
+API_MAX_AGE = _env_int("MHV_API_MAX_AGE", 300)
+
+
+# ============================================================================
+# REQUEST PROFILING (src/profiling.py)
+# ============================================================================
+
+# Profile a random fraction of callback requests
+PROFILE = _env_bool("MHV_PROFILE")
+PROFILE_SAMPLE_RATE = _env_float("MHV_PROFILE_SAMPLE_RATE", 0.01)
+
+# Secret enabling profiling per request via the "X-Profile" header
+PROFILE_TOKEN = os.environ.get("MHV_PROFILE_TOKEN", "")
+
+# "sample" (collapsed stacks for flame graphs) or "cprofile" (pstats dumps)
+PROFILE_MODE = os.environ.get("MHV_PROFILE_MODE", "sample")
+PROFILE_INTERVAL_MS = _env_float("MHV_PROFILE_INTERVAL_MS", 5)
+
+# Output directory (relative to the project root) and number of profiles kept
+PROFILE_DIR = os.environ.get("MHV_PROFILE_DIR", ".cache/profiles")
+PROFILE_KEEP = _env_int("MHV_PROFILE_KEEP", 200)
+
+
+# ============================================================================
+# DEBUG ENDPOINTS (src/debug.py)
+# ============================================================================
+
+# Secret for the /_debug/ endpoints, sent in the "X-Debug-Token" header; they are
+# not served at all without it
+DEBUG_TOKEN = os.environ.get("MHV_DEBUG_TOKEN", "")
+
+
+# ============================================================================
+# MEMORY ACCOUNTING (src/memory.py)
+# ============================================================================
+
+# Trace Python allocations per stage with tracemalloc (slower), keeping this many frames
+MEMORY_TRACE = _env_bool("MHV_MEMORY_TRACE")
+MEMORY_TRACE_FRAMES = _env_int("MHV_MEMORY_TRACE_FRAMES", 1)
+
+# Record RSS per stage and callback, and serve /_debug/memory with MHV_DEBUG_TOKEN (implied by tracing)
+MEMORY_STATS = _env_bool("MHV_MEMORY_STATS") or MEMORY_TRACE
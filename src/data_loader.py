@@ -1,17 +1,119 @@
 import pandas as pd
+import hashlib
 import os
+import threading
 from pathlib import Path
 
-# Cache for the dataframe
+from .memory import track_memory
+
+# Default dataset location (relative to project root)
+DEFAULT_DATA_PATH = "data/mental_dataset.csv"
+
+# Bump whenever the cleaning (clean_and_convert_types() in preprocessing.py and
+# _clean_chunk() in sql_backend.py) changes its output, so that results derived
+# with the old cleaning are no longer reused
+CLEANING_VERSION = "1"
+
+# Cache for the dataframe as (content version, dataframe); the lock makes
+# concurrent first calls parse the file once
 _df_cache = None
+_df_lock = threading.Lock()
+
+# Content digests by file, valid while the file's fingerprint is unchanged
+_digests = {}
+_digest_lock = threading.Lock()
 
 
-def get_data(filepath="data/mental_dataset.csv"):
+def resolve_path(filepath=DEFAULT_DATA_PATH):
+    """Resolve a dataset path relative to the project root."""
+    return Path(__file__).parent.parent / filepath
+
+
+def get_source_fingerprint(filepath=DEFAULT_DATA_PATH):
     """
-    Load mental health dataset from CSV file with caching.
+    Return a cheap identity of the dataset file (size and modification time).
+    
+    Used to key caches that outlive the process, so that results computed
+    from an older version of the file are not served after it changes.
+    
+    Args:
+        filepath (str): Path to the CSV file (relative to project root)
+    
+    Returns:
+        str: Fingerprint such as "1234567-1700000000000000000", or "missing"
+    """
+    try:
+        stat = resolve_path(filepath).stat()
+    except OSError:
+        return "missing"
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+
+def get_source_digest(filepath=DEFAULT_DATA_PATH):
+    """
+    Return a hash of the dataset file's content.
+    
+    The file is only read again when its fingerprint (size and modification
+    time) changes, so repeated calls cost a stat().
+    
+    Args:
+        filepath (str): Path to the CSV file (relative to project root)
+    
+    Returns:
+        str: Truncated SHA-256 hex digest, or "missing"
+    """
+    full_path = resolve_path(filepath)
+    fingerprint = get_source_fingerprint(filepath)
+    if fingerprint == "missing":
+        return fingerprint
+    
+    with _digest_lock:
+        entry = _digests.get(full_path)
+        if entry is not None and entry[0] == fingerprint:
+            return entry[1]
+        try:
+            with open(full_path, 'rb') as f:
+                digest = hashlib.file_digest(f, 'sha256').hexdigest()[:24]
+        except OSError:
+            return "missing"
+        _digests[full_path] = (fingerprint, digest)
+        return digest
+
+
+def get_content_version(filepath=DEFAULT_DATA_PATH, compress=False):
+    """
+    Return the identity of the cleaned dataset built from a file.
+    
+    It combines the hash of the file's content with CLEANING_VERSION, so it
+    changes exactly when the cleaned data can change: editing the file changes
+    it, while touching or copying the file does not. Aggregate, figure, export
+    and API caches are keyed by it (see cache.set_dataset_version()).
     
     Args:
         filepath (str): Path to the CSV file (relative to project root)
+        compress (bool): Whether the dataset is deduplicated (weighted rows)
+    
+    Returns:
+        str: Version such as "3f2a...c1-clean1", with ":weighted" appended when compressed
+    
+    Example:
+        >>> get_content_version('data/mental_dataset.csv')
+        '29323bfb81b8a7ea384ec6a8-clean1'
+    """
+    version = f"{get_source_digest(filepath)}-clean{CLEANING_VERSION}"
+    return f"{version}:weighted" if compress else version
+
+
+def read_source(filepath=DEFAULT_DATA_PATH, **read_csv_kwargs):
+    """
+    Read the CSV file without caching.
+    
+    Used where the raw frame must not be kept alive, e.g. when parsing straight
+    into the final column types.
+    
+    Args:
+        filepath (str): Path to the CSV file (relative to project root)
+        **read_csv_kwargs: Passed through to pd.read_csv (e.g. dtype)
     
     Returns:
         pd.DataFrame: Loaded dataset
@@ -20,15 +122,8 @@ def get_data(filepath="data/mental_dataset.csv"):
         FileNotFoundError: If the CSV file doesn't exist
         pd.errors.ParserError: If the CSV is malformed
     """
-    global _df_cache
-    
-    # Return cached data if already loaded
-    if _df_cache is not None:
-        return _df_cache
-    
     # Resolve path relative to project root
-    project_root = Path(__file__).parent.parent
-    full_path = project_root / filepath
+    full_path = resolve_path(filepath)
     
     # Check if file exists
     if not full_path.exists():
@@ -36,13 +131,46 @@ def get_data(filepath="data/mental_dataset.csv"):
     
     # Load CSV
     try:
-        _df_cache = pd.read_csv(full_path)
-        return _df_cache
+        with track_memory('read_source'):
+            return pd.read_csv(full_path, **read_csv_kwargs)
     except pd.errors.ParserError as e:
         raise pd.errors.ParserError(f"Failed to parse CSV file: {e}")
 
 
+def get_data(filepath=DEFAULT_DATA_PATH):
+    """
+    Load mental health dataset from CSV file with caching.
+    
+    The cached dataframe is replaced when the file's content changes.
+    
+    Args:
+        filepath (str): Path to the CSV file (relative to project root)
+    
+    Returns:
+        pd.DataFrame: Loaded dataset
+    
+    Raises:
+        FileNotFoundError: If the CSV file doesn't exist
+        pd.errors.ParserError: If the CSV is malformed
+    """
+    global _df_cache
+    
+    # Return cached data if already loaded from the same content
+    version = (resolve_path(filepath), get_source_digest(filepath))
+    cache = _df_cache
+    if cache is not None and cache[0] == version:
+        return cache[1]
+    
+    with _df_lock:
+        if _df_cache is None or _df_cache[0] != version:
+            _df_cache = (version, read_source(filepath))
+        return _df_cache[1]
+
+
 def clear_cache():
-    """Clear the cached dataframe (useful for testing)."""
+    """Clear the cached dataframe and content digests (useful for testing)."""
     global _df_cache
-    _df_cache = None
+    with _df_lock:
+        _df_cache = None
+    with _digest_lock:
+        _digests.clear()
@@ -0,0 +1,245 @@
+"""
+Registry of the selectable survey editions.
+
+Datasets are configured with MHV_DATASETS ("name=path,..."), loaded lazily
+through clean_and_convert_types() on first use and shared by all requests of a
+worker. Their aggregates are cached per dataframe (see cache.py), so dropping a
+dataset also drops its cached results. When the cleaned datasets exceed
+MHV_DATASET_MEMORY_MB together, the least recently used ones are dropped; a
+request still holding a dropped dataset keeps using it until it finishes.
+
+With MHV_HOT_RELOAD=1, each worker watches the files of its loaded datasets.
+A changed file is cleaned and its aggregates are warmed in the background, then
+the new snapshot replaces the old one in a single step. Requests that already
+hold the old snapshot finish with it; later requests get the new one.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from . import config
+from .cache import get_dataset_version
+from .data_loader import get_source_fingerprint, get_content_version
+from .memory import frame_memory_mb
+from .preprocessing import clean_and_convert_types, warm_aggregate_cache, get_stratified_sample
+from .singleflight import SingleFlight
+from .sql_backend import SQLDataset, open_sql_dataset
+
+# Loaded datasets: name -> (cleaned dataframe, size in MB, source fingerprint),
+# least recently used first
+_loaded = OrderedDict()
+_lock = threading.Lock()
+
+# Users picking the same edition at the same time wait for a single load
+_flight = SingleFlight()
+
+# Changed fingerprints seen at the last check, by dataset name (hot reload)
+_changes = {}
+
+# Process the reload watcher runs in (it is not inherited by forked workers)
+_watcher_pid = None
+
+
+def get_dataset_names():
+    """Return the configured dataset names, the default one first."""
+    return list(config.DATASETS)
+
+
+def get_default_dataset():
+    """Return the name of the dataset shown on page load."""
+    return next(iter(config.DATASETS))
+
+
+def get_registry_version():
+    """Return the identity of all configured datasets (see get_content_version)."""
+    return ";".join(
+        f"{name}={get_content_version(path, config.COMPRESS_DUPLICATES)}" for name, path in config.DATASETS.items()
+    )
+
+
+def _evict(keep):
+    """Drop least recently used datasets (never keep) until the memory budget is met."""
+    budget = config.DATASET_MEMORY_MB
+    total = sum(size for _, size, _ in _loaded.values())
+    for name in list(_loaded):
+        if total <= budget:
+            break
+        if name == keep:
+            continue
+        _, size, _ = _loaded.pop(name)
+        total -= size
+
+
+def _clean(name):
+    """Return the cleaned dataframe of a dataset and the fingerprint of the file it came from."""
+    path = config.DATASETS[name]
+    # Taken before reading, so that a change during the read is caught by the next check
+    fingerprint = get_source_fingerprint(path)
+    if config.BACKEND != "pandas":
+        return open_sql_dataset(path, compress=config.COMPRESS_DUPLICATES), fingerprint
+    df = clean_and_convert_types(filepath=path, compress=config.COMPRESS_DUPLICATES)
+    if config.PROGRESSIVE:
+        # Estimates must be cheap from the first request on
+        get_stratified_sample(df, config.PROGRESSIVE_SAMPLE_PER_COUNTRY)
+    return df, fingerprint
+
+
+def _size_mb(df):
+    """Memory held by a loaded dataset (datasets in a database file hold none)."""
+    return 0.0 if isinstance(df, SQLDataset) else float(frame_memory_mb(df))
+
+
+def _load(name):
+    with _lock:
+        if name in _loaded:
+            return _loaded[name][0]
+
+    df, fingerprint = _clean(name)
+
+    with _lock:
+        _loaded[name] = (df, _size_mb(df), fingerprint)
+        _evict(keep=name)
+    return df
+
+
+def get_dataset(name=None):
+    """
+    Return the cleaned dataframe of a dataset, loading it on first use.
+
+    Args:
+        name (str, optional): Dataset name from MHV_DATASETS; None for the default
+
+    Returns:
+        pd.DataFrame: Cleaned dataframe from clean_and_convert_types()
+
+    Raises:
+        KeyError: If no dataset of that name is configured
+
+    Example:
+        >>> df = get_dataset('OSMI 2014')
+    """
+    if name is None:
+        name = get_default_dataset()
+    if name not in config.DATASETS:
+        raise KeyError(f"Unknown dataset: {name}")
+
+    with _lock:
+        entry = _loaded.get(name)
+        if entry is not None:
+            _loaded.move_to_end(name)
+            return entry[0]
+
+    return _flight.do(name, lambda: _load(name))
+
+
+def get_loaded_datasets():
+    """Return {name: size in MB} of the datasets currently in memory, least recently used first."""
+    with _lock:
+        return {name: round(size, 2) for name, (_, size, _) in _loaded.items()}
+
+
+def clear_datasets():
+    """Drop all loaded datasets (useful for testing)."""
+    with _lock:
+        _loaded.clear()
+
+
+# ============================================================================
+# HOT RELOAD
+# ============================================================================
+
+def reload_changed():
+    """
+    Rebuild the loaded datasets whose source file changed and swap them in.
+
+    A file is only read once its fingerprint has stayed the same for two
+    consecutive checks, so a file that is still being written is not picked up
+    half-way. A file whose content is unchanged (e.g. touched or copied over
+    with the same data) is not rebuilt. If the new file cannot be cleaned, the
+    old snapshot stays in place and the same file is not retried.
+
+    Returns:
+        list: Names of the datasets that were replaced
+    """
+    with _lock:
+        loaded = {name: (df, fingerprint) for name, (df, _, fingerprint) in _loaded.items()}
+
+    reloaded = []
+    for name, (loaded_df, loaded_fingerprint) in loaded.items():
+        path = config.DATASETS[name]
+        current = get_source_fingerprint(path)
+        if current in (loaded_fingerprint, "missing"):
+            _changes.pop(name, None)
+            continue
+        if _changes.get(name) != current:
+            _changes[name] = current
+            continue
+        del _changes[name]
+
+        if get_content_version(path, config.COMPRESS_DUPLICATES) == get_dataset_version(loaded_df):
+            with _lock:
+                if name in _loaded:
+                    df, size, _ = _loaded[name]
+                    _loaded[name] = (df, size, current)
+            continue
+
+        try:
+            df, fingerprint = _clean(name)
+            warm_aggregate_cache(df)
+        except Exception as e:
+            print(f"Reloading dataset {name!r} failed, keeping the previous version: {e!r}", flush=True)
+            with _lock:
+                if name in _loaded:
+                    old_df, size, _ = _loaded[name]
+                    _loaded[name] = (old_df, size, current)
+            continue
+
+        with _lock:
+            # Skip datasets evicted while the new version was being built
+            if name in _loaded:
+                _loaded[name] = (df, _size_mb(df), fingerprint)
+                _evict(keep=name)
+                reloaded.append(name)
+    return reloaded
+
+
+def _watch():
+    while True:
+        time.sleep(config.HOT_RELOAD_INTERVAL)
+        try:
+            for name in reload_changed():
+                print(f"Reloaded dataset {name!r} in process {os.getpid()}", flush=True)
+        except Exception as e:
+            print(f"Dataset reload check failed: {e!r}", flush=True)
+
+
+def _ensure_watcher():
+    """Start the reload watcher in this process unless it is already running."""
+    global _watcher_pid
+    if _watcher_pid == os.getpid():
+        return
+    with _lock:
+        if _watcher_pid != os.getpid():
+            _watcher_pid = os.getpid()
+            threading.Thread(target=_watch, name="dataset-reload", daemon=True).start()
+
+
+def init_hot_reload(server):
+    """
+    Start watching the dataset files with the first request of each worker.
+
+    Only installed when MHV_HOT_RELOAD is set. Starting on the first request
+    keeps the thread out of a pre-fork master, where it would not survive the fork.
+
+    Args:
+        server (flask.Flask): The Dash app's server
+
+    Returns:
+        bool: True if the hook was installed
+    """
+    if not config.HOT_RELOAD:
+        return False
+
+    server.before_request(_ensure_watcher)
+    return True
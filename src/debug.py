@@ -0,0 +1,39 @@
+"""
+Access control for the /_debug/ endpoints.
+
+Debug endpoints expose process internals (memory by stage, admission queues), so
+they are only registered when MHV_DEBUG_TOKEN is set, and only answer requests
+carrying the header "X-Debug-Token: <token>"; any other request gets a 404, as if
+the endpoint did not exist.
+"""
+import hmac
+
+import flask
+
+from . import config
+
+
+def add_debug_route(server, rule, endpoint, view):
+    """
+    Register a debug endpoint behind the MHV_DEBUG_TOKEN header check.
+
+    Args:
+        server (flask.Flask): The Dash app's server
+        rule (str): URL rule, e.g. "/_debug/memory"
+        endpoint (str): Flask endpoint name
+        view (callable): View function returning the response
+
+    Returns:
+        bool: True if the endpoint was registered (MHV_DEBUG_TOKEN is set)
+    """
+    if not config.DEBUG_TOKEN:
+        return False
+
+    def guarded_view():
+        token = flask.request.headers.get("X-Debug-Token", "")
+        if not hmac.compare_digest(token.encode(), config.DEBUG_TOKEN.encode()):
+            flask.abort(404)
+        return view()
+
+    server.add_url_rule(rule, endpoint, guarded_view)
+    return True
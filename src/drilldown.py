@@ -0,0 +1,111 @@
+"""
+Drill-down table of a country's individual responses.
+
+The table (responses-table in layouts.py) pages, sorts and filters on the
+server: each request translates the DataTable's page_current, sort_by and
+filter_query into a get_response_page() call, which finds the country's rows
+through a cached row index and sorts them by cached per-column ranks. Only the
+visible page of rows is serialized.
+"""
+import math
+import re
+
+from . import config
+from .preprocessing import WEIGHT_COLUMN, get_response_page
+
+# DataTable filter operators -> get_response_page() operators
+OPERATORS = {
+    '=': '=', 'eq': '=',
+    '!=': '!=', 'ne': '!=',
+    '<': '<', 'lt': '<',
+    '<=': '<=', 'le': '<=',
+    '>': '>', 'gt': '>',
+    '>=': '>=', 'ge': '>=',
+    'contains': 'contains',
+    'datestartswith': 'datestartswith',
+}
+
+# One term of a filter_query, e.g. {Gender} scontains "Female"
+_TERM = re.compile(r"^\{(?P<column>[^}]+)\}\s+(?P<operator>\S+)\s+(?P<value>.+)$")
+
+
+def parse_filter_query(filter_query, columns):
+    """
+    Translate a DataTable filter_query into (column, operator, value) filters.
+
+    Terms on unknown columns or with unsupported operators are ignored, like
+    the table itself ignores invalid filter input.
+
+    Args:
+        filter_query (str): The table's filter_query, terms joined by " && "
+        columns (list): Filterable column names
+
+    Returns:
+        list: (column, operator, value) triples for get_response_page()
+
+    Example:
+        >>> parse_filter_query('{Gender} s= Female && {Timestamp} >= 2014-08-01', columns)
+        [('Gender', '=', 'Female'), ('Timestamp', '>=', '2014-08-01')]
+    """
+    filters = []
+    for term in (filter_query or "").split(" && "):
+        match = _TERM.match(term.strip())
+        if match is None or match['column'] not in columns:
+            continue
+        operator = match['operator']
+        # Case-sensitive/insensitive variants ("scontains", "i=", ...)
+        if operator not in OPERATORS and operator[:1] in ('s', 'i'):
+            operator = operator[1:]
+        if operator not in OPERATORS:
+            continue
+
+        value = match['value'].strip()
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'`":
+            value = value[1:-1].replace("\\" + value[0], value[0])
+        filters.append((match['column'], OPERATORS[operator], value))
+    return filters
+
+
+def table_columns(df):
+    """Return the DataTable column definitions for the rows of df."""
+    columns = [
+        {'name': column.replace('_', ' '), 'id': column, 'type': 'datetime' if column == 'Timestamp' else 'text'}
+        for column in df.columns if column != WEIGHT_COLUMN
+    ]
+    if WEIGHT_COLUMN in df.columns or getattr(df, 'weighted', False):
+        # Deduplicated datasets list unique rows with their number of responses
+        columns.append({'name': 'Responses', 'id': WEIGHT_COLUMN, 'type': 'numeric'})
+    return columns
+
+
+def get_response_table(df, country, page, page_size, sort_by, filter_query):
+    """
+    Return one page of the responses table of a country.
+
+    Args:
+        df (pd.DataFrame | SQLDataset): Cleaned dataset
+        country (str): Country name
+        page (int): The table's page_current
+        page_size (int): The table's page_size
+        sort_by (list): The table's sort_by, [{'column_id', 'direction'}, ...]
+        filter_query (str): The table's filter_query
+
+    Returns:
+        tuple: (records of the page, column definitions, page count, summary text)
+    """
+    columns = table_columns(df)
+    names = [column['id'] for column in columns if column['id'] != WEIGHT_COLUMN]
+    sort = [(entry['column_id'], entry['direction'] == 'asc') for entry in sort_by or [] if entry['column_id'] in names]
+    filters = parse_filter_query(filter_query, names)
+
+    page_size = page_size or config.DRILLDOWN_PAGE_SIZE
+    try:
+        rows, total = get_response_page(df, country, page or 0, page_size, sort, filters)
+    except ValueError:
+        # A value the column cannot be compared with (e.g. a malformed date)
+        rows, _ = get_response_page(df, country, 0, 0)
+        total = 0
+
+    records = rows.astype(object).where(rows.notna(), None).to_dict('records')
+    summary = f"{total:,} {'unique rows' if any(c['id'] == WEIGHT_COLUMN for c in columns) else 'responses'}"
+    return records, columns, max(1, math.ceil(total / page_size)), summary
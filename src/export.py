@@ -0,0 +1,285 @@
+"""
+Download endpoints for the numbers behind the charts.
+
+    /export/choropleth.csv                   every metric per country
+    /export/radar.csv?country=Canada         secondary chart tables (radar, butterfly,
+                                             stacked_bar); all countries without ?country=
+    /export/rows.parquet?Country=Canada      respondent rows, filtered by column values
+                                             (repeat a parameter to accept several values)
+
+Every endpoint takes an optional ?dataset=<name> and serves .csv or .parquet
+(Parquet needs pyarrow). Bodies are generated in chunks of MHV_EXPORT_CHUNK_ROWS
+rows while being sent, so an export is never held in memory as a whole. Responses
+carry an ETag derived from the dataset version and the request, and support
+If-None-Match and single byte ranges (Range/If-Range) once the export's length is
+known from a complete download.
+"""
+import importlib.util
+import io
+
+import flask
+import numpy as np
+from werkzeug.datastructures import ContentRange
+
+from . import config
+from .cache import RESULTS_VERSION, content_key, get_dataset_version
+from .datasets import get_dataset
+from .preprocessing import WEIGHT_COLUMN, get_choropleth_table, get_country_chart_table, get_countries, filter_rows
+from .sql_backend import SQLDataset
+
+CHART_TABLES = ('radar', 'butterfly', 'stacked_bar')
+
+MIMETYPES = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+# Byte length of exports by ETag, learnt from complete downloads (bounded, oldest dropped first)
+_lengths = {}
+LENGTHS_SIZE = 1024
+
+
+# ============================================================================
+# CHUNKING AND SERIALIZATION
+# ============================================================================
+
+def _table_chunks(table):
+    """Yield a (small) table in chunks of EXPORT_CHUNK_ROWS rows."""
+    yield table.iloc[:config.EXPORT_CHUNK_ROWS]
+    for start in range(config.EXPORT_CHUNK_ROWS, len(table), config.EXPORT_CHUNK_ROWS):
+        yield table.iloc[start:start + config.EXPORT_CHUNK_ROWS]
+
+
+def _row_chunks(df, positions):
+    """
+    Yield the rows of df at positions in chunks of about EXPORT_CHUNK_ROWS rows.
+
+    Deduplicated frames are expanded back to one row per respondent chunk by
+    chunk; chunks are cut by cumulative weight so each expands to about the
+    chunk size.
+    """
+    chunk_rows = config.EXPORT_CHUNK_ROWS
+    if len(positions) == 0:
+        yield df.iloc[:0].drop(columns=WEIGHT_COLUMN, errors='ignore')
+        return
+
+    if WEIGHT_COLUMN not in df.columns:
+        for start in range(0, len(positions), chunk_rows):
+            yield df.iloc[positions[start:start + chunk_rows]]
+        return
+
+    cumulative = np.cumsum(df[WEIGHT_COLUMN].to_numpy()[positions])
+    start = 0
+    while start < len(positions):
+        done = cumulative[start - 1] if start else 0
+        stop = max(start + 1, int(np.searchsorted(cumulative, done + chunk_rows, side='right')))
+        chunk = df.iloc[positions[start:stop]]
+        yield chunk.loc[chunk.index.repeat(chunk[WEIGHT_COLUMN])].drop(columns=WEIGHT_COLUMN)
+        start = stop
+
+
+def _csv_bytes(chunks):
+    header = True
+    for chunk in chunks:
+        yield chunk.to_csv(index=False, header=header).encode()
+        header = False
+
+
+class _Drain(io.RawIOBase):
+    """Write-only file that hands out the bytes written since the last drain()."""
+
+    def __init__(self):
+        super().__init__()
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def _parquet_bytes(chunks):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _Drain()
+    writer = None
+    for chunk in chunks:
+        table = pa.Table.from_pandas(chunk, preserve_index=False, schema=writer.schema if writer else None)
+        if writer is None:
+            writer = pq.ParquetWriter(sink, table.schema)
+        writer.write_table(table)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+SERIALIZERS = {
+    'csv': _csv_bytes,
+    'parquet': _parquet_bytes,
+}
+
+
+# ============================================================================
+# HTTP
+# ============================================================================
+
+def _remember_length(etag, body):
+    """Pass body through and record its total length once it was sent completely."""
+    length = 0
+    for data in body:
+        length += len(data)
+        yield data
+    if len(_lengths) >= LENGTHS_SIZE:
+        _lengths.pop(next(iter(_lengths)), None)
+    _lengths[etag] = length
+
+
+def _byte_slice(body, start, stop):
+    """Yield bytes [start, stop) of body, stopping generation once stop is reached."""
+    offset = 0
+    for data in body:
+        end = offset + len(data)
+        if end > start:
+            yield data[max(0, start - offset):stop - offset]
+        if end >= stop:
+            return
+        offset = end
+
+
+def _requested_range(etag):
+    """Return the request's single byte range, or None if the whole body should be sent."""
+    request = flask.request
+    if request.range is None or len(request.range.ranges) != 1 or request.range.units != 'bytes':
+        return None
+    # If-Range: only send a part of the same version the client already has
+    if_range = request.if_range
+    if (if_range.etag or if_range.date) and if_range.etag != etag:
+        return None
+    return request.range
+
+
+def _send(filename, fmt, etag, make_chunks):
+    """Stream make_chunks() serialized as fmt, honouring conditional and range requests."""
+    serialize = SERIALIZERS[fmt]
+    headers = {
+        'Cache-Control': f"public, max-age={config.EXPORT_MAX_AGE}",
+        'Accept-Ranges': 'bytes',
+        'Content-Disposition': f'attachment; filename="{filename}.{fmt}"',
+    }
+
+    if etag is None:
+        # Data not tied to a source file: no validators, no ranges
+        headers.pop('Accept-Ranges')
+        return flask.Response(serialize(make_chunks()), mimetype=MIMETYPES[fmt], headers=headers)
+
+    if flask.request.if_none_match.contains(etag):
+        response = flask.Response(status=304, headers=headers)
+        response.set_etag(etag)
+        return response
+
+    # The Content-Range needs the total length, which is only known once the export
+    # has been sent completely; until then a range request gets the whole body
+    length = _lengths.get(etag)
+    byte_range = _requested_range(etag) if length is not None else None
+
+    span = byte_range.range_for_length(length) if byte_range is not None else None
+    if byte_range is not None and span is None:
+        response = flask.Response(status=416, headers=headers)
+        response.headers['Content-Range'] = f"bytes */{length}"
+        return response
+
+    if span is not None:
+        start, stop = span
+        response = flask.Response(
+            _byte_slice(serialize(make_chunks()), start, stop),
+            status=206, mimetype=MIMETYPES[fmt], headers=headers,
+        )
+        response.content_range = ContentRange('bytes', start, stop, length)
+        response.content_length = stop - start
+    else:
+        response = flask.Response(
+            _remember_length(etag, serialize(make_chunks())),
+            mimetype=MIMETYPES[fmt], headers=headers,
+        )
+        if length is not None:
+            response.content_length = length
+
+    response.set_etag(etag)
+    return response
+
+
+def _export(name, fmt):
+    if fmt not in SERIALIZERS:
+        flask.abort(404)
+    if fmt == 'parquet' and importlib.util.find_spec('pyarrow') is None:
+        flask.abort(501, description="Parquet export needs pyarrow (pip install pyarrow)")
+
+    args = flask.request.args
+    try:
+        df = get_dataset(args.get('dataset'))
+    except KeyError:
+        flask.abort(404, description=f"Unknown dataset {args.get('dataset')!r}")
+
+    if name == 'choropleth':
+        make_chunks = lambda: _table_chunks(get_choropleth_table(df))
+    elif name in CHART_TABLES:
+        countries = args.getlist('country') or None
+        # Same answer as the JSON API for unknown countries (instead of all-zero rows)
+        known = set(get_countries(df))
+        unknown = [country for country in countries or [] if country not in known]
+        if unknown:
+            flask.abort(404, description=f"Unknown countries: {unknown}")
+        make_chunks = lambda: _table_chunks(get_country_chart_table(df, name, countries))
+    elif name == 'rows':
+        filters = {column: values for column, values in args.lists() if column != 'dataset'}
+        if isinstance(df, SQLDataset):
+            unknown = [column for column in filters if column not in df.columns]
+            if unknown:
+                flask.abort(400, description=f"Unknown column {unknown[0]!r}")
+            make_chunks = lambda: df.iter_frames(filters, config.EXPORT_CHUNK_ROWS)
+        else:
+            try:
+                positions = filter_rows(df, filters)
+            except KeyError as e:
+                flask.abort(400, description=f"Unknown column {e.args[0]!r}")
+            make_chunks = lambda: _row_chunks(df, positions)
+    else:
+        flask.abort(404)
+
+    version = get_dataset_version(df)
+    etag = None
+    if version is not None:
+        query = sorted((key, tuple(values)) for key, values in args.lists())
+        etag = content_key('export', RESULTS_VERSION, version, name, fmt, query, config.EXPORT_CHUNK_ROWS).split(':', 1)[1][:32]
+
+    return _send(name, fmt, etag, make_chunks)
+
+
+def init_exports(server):
+    """
+    Register the /export/ endpoints on the Flask server if exports are enabled.
+
+    Args:
+        server (flask.Flask): The Dash app's server
+
+    Returns:
+        bool: True if the endpoints were registered
+    """
+    if not config.EXPORTS:
+        return False
+
+    server.add_url_rule("/export/<name>.<fmt>", "export", _export)
+    return True
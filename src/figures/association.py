@@ -0,0 +1,98 @@
+import plotly.graph_objects as go
+from .. import config
+from ..cache import cached_figure
+from ..theme import CHART_TITLE_STYLE, FONT
+from .skeleton import from_skeleton
+
+@cached_figure
+def create_association_heatmap(association_table, scope):
+    """
+    Create a heatmap of Cramér's V between every pair of categorical columns.
+
+    Args:
+        association_table (pd.DataFrame): Output from get_association_table()
+        scope (str): What the table covers, e.g. a country name (shown in the title)
+
+    Returns:
+        dict: Heatmap figure as plain Plotly JSON (cached by input)
+    """
+    if config.FAST_FIGURES:
+        return fill_association_heatmap(association_table, scope)
+    return build_association_heatmap(association_table, scope)
+
+
+def _matrices(association_table):
+    """
+    Symmetric matrices of the association table, in the order of its columns.
+
+    Returns:
+        tuple: (column labels, Cramér's V rows, [chi2, dof] rows); the diagonal
+               and undefined values are None (empty cells)
+    """
+    columns = list(dict.fromkeys([*association_table['column1'], *association_table['column2']]))
+    position = {column: i for i, column in enumerate(columns)}
+
+    values = [[None] * len(columns) for _ in columns]
+    statistics = [[None] * len(columns) for _ in columns]
+    for column1, column2, chi2, dof, cramers_v in association_table[
+        ['column1', 'column2', 'chi2', 'dof', 'cramers_v']
+    ].itertuples(index=False):
+        i, j = position[column1], position[column2]
+        if cramers_v == cramers_v:  # not NaN
+            values[i][j] = values[j][i] = cramers_v
+            statistics[i][j] = statistics[j][i] = [chi2, dof]
+
+    labels = [column.replace('_', ' ') for column in columns]
+    return labels, values, statistics
+
+
+def build_association_heatmap(association_table, scope):
+    """Build the association heatmap with plotly.py (validated go.Figure)."""
+    labels, values, statistics = _matrices(association_table)
+
+    fig = go.Figure(go.Heatmap(
+        x=labels,
+        y=labels,
+        z=values,
+        customdata=statistics,
+        zmin=0,
+        zmax=1,
+        colorscale="YlGnBu",
+        xgap=1,
+        ygap=1,
+        colorbar=dict(title="Cramér's V", thickness=15),
+        hovertemplate=(
+            "%{y} × %{x}<br>"
+            "Cramér's V: <b>%{z:.3f}</b><br>"
+            "χ²: %{customdata[0]:,.1f} (%{customdata[1]} degrees of freedom)<extra></extra>"
+        ),
+        hoverlabel=dict(font=dict(family=FONT, color="black")),
+    ))
+
+    fig.update_layout(
+        title=dict(
+            text=f"Association Between Survey Answers: {scope}",
+            **CHART_TITLE_STYLE
+        ),
+        xaxis=dict(tickangle=-45, showgrid=False),
+        yaxis=dict(autorange="reversed", showgrid=False),
+        margin=dict(l=30, r=30, t=65, b=30),
+        paper_bgcolor="rgba(0,0,0,0)",
+        plot_bgcolor="rgba(0,0,0,0)",
+        font_family=FONT, font_color="black"
+    )
+
+    return fig
+
+
+def fill_association_heatmap(association_table, scope):
+    """Fast path: fill the data into a copy of the association heatmap skeleton."""
+    labels, values, statistics = _matrices(association_table)
+    fig = from_skeleton(build_association_heatmap, tuple(labels), association_table, scope)
+
+    trace = fig['data'][0]
+    trace['z'] = values
+    trace['customdata'] = statistics
+    fig['layout']['title']['text'] = f"Association Between Survey Answers: {scope}"
+
+    return fig
@@ -1,18 +1,28 @@
 import plotly.graph_objects as go
-from ..theme import COUNTRY_COLORS,CHART_TITLE_STYLE, FONT
+from .. import config
+from ..cache import cached_figure
+from ..theme import country_color, CHART_TITLE_STYLE, FONT
+from .skeleton import from_skeleton, countries_key, color_slots
 
+@cached_figure
 def create_butterfly_chart(butterfly_data):
+    """Create the butterfly chart as plain Plotly JSON (cached by input)."""
+    if config.FAST_FIGURES:
+        return fill_butterfly_chart(butterfly_data)
+    return build_butterfly_chart(butterfly_data)
 
-    countries = [butterfly_data["country1"]]
-    if butterfly_data["country2"]:
-        countries.append(butterfly_data["country2"])
 
+def build_butterfly_chart(butterfly_data):
+    """Build the butterfly chart with plotly.py (validated go.Figure)."""
+
+    countries = butterfly_data["countries"]
     days = butterfly_data['days_indoors_order']
 
     fig = go.Figure()
+    slots = color_slots(countries)
 
     for status in ['employed', 'self_employed']:
-        for country in countries:
+        for country, slot in zip(countries, slots):
             data = [
                 country[status][d]
                 for d in days
@@ -30,7 +40,7 @@ def create_butterfly_chart(butterfly_data):
                 customdata=data,
                 legendgroup=country['name'],
                 name=country['name'],
-                marker_color=COUNTRY_COLORS['country1'] if country['name'] == countries[0]['name'] else COUNTRY_COLORS['country2'],
+                marker_color=country_color(slot),
                 hovertemplate='%{y}: <b>%{customdata}%</b>',
                 showlegend=True if status == 'employed' else False,
                 textfont=dict(family=FONT, color="black"),
@@ -70,3 +80,24 @@ def create_butterfly_chart(butterfly_data):
     )
 
     return fig
+
+
+def fill_butterfly_chart(butterfly_data):
+    """Fast path: fill the data into a copy of the butterfly chart skeleton."""
+    countries = butterfly_data["countries"]
+    days = butterfly_data['days_indoors_order']
+    fig = from_skeleton(build_butterfly_chart, countries_key(countries), butterfly_data)
+
+    traces = iter(fig['data'])
+    for status in ['employed', 'self_employed']:
+        for country in countries:
+            trace = next(traces)
+            data = [country[status][d] for d in days]
+
+            trace['y'] = days
+            trace['x'] = [-v for v in data] if status == 'employed' else data
+            trace['customdata'] = data
+            trace['legendgroup'] = country['name']
+            trace['name'] = country['name']
+
+    return fig
@@ -1,10 +1,14 @@
 import plotly.express as px
+from .. import config
+from ..cache import cached_figure
 from ..theme import FONT
+from .skeleton import from_skeleton, typed_array
 
 """
 Custom titles for choropleth maps based on the selected metric.
 """
 
+@cached_figure
 def create_choropleth(df, metric_label):
     """
     Create a choropleth map visualization.
@@ -15,8 +19,15 @@ def create_choropleth(df, metric_label):
         metric_label (str): Label for the metric to display in title/legend
     
     Returns:
-        plotly.graph_objects.Figure: Choropleth map figure
+        dict: Choropleth map figure as plain Plotly JSON (cached by input)
     """
+    if config.FAST_FIGURES:
+        return fill_choropleth(df, metric_label)
+    return build_choropleth(df, metric_label)
+
+
+def build_choropleth(df, metric_label):
+    """Build the choropleth map with plotly.express (validated go.Figure)."""
     fig = px.choropleth(
         df,
         locations="Country",
@@ -70,4 +81,18 @@ def create_choropleth(df, metric_label):
         )
     )
     fig.update_traces(hoverinfo='none', hovertemplate=None)
-    return fig
\ No newline at end of file
+    return fig
+
+
+def fill_choropleth(df, metric_label):
+    """Fast path: fill the data into a copy of the choropleth skeleton."""
+    fig = from_skeleton(build_choropleth, 'choropleth', df, metric_label)
+
+    countries = df['Country'].tolist()
+    trace = fig['data'][0]
+    trace['locations'] = countries
+    trace['hovertext'] = countries
+    trace['customdata'] = df[['Country', 'metric_value', 'respondents']].values.tolist()
+    trace['z'] = typed_array(df['metric_value'])
+
+    return fig
@@ -1,6 +1,10 @@
 import plotly.graph_objects as go
-from ..theme import COUNTRY_COLORS, CHART_TITLE_STYLE, FONT
+from .. import config
+from ..cache import cached_figure
+from ..theme import country_color, CHART_TITLE_STYLE, FONT
+from .skeleton import from_skeleton, countries_key, color_slots
 
+@cached_figure
 def create_radar_chart(radar_data):
     """
     Create a radar chart for mental health metrics.
@@ -9,18 +13,22 @@ def create_radar_chart(radar_data):
         radar_data (dict): Output from get_radar_data()
     
     Returns:
-        fig (go.Figure): Plotly radar chart figure
+        fig (dict): Plotly radar chart figure as plain JSON (cached by input)
     """
+    if config.FAST_FIGURES:
+        return fill_radar_chart(radar_data)
+    return build_radar_chart(radar_data)
 
-    countries = [radar_data["country1"]]
-    if radar_data["country2"]:
-        countries.append(radar_data["country2"])
-    
+
+def build_radar_chart(radar_data):
+    """Build the radar chart with plotly.py (validated go.Figure)."""
+
+    countries = radar_data["countries"]
     metrics = radar_data['metrics']
 
     fig = go.Figure()
 
-    for country in countries:
+    for country, slot in zip(countries, color_slots(countries)):
         values = country['values']
         
         fig.add_trace(go.Scatterpolar(
@@ -28,7 +36,7 @@ def create_radar_chart(radar_data):
             theta=metrics + [metrics[0]],
             fill=None,
             name=country['name'],
-            marker_color=COUNTRY_COLORS['country1'] if country['name'] == countries[0]['name'] else COUNTRY_COLORS['country2'],
+            marker_color=country_color(slot),
             hovertemplate='%{theta}: <b>%{r}%</b><extra></extra>',
             textfont=dict(family=FONT, color="black"),
             hoverlabel=dict(
@@ -63,3 +71,17 @@ def create_radar_chart(radar_data):
 
     return fig
 
+
+def fill_radar_chart(radar_data):
+    """Fast path: fill the data into a copy of the radar chart skeleton."""
+    countries = radar_data["countries"]
+    metrics = radar_data['metrics']
+    fig = from_skeleton(build_radar_chart, countries_key(countries), radar_data)
+
+    for trace, country in zip(fig['data'], countries):
+        values = country['values']
+        trace['r'] = values + [values[0]]
+        trace['theta'] = metrics + [metrics[0]]
+        trace['name'] = country['name']
+
+    return fig
@@ -0,0 +1,64 @@
+"""
+Figure skeletons for the fast build path.
+
+Building a figure with plotly.py validates every property on every call. The
+fast path builds a figure of each structure (number of countries, ...) once with
+plotly.py, keeps its JSON, and afterwards only fills the data arrays of a fresh
+copy, which gives the same figure without any validation.
+"""
+import base64
+import json
+
+import numpy as np
+
+# Serialized figures by (builder, structure key)
+_skeletons = {}
+
+
+def from_skeleton(builder, key, *sample_args):
+    """
+    Return a fresh dict copy of the skeleton figure for a structure.
+
+    The first call for a key builds the skeleton with builder(*sample_args); the
+    caller then overwrites every data-dependent field.
+
+    Args:
+        builder (callable): plotly.py builder returning a go.Figure
+        key (hashable): Identity of everything in the figure the caller does not fill
+        *sample_args: Arguments for builder with that structure
+
+    Returns:
+        dict: Figure as plain JSON-compatible dict
+    """
+    skeleton_key = (builder.__qualname__, key)
+    payload = _skeletons.get(skeleton_key)
+    if payload is None:
+        payload = builder(*sample_args).to_json()
+        _skeletons[skeleton_key] = payload
+    return json.loads(payload)
+
+
+def color_slots(countries):
+    """
+    Colour slot of every compared country: the position of its first occurrence.
+
+    A country compared with itself keeps one colour.
+    """
+    names = [country['name'] for country in countries]
+    return [names.index(name) for name in names]
+
+
+def countries_key(countries):
+    """
+    Structure key for comparison charts: number of countries and their colour slots.
+
+    The builders pick colours by color_slots(), so a country compared with itself
+    has a different skeleton than distinct countries.
+    """
+    return tuple(color_slots(countries))
+
+
+def typed_array(values, dtype='f8'):
+    """Encode numbers as a base64 typed array, the way plotly.py serializes numpy arrays."""
+    array = np.asarray(values, dtype=np.dtype(dtype).newbyteorder('<'))
+    return {'dtype': dtype, 'bdata': base64.b64encode(array.tobytes()).decode('ascii')}
@@ -1,19 +1,28 @@
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from ..theme import STACKED_CHART_COLOR, CHART_TITLE_STYLE, FONT
+from .. import config
+from ..cache import cached_figure
+from ..theme import stacked_colors, CHART_TITLE_STYLE, FONT
+from .skeleton import from_skeleton, countries_key, color_slots
 
+@cached_figure
 def create_stacked_bar_chart(stacked_data):
     """
     Create horizontal stacked bar chart showing:
     Social Weakness (Y) vs Mental Health Interview (stacked).
     
-    Supports one or two countries (displayed vertically).
+    Supports any number of countries (displayed vertically). Returns the figure
+    as plain Plotly JSON (cached by input).
     """
+    if config.FAST_FIGURES:
+        return fill_stacked_bar_chart(stacked_data)
+    return build_stacked_bar_chart(stacked_data)
 
-    countries = [stacked_data["country1"]]
-    if stacked_data["country2"]:
-        countries.append(stacked_data["country2"])
-    
+
+def build_stacked_bar_chart(stacked_data):
+    """Build the stacked bar chart with plotly.py (validated go.Figure)."""
+
+    countries = stacked_data["countries"]
 
     social_weakness_order = stacked_data["social_weakness_order"]
     interview_responses_order = stacked_data["interview_responses"]
@@ -23,11 +32,12 @@ def create_stacked_bar_chart(stacked_data):
         rows=len(countries),
         cols=1,
         shared_xaxes=True,
-        vertical_spacing=0.15,
+        # Same gap in pixels for any number of rows (each row is 300px high)
+        vertical_spacing=0.3 / max(len(countries), 2),
         subplot_titles=[c["name"] for c in countries]
     )
 
-    for row, country in enumerate(countries, start=1):
+    for row, (country, slot) in enumerate(zip(countries, color_slots(countries)), start=1):
         for interview in interview_responses_order:
             # Pro každý Social_Weakness získáme procenta dané odpovědi
             values = [country[weakness][interview] for weakness in social_weakness_order]
@@ -40,7 +50,7 @@ def create_stacked_bar_chart(stacked_data):
                     x=values,                    # X = %
                     orientation="h",
                     name=interview,              # stack = mental_health_interview
-                    marker_color=STACKED_CHART_COLOR['country1'][interview] if country['name'] == countries[0]['name'] else STACKED_CHART_COLOR['country2'][interview],
+                    marker_color=stacked_colors(slot)[interview],
                     text=text_values,               # zobrazit text uvnitř segmentu
                     textfont=dict(family=FONT,color="black"),
                     hoverlabel=dict(
@@ -93,3 +103,31 @@ def create_stacked_bar_chart(stacked_data):
     )
 
     return fig
+
+
+def fill_stacked_bar_chart(stacked_data):
+    """Fast path: fill the data into a copy of the stacked bar chart skeleton."""
+    countries = stacked_data["countries"]
+
+    social_weakness_order = stacked_data["social_weakness_order"]
+    interview_responses_order = stacked_data["interview_responses"]
+
+    # Trace names and hover texts come from the category orders
+    key = (countries_key(countries), tuple(social_weakness_order), tuple(interview_responses_order))
+    fig = from_skeleton(build_stacked_bar_chart, key, stacked_data)
+
+    traces = iter(fig['data'])
+    for country in countries:
+        for interview in interview_responses_order:
+            trace = next(traces)
+            values = [country[weakness][interview] for weakness in social_weakness_order]
+
+            trace['y'] = social_weakness_order
+            trace['x'] = values
+            trace['text'] = [interview if v > 0 else "" for v in values]
+
+    # Subplot titles come first, the axis label annotation last
+    for annotation, country in zip(fig['layout']['annotations'], countries):
+        annotation['text'] = country['name']
+
+    return fig
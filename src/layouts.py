@@ -1,6 +1,8 @@
-from dash import html, dcc
+from dash import html, dcc, dash_table
 import dash_bootstrap_components as dbc
 
+from . import config
+
 # Metric options for dropdown (value -> label)
 METRIC_OPTIONS = [
     {'value': 'treatment_rate', 'label': 'Seeking Treatment'},
@@ -50,9 +52,27 @@ CHOROPLETH_TITLES = {
     'mental_health_interview_rate': "Willigness to Bring Up Mental Health in an Interview"
 }
 
-def create_layout(figures=None):
-    if figures is None:
-        figures = {}
+# Shown until a chart's figure arrives (no axes or grid; see hydrate_secondary_graphs in app.py)
+PLACEHOLDER_FIGURE = {
+    'data': [],
+    'layout': {
+        'xaxis': {'visible': False},
+        'yaxis': {'visible': False},
+        'paper_bgcolor': 'rgba(0,0,0,0)',
+        'plot_bgcolor': 'rgba(0,0,0,0)',
+    },
+}
+
+def approximate_label(error):
+    """Badge text for charts showing sample estimates with the given largest error bound."""
+    return f"Estimated from a sample (\u00b1{error:.1f} pts), refining\u2026"
+
+
+def create_layout(datasets=None, countries=None):
+    if datasets is None:
+        datasets = []
+    if countries is None:
+        countries = []
     
     return html.Div(
         id="dashboard",
@@ -131,7 +151,7 @@ def create_layout(figures=None):
                                                             html.H5("Interactivity"),
                                                             html.Ul([
                                                                 html.Li("Select a country by clicking on the map, then choose 'Select as first' or 'Select as second'."),
-                                                                html.Li("Compare up to two countries to see detailed charts update automatically."),
+                                                                html.Li("Compare the two selected countries to see detailed charts update automatically; add further countries with 'Compare more countries'."),
                                                                 html.Li("Change the mapped metric using the 'Mental health indicator' dropdown."),
                                                                 html.Li("Remove a country selection by clicking the trash icon."),
                                                             ]),
@@ -148,12 +168,24 @@ def create_layout(figures=None):
                                                             
                                                             html.B("Radar Chart"),
                                                             html.P("Provides a holistic comparison of multiple key mental health metrics simultaneously."),
+
+                                                            html.B("Associations"),
+                                                            html.P("The grid button shows how strongly the answers to every pair of survey questions are related (Cram\u00e9r's V), for all countries or one country."),
                                                         ]),
                                                     ],
                                                     target="use-btn",
                                                     trigger="click",
                                                     style={"maxWidth": "600px"},
                                                 ),
+                                                dbc.Button(
+                                                    children=[
+                                                        html.I(className="bi bi-grid-3x3-gap"),
+                                                    ],
+                                                    color="light",
+                                                    id="associations-btn",
+                                                    title="Associations between survey answers",
+                                                    n_clicks=0,
+                                                ),
                                             ])
                                         ]
                                     ),
@@ -204,6 +236,42 @@ def create_layout(figures=None):
                                                                 ]
                                                             )
                                                         ]
+                                                    ),
+                                                    # Further countries shown next to the two selected ones
+                                                    html.Div(
+                                                        className="dropdown-metric-area",
+                                                        children=[
+                                                            dcc.Dropdown(
+                                                                id="compare-more-dropdown",
+                                                                options=countries,
+                                                                value=[],
+                                                                multi=True,
+                                                                className="dropdown-metric",
+                                                                placeholder="Compare more countries...",
+                                                                optionHeight=40,
+                                                            )
+                                                        ]
+                                                    )
+                                                ]
+                                            ),
+                                            # Dataset Selector (only shown with several editions)
+                                            html.Div(
+                                                className="metric-selector",
+                                                style={} if len(datasets) > 1 else {"display": "none"},
+                                                children=[
+                                                    html.Div("Survey edition", className="toggles-label"),
+                                                    html.Div(
+                                                        className="dropdown-metric-area",
+                                                        children=[
+                                                            dcc.Dropdown(
+                                                                id="dataset-dropdown",
+                                                                options=datasets,
+                                                                value=datasets[0] if datasets else None,
+                                                                clearable=False,
+                                                                className="dropdown-metric",
+                                                                optionHeight=40,
+                                                            )
+                                                        ]
                                                     )
                                                 ]
                                             ),
@@ -271,7 +339,7 @@ def create_layout(figures=None):
                                         className="stacked-bar-chart",
                                         children=dcc.Graph(
                                             id="stacked-bar",
-                                            figure=figures.get('stacked_bar', {}),
+                                            figure=PLACEHOLDER_FIGURE,
                                             responsive=True,
                                             style={'height': '100%', 'width': '100%'}
                                         )
@@ -289,6 +357,15 @@ def create_layout(figures=None):
                                 children=CHOROPLETH_TITLES['treatment_rate'],
                                 className="choropleth-title"
                             ),
+                            # Shown while the map shows sample estimates (progressive mode)
+                            html.Div(id="choropleth-approx", className="approx-badge", style={"display": "none"}),
+                            dcc.Store(id='choropleth-refine-store'),
+                            # Every metric per country, for switching metrics in the browser
+                            # (None: metric changes are sent to the server via the fallback store)
+                            dcc.Store(id='choropleth-matrix-store'),
+                            dcc.Store(id='choropleth-fallback-store'),
+                            # Progress of background recomputation (hidden unless a job is running)
+                            dbc.Progress(id="choropleth-progress", value=0, className="job-progress", style={"display": "none"}),
                             # Stores the country immediately clicked (temporary)
                             dcc.Store(id='temp-click-store'),
                             # The final selections used by other charts
@@ -298,7 +375,7 @@ def create_layout(figures=None):
                                 className="choropleth",
                                 children=[dcc.Graph(
                                     id="choropleth", 
-                                    figure=figures.get('choropleth', {}),
+                                    figure=PLACEHOLDER_FIGURE,
                                     responsive=True,
                                     style={'height': '100%', 'width': '100%'}
                             ),
@@ -322,9 +399,58 @@ def create_layout(figures=None):
                                         children=[
                                             dbc.Button("Select as first", id="btn-sel1", n_clicks=0, className="sel-btn sel-btn1-bg"),
                                             dbc.Button("Select as second", id="btn-sel2", n_clicks=0, className="sel-btn sel-btn2-bg")
-                                        ])
+                                        ]),
+                                    html.Div("Show responses", id="btn-responses", n_clicks=0, className="responses-link")
                                 ]
                             ),
+                            # Drill-down table of the popup's country (paged, sorted and filtered on the server)
+                            dcc.Store(id='responses-country-store'),
+                            dbc.Modal(
+                                id="responses-modal",
+                                size="xl",
+                                is_open=False,
+                                children=[
+                                    dbc.ModalHeader(dbc.ModalTitle(id="responses-title")),
+                                    dbc.ModalBody([
+                                        html.Div(id="responses-count", className="responses-count"),
+                                        dash_table.DataTable(
+                                            id="responses-table",
+                                            page_action="custom",
+                                            page_current=0,
+                                            page_size=config.DRILLDOWN_PAGE_SIZE,
+                                            sort_action="custom",
+                                            sort_mode="multi",
+                                            sort_by=[],
+                                            filter_action="custom",
+                                            filter_query="",
+                                            virtualization=True,
+                                            fixed_rows={'headers': True},
+                                            style_table={'height': '60vh', 'overflowY': 'auto'},
+                                            style_cell={'minWidth': '110px', 'fontFamily': 'var(--font-main)', 'fontSize': 'var(--fs-sm)'},
+                                        ),
+                                    ]),
+                                ],
+                            ),
+                            # Association strength of every pair of categorical columns
+                            dbc.Modal(
+                                id="associations-modal",
+                                size="xl",
+                                is_open=False,
+                                children=[
+                                    dbc.ModalHeader(dbc.ModalTitle("Associations between survey answers")),
+                                    dbc.ModalBody([
+                                        dcc.Dropdown(
+                                            id="associations-scope",
+                                            options=countries,
+                                            value=None,
+                                            className="dropdown-metric",
+                                            placeholder="All countries",
+                                            optionHeight=40,
+                                        ),
+                                        dcc.Graph(id="associations-heatmap", style={'height': '70vh'}),
+                                    ]),
+                                ],
+                            ),
                             ]
                         )
                         ]
@@ -335,6 +461,14 @@ def create_layout(figures=None):
             html.Div(
                 className="right-panel",
                 children=[
+                    dbc.Progress(id="secondary-progress", value=0, className="job-progress", style={"display": "none"}),
+                    # Shown while the initial charts show sample estimates (progressive mode)
+                    html.Div(id="secondary-approx", className="approx-badge", style={"display": "none"}),
+                    dcc.Store(id='secondary-refine-store'),
+                    # Set to the chart's id once it scrolls into view (assets/hydrate.js)
+                    dcc.Store(id='stacked-bar-visible-store'),
+                    dcc.Store(id='butterfly-visible-store'),
+                    dcc.Store(id='radar-visible-store'),
                     # Butterfly Chart Area
                     html.Div(
                         className="butterfly-chart-area",
@@ -343,7 +477,7 @@ def create_layout(figures=None):
                                 className="butterfly-chart",
                                 children=dcc.Graph(
                                     id="butterfly",
-                                    figure=figures.get('butterfly', {}),
+                                    figure=PLACEHOLDER_FIGURE,
                                     responsive=True,
                                     style={'height': '100%', 'width': '100%'}
                                 )
@@ -355,7 +489,7 @@ def create_layout(figures=None):
                         className="radar",
                         children=dcc.Graph(
                             id="radar",
-                            figure=figures.get('radar', {}),
+                            figure=PLACEHOLDER_FIGURE,
                             responsive=True,
                             style={'height': '100%', 'width': '100%'}
                         )
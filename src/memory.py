@@ -0,0 +1,246 @@
+"""
+Process memory and CPU readings (Linux /proc and cgroup aware, with portable fallbacks)
+and per-stage memory accounting.
+
+With MHV_MEMORY_STATS=1, every tracked stage (loading, each cleaning step, cache
+builds, each callback request) records the process RSS before and after; with
+MHV_MEMORY_TRACE=1, tracemalloc additionally records the stage's peak and
+retained Python allocations. With MHV_DEBUG_TOKEN set, the totals are served at
+/_debug/memory (see debug.py).
+"""
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+import flask
+
+from . import config
+from .debug import add_debug_route
+
+# Accumulated statistics per stage name
+_stage_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _read_proc_kb(path, field):
+    """Return a 'Field:   1234 kB' value from a /proc file in MB, or None if unavailable."""
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def get_rss_mb():
+    """
+    Return the current resident set size of this process in MB.
+
+    Falls back to the peak RSS from getrusage() where /proc is not available.
+    """
+    rss = _read_proc_kb("/proc/self/status", "VmRSS")
+    if rss is not None:
+        return rss
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kB elsewhere
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
+def get_pss_mb():
+    """
+    Return the proportional set size of this process in MB, or None if unavailable.
+
+    PSS splits pages shared with forked siblings evenly between them, so it shows
+    how much of a worker's RSS is really its own after copy-on-write.
+    """
+    return _read_proc_kb("/proc/self/smaps_rollup", "Pss")
+
+
+def get_cpu_count():
+    """Return the number of CPUs this process may use, honouring affinity and cgroup quotas."""
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+
+    # cgroup v2 quota, e.g. "200000 100000" -> 2 CPUs
+    try:
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()
+        if quota != "max":
+            cores = min(cores, max(1, int(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+
+    return cores
+
+
+def get_available_memory_mb():
+    """
+    Return memory still available to this process tree in MB, or None if unknown.
+
+    Uses the cgroup v2 limit when running in a container, otherwise MemAvailable.
+    """
+    try:
+        limit = Path("/sys/fs/cgroup/memory.max").read_text().strip()
+        current = Path("/sys/fs/cgroup/memory.current").read_text().strip()
+        if limit != "max":
+            return (int(limit) - int(current)) / 1024**2
+    except (OSError, ValueError):
+        pass
+
+    return _read_proc_kb("/proc/meminfo", "MemAvailable")
+
+
+def frame_memory_mb(df):
+    """Return the deep memory usage of a dataframe in MB."""
+    return df.memory_usage(deep=True).sum() / 1024**2
+
+
+# ============================================================================
+# STAGE ACCOUNTING
+# ============================================================================
+
+def start_tracing():
+    """Start tracemalloc if MHV_MEMORY_TRACE is set (call as early as possible)."""
+    if config.MEMORY_TRACE and not tracemalloc.is_tracing():
+        tracemalloc.start(config.MEMORY_TRACE_FRAMES)
+
+
+def _record_stage(stage, entry):
+    """Fold one measurement into the statistics of stage."""
+    with _stats_lock:
+        stats = _stage_stats.setdefault(stage, {
+            'calls': 0,
+            'seconds_total': 0.0,
+            'rss_delta_total_mb': 0.0,
+            'rss_delta_max_mb': 0.0,
+            'retained_total_mb': 0.0,
+            'peak_max_mb': 0.0,
+        })
+        stats['calls'] += 1
+        stats['seconds_total'] += entry['seconds']
+        stats['rss_delta_total_mb'] += entry['rss_delta_mb']
+        stats['rss_delta_max_mb'] = max(stats['rss_delta_max_mb'], entry['rss_delta_mb'])
+        if 'retained_mb' in entry:
+            stats['retained_total_mb'] += entry['retained_mb']
+            stats['peak_max_mb'] = max(stats['peak_max_mb'], entry['peak_mb'])
+        stats['last'] = entry
+
+
+@contextmanager
+def track_memory(stage):
+    """
+    Record RSS (and, when tracing, peak and retained allocations) of a block of work.
+
+    Does nothing unless MHV_MEMORY_STATS is set. The tracemalloc peak is process
+    wide, so stages running concurrently in other threads inflate each other's peak.
+
+    Args:
+        stage (str): Name under which the measurement is accumulated
+    """
+    if not config.MEMORY_STATS:
+        yield
+        return
+
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        traced_before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+    rss_before = get_rss_mb()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        rss_after = get_rss_mb()
+        entry = {
+            'seconds': round(time.perf_counter() - started, 4),
+            'rss_before_mb': round(rss_before, 2),
+            'rss_after_mb': round(rss_after, 2),
+            'rss_delta_mb': round(rss_after - rss_before, 2),
+        }
+        if tracing:
+            traced_after, peak = tracemalloc.get_traced_memory()
+            entry['retained_mb'] = round((traced_after - traced_before) / 1024**2, 3)
+            entry['peak_mb'] = round((peak - traced_before) / 1024**2, 3)
+        _record_stage(stage, entry)
+
+
+def get_memory_report(top=20):
+    """
+    Return the current process memory and the accumulated stage statistics.
+
+    Args:
+        top (int): Number of largest allocation sites to list when tracing
+
+    Returns:
+        dict: {'rss_mb', 'pss_mb', 'traced_mb', 'traced_peak_mb', 'stages', 'top_allocations'}
+    """
+    with _stats_lock:
+        stages = {stage: dict(stats) for stage, stats in _stage_stats.items()}
+
+    report = {
+        'pid': os.getpid(),
+        'rss_mb': round(get_rss_mb(), 2),
+        'pss_mb': get_pss_mb(),
+        'stages': stages,
+    }
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        report['traced_mb'] = round(current / 1024**2, 2)
+        report['traced_peak_mb'] = round(peak / 1024**2, 2)
+        report['top_allocations'] = [
+            {'where': str(stat.traceback), 'size_mb': round(stat.size / 1024**2, 3), 'blocks': stat.count}
+            for stat in tracemalloc.take_snapshot().statistics('lineno')[:top]
+        ]
+    return report
+
+
+def _callback_stage_name():
+    """Stage name of a Dash callback request: 'callback:' plus its output ids."""
+    body = flask.request.get_json(silent=True) or {}
+    outputs = body.get('output', '').strip('.').split('...')
+    return "callback:" + ",".join(output.split('@')[0] for output in outputs)
+
+
+def init_memory_debug(server):
+    """
+    Track every callback request and serve get_memory_report() at /_debug/memory.
+
+    The endpoint needs MHV_DEBUG_TOKEN (see debug.py).
+
+    Only installed when MHV_MEMORY_STATS is set.
+
+    Args:
+        server (flask.Flask): The Dash app's server
+
+    Returns:
+        bool: True if hooks were installed
+    """
+    if not config.MEMORY_STATS:
+        return False
+
+    def start_callback_tracking():
+        if flask.request.path == "/_dash-update-component":
+            tracker = track_memory(_callback_stage_name())
+            tracker.__enter__()
+            flask.g.memory_tracker = tracker
+
+    def finish_callback_tracking(exc):
+        tracker = flask.g.pop('memory_tracker', None)
+        if tracker is not None:
+            tracker.__exit__(None, None, None)
+
+    server.before_request(start_callback_tracking)
+    server.teardown_request(finish_callback_tracking)
+    add_debug_route(
+        server, "/_debug/memory", "debug_memory",
+        lambda: flask.jsonify(get_memory_report(int(flask.request.args.get('top', 20))))
+    )
+    return True
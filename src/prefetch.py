@@ -0,0 +1,149 @@
+"""
+Speculative prefetch of comparison charts.
+
+After a user picks a country, the next step is almost always picking a second
+one. With MHV_PREFETCH=1 the secondary-chart data and figures for the most
+likely pairs are built in a small background thread pool, so the real click
+finds them in the cache.
+"""
+import os
+import threading
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from . import config
+from .memory import get_cpu_count
+from .preprocessing import get_choropleth_data, get_stacked_bar_data, get_butterfly_data, get_radar_data
+from .figures.stacked_bar import create_stacked_bar_chart
+from .figures.butterfly import create_butterfly_chart
+from .figures.radar import create_radar_chart
+
+# How often each country has been selected in this process
+_selection_counts = Counter()
+
+# Submitted, possibly not yet started comparison builds (oldest first), and the
+# builds queued by the latest selection into each slot
+_pending = deque()
+_pending_by_slot = {}
+_lock = threading.Lock()
+_executor = None
+
+
+def _lower_thread_priority():
+    """Run prefetch threads at a lower scheduling priority where the OS allows it (Linux)."""
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), config.PREFETCH_NICENESS)
+    except (AttributeError, OSError):
+        pass
+
+
+def _get_executor():
+    """Create the thread pool lazily, so it is never started in a pre-fork master."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=config.PREFETCH_WORKERS,
+            thread_name_prefix="prefetch",
+            initializer=_lower_thread_priority,
+        )
+    return _executor
+
+
+def _over_cpu_budget():
+    """Return True if the machine is too busy to spend CPU on speculative work."""
+    try:
+        load = os.getloadavg()[0]
+    except (AttributeError, OSError):
+        return False
+    return load / get_cpu_count() > config.PREFETCH_MAX_LOAD
+
+
+def likely_partners(df, country, n):
+    """
+    Return the n countries most likely to be compared with country.
+
+    Countries selected most often in this process come first; the rest are filled
+    up by number of respondents.
+
+    Args:
+        df (pd.DataFrame): Cleaned dataframe from clean_and_convert_types()
+        country (str): The country that was just selected
+        n (int): Number of partners
+
+    Returns:
+        list: Country names, most likely first
+    """
+    by_respondents = (
+        get_choropleth_data(df, 'treatment_rate')
+        .sort_values('respondents', ascending=False)['Country']
+        .tolist()
+    )
+    with _lock:
+        by_selection = [c for c, _ in _selection_counts.most_common()]
+
+    partners = []
+    for candidate in by_selection + by_respondents:
+        if candidate != country and candidate not in partners:
+            partners.append(candidate)
+        if len(partners) == n:
+            break
+    return partners
+
+
+def _build_comparison(df, countries):
+    """Build (and thereby cache) all secondary chart data and figures for one comparison."""
+    if _over_cpu_budget():
+        return
+    create_stacked_bar_chart(get_stacked_bar_data(df, *countries))
+    create_butterfly_chart(get_butterfly_data(df, *countries))
+    create_radar_chart(get_radar_data(df, *countries))
+
+
+def prefetch_after_selection(df, country, slot, more_countries=()):
+    """
+    Queue the likely comparisons for a country that was just put into slot 1 or 2.
+
+    Each comparison is the one the charts would show once a partner is picked into
+    the other slot: (slot 1, slot 2, *more_countries). Builds of the previous
+    selection into the same slot that have not started yet are cancelled, as that
+    country is no longer selected. The queue is also bounded: when newer selections
+    push it past MHV_PREFETCH_QUEUE comparisons, the oldest builds that have not
+    started yet are cancelled.
+
+    Slots are tracked per worker, not per visitor, so a selection by one visitor
+    also cancels the not yet started builds of another visitor's selection into the
+    same slot; prefetching always favours the latest selection.
+
+    Args:
+        df (pd.DataFrame): Cleaned dataframe from clean_and_convert_types()
+        country (str): Selected country
+        slot (int): 1 or 2, the slot the country was selected into
+        more_countries (list, optional): Further countries in the comparison
+    """
+    if not country:
+        return
+    with _lock:
+        _selection_counts[country] += 1
+
+    if not config.PREFETCH:
+        return
+
+    partners = likely_partners(df, country, config.PREFETCH_TOP_N)
+    executor = _get_executor()
+    with _lock:
+        for future in _pending_by_slot.pop(slot, []):
+            future.cancel()
+
+        futures = []
+        for partner in partners:
+            pair = (country, partner) if slot == 1 else (partner, country)
+            futures.append(executor.submit(_build_comparison, df, (*pair, *(more_countries or []))))
+        _pending.extend(futures)
+        _pending_by_slot[slot] = futures
+
+        while len(_pending) > config.PREFETCH_QUEUE:
+            _pending.popleft().cancel()
+
+        # Forget finished work
+        while _pending and _pending[0].done():
+            _pending.popleft()
@@ -1,6 +1,45 @@
+import numpy as np
 import pandas as pd
 
-from .data_loader import get_data
+from .cache import cached, set_dataset_version
+from .data_loader import DEFAULT_DATA_PATH, get_data, read_source, get_content_version
+from .memory import get_rss_mb, frame_memory_mb, track_memory
+from .sql_backend import SQLDataset, TIMESTAMP_FORMAT
+
+# Column holding the number of identical responses a row stands for
+# (only present in frames built by compress_duplicates())
+WEIGHT_COLUMN = 'weight'
+
+
+def count_rows(df, mask=None):
+    """
+    Count respondents in df, optionally only those where mask is True.
+    
+    Honours the weight column of deduplicated frames, so every aggregation gives
+    the same result on the full and on the compressed representation.
+    
+    Args:
+        df (pd.DataFrame): Full or deduplicated dataframe
+        mask (pd.Series, optional): Boolean row mask aligned with df
+    
+    Returns:
+        int: Number of (weighted) rows
+    """
+    if WEIGHT_COLUMN in df.columns:
+        weights = df[WEIGHT_COLUMN]
+        # Rounded: sample frames (get_stratified_sample) carry fractional weights
+        return int(round(weights.sum() if mask is None else weights[mask].sum()))
+    return len(df) if mask is None else int(mask.sum())
+
+
+def _weighted_mean(col_data, weights):
+    """Weighted mean of a numeric or datetime column."""
+    if pd.api.types.is_datetime64_any_dtype(col_data):
+        # Float arithmetic: weighted sums of epoch offsets overflow int64
+        values = col_data.astype('int64').astype('float64')
+        return pd.Timestamp(int((values * weights).sum() / weights.sum()), unit=col_data.dt.unit)
+    return (col_data * weights).sum() / weights.sum()
+
 
 
 def analyze_data_quality(df=None):
@@ -16,35 +55,48 @@ def analyze_data_quality(df=None):
     if df is None:
         df = get_data()
     
+    # Weighted (deduplicated) frames count every unique row weight times
+    weights = df[WEIGHT_COLUMN] if WEIGHT_COLUMN in df.columns else None
+    columns = [col for col in df.columns if col != WEIGHT_COLUMN]
+    
     report = {
-        'dataset_shape': df.shape,
+        'dataset_shape': (count_rows(df), len(columns)),
         'columns': {}
     }
     
     # Analyze each column
-    for col in df.columns:
+    for col in columns:
         col_data = df[col]
+        total_rows = count_rows(df)
+        null_count = count_rows(df, col_data.isnull())
+        # Text columns (object or string dtype) and categoricals get value counts, others statistics
+        is_text = not (pd.api.types.is_numeric_dtype(col_data) or pd.api.types.is_datetime64_any_dtype(col_data))
         
         # Basic stats
         col_info = {
             'dtype': str(col_data.dtype),
-            'total_rows': len(col_data),
-            'non_null_count': col_data.notna().sum(),
-            'null_count': col_data.isnull().sum(),
-            'null_pct': round((col_data.isnull().sum() / len(col_data) * 100), 2),
+            'total_rows': total_rows,
+            'non_null_count': total_rows - null_count,
+            'null_count': null_count,
+            'null_pct': round((null_count / total_rows * 100), 2),
             'unique_count': col_data.nunique(),
-            'empty_string_count': (col_data == '').sum() if col_data.dtype == 'object' else 0,
+            'empty_string_count': count_rows(df, (col_data == '').fillna(False).to_numpy(bool)) if is_text else 0,
         }
         
         # Sample values
-        if col_data.dtype == 'object':
-            sample_dist = col_data.value_counts(dropna=False).head(10).to_dict()
+        if is_text:
+            if weights is None:
+                sample_dist = col_data.value_counts(dropna=False).head(10).to_dict()
+            else:
+                # In order of first appearance and stably sorted, so ties are broken as by value_counts()
+                sample_dist = (weights.groupby(col_data, dropna=False, observed=False, sort=False).sum()
+                               .sort_values(ascending=False, kind='stable').head(10).to_dict())
             col_info['top_values'] = sample_dist
             col_info['has_na_values'] = any(pd.isna(k) for k in sample_dist.keys())
         else:
             col_info['min'] = col_data.min()
             col_info['max'] = col_data.max()
-            col_info['mean'] = col_data.mean()
+            col_info['mean'] = col_data.mean() if weights is None else _weighted_mean(col_data, weights)
         
         report['columns'][col] = col_info
     
@@ -111,7 +163,28 @@ def print_categorical_columns(df=None):
     print("\n" + "="*80 + "\n")
 
 
-def clean_and_convert_types(df=None):
+# Text columns stored as categoricals after cleaning
+CATEGORICAL_COLUMNS = [
+    'Gender', 'Country', 'Occupation', 'self_employed',
+    'family_history', 'treatment', 'Days_Indoors', 
+    'Growing_Stress', 'Changes_Habits', 'Mental_Health_History',
+    'Mood_Swings', 'Coping_Struggles', 'Work_Interest', 'Social_Weakness',
+    'mental_health_interview', 'care_options'
+]
+
+
+def _record_memory(report, stage, df):
+    """Append frame size and process RSS after a cleaning stage (no-op if report is None)."""
+    if report is not None:
+        report.append({
+            'stage': stage,
+            'frame_mb': round(frame_memory_mb(df), 2),
+            'rss_mb': round(get_rss_mb(), 2),
+        })
+
+
+def clean_and_convert_types(df=None, inplace=False, report=None, compress=False,
+                            filepath=DEFAULT_DATA_PATH):
     """
     Clean data and apply all type conversions.
     
@@ -120,44 +193,103 @@ def clean_and_convert_types(df=None):
     - Timestamp: Parse to datetime
     - All text columns: Convert to categorical (memory efficiency)
     
+    When loading from data_loader, the CSV is parsed straight into categorical
+    columns and the raw object-dtype frame is never built or cached, so the
+    process only ever holds the compact cleaned frame.
+    
     Args:
         df (pd.DataFrame, optional): DataFrame to clean. If None, loads from data_loader.
+        inplace (bool): Transform the given df instead of a copy (the caller's
+                        frame is modified and no second copy is held)
+        report (list, optional): If given, a memory entry
+                                 {'stage', 'frame_mb', 'rss_mb'} is appended
+                                 before and after each stage
+        compress (bool): Return the deduplicated representation from
+                         compress_duplicates() instead of one row per response
+        filepath (str): CSV file to load when df is None (relative to project root)
     
     Returns:
         pd.DataFrame: Cleaned dataframe with proper types
     """
-    if df is None:
-        df = get_data().copy()
-    else:
+    from_source = df is None
+    if from_source:
+        df = read_source(filepath, dtype={col: 'category' for col in CATEGORICAL_COLUMNS})
+    elif not inplace:
         df = df.copy()
+    _record_memory(report, 'load', df)
     
     # 1. HANDLE MISSING self_employed (5,202 rows, 1.78%)
-    missing_count = df['self_employed'].isnull().sum()
-    df['self_employed'] = df['self_employed'].fillna('Unknown')
+    with track_memory('clean.fillna'):
+        missing_count = df['self_employed'].isnull().sum()
+        if isinstance(df['self_employed'].dtype, pd.CategoricalDtype):
+            # Keep categories sorted, exactly as casting the filled column would
+            filled = df['self_employed'].cat.add_categories(['Unknown']).fillna('Unknown')
+            df['self_employed'] = filled.cat.reorder_categories(sorted(filled.cat.categories))
+        else:
+            df['self_employed'] = df['self_employed'].fillna('Unknown')
+    _record_memory(report, 'fillna', df)
     
     # 2. DATETIME CONVERSION
-    df['Timestamp'] = pd.to_datetime(df['Timestamp'], format='%m/%d/%Y %H:%M')
+    with track_memory('clean.datetime'):
+        df['Timestamp'] = pd.to_datetime(df['Timestamp'], format='%m/%d/%Y %H:%M')
+    _record_memory(report, 'datetime', df)
     
     # 3. CATEGORICAL CONVERSIONS (reduce memory usage)
-    categorical_cols = [
-        'Gender', 'Country', 'Occupation', 'self_employed',
-        'family_history', 'treatment', 'Days_Indoors', 
-        'Growing_Stress', 'Changes_Habits', 'Mental_Health_History',
-        'Mood_Swings', 'Coping_Struggles', 'Work_Interest', 'Social_Weakness',
-        'mental_health_interview', 'care_options'
-    ]
-    
-    for col in categorical_cols:
-        if col in df.columns:
-            df[col] = df[col].astype('category')
-        
-    # Print summary
-    memory_mb = df.memory_usage(deep=True).sum() / 1024**2
+    with track_memory('clean.categorical'):
+        for col in CATEGORICAL_COLUMNS:
+            if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype('category')
+    _record_memory(report, 'categorical', df)
+    
+    # 4. OPTIONAL DEDUPLICATION (weighted unique rows)
+    if compress:
+        with track_memory('clean.compress'):
+            df = compress_duplicates(df)
+        _record_memory(report, 'compress', df)
 
+    # Results derived from the source file's content may be shared across workers
+    if from_source:
+        set_dataset_version(df, get_content_version(filepath, compress))
     
     return df
 
 
+def compress_duplicates(df):
+    """
+    Collapse identical rows into one row with an integer weight column.
+    
+    The dataset was inflated from roughly 2k real responses to about 292k rows,
+    so most rows are exact duplicates. All aggregations count rows through
+    count_rows(), which honours the weight, so percentages and respondent counts
+    are identical while work and memory scale with the number of distinct rows.
+    
+    Args:
+        df (pd.DataFrame): Cleaned dataframe from clean_and_convert_types()
+    
+    Returns:
+        pd.DataFrame: Unique rows plus a WEIGHT_COLUMN of type int32
+    """
+    if WEIGHT_COLUMN in df.columns:
+        return df
+    
+    # observed=True: only combinations that occur (not the categorical cross product)
+    weights = df.groupby(list(df.columns), observed=True, dropna=False, sort=False).size()
+    compressed = weights.rename(WEIGHT_COLUMN).reset_index()
+    compressed[WEIGHT_COLUMN] = compressed[WEIGHT_COLUMN].astype('int32')
+    return compressed
+
+
+def print_memory_report(report):
+    """Pretty-print the memory entries collected by clean_and_convert_types(report=...)."""
+    print("\n" + "="*80)
+    print("MEMORY BY CLEANING STAGE")
+    print("="*80)
+    print(f"\n  {'Stage':<14}{'Frame (MB)':>14}{'RSS (MB)':>14}")
+    for entry in report:
+        print(f"  {entry['stage']:<14}{entry['frame_mb']:>14.2f}{entry['rss_mb']:>14.2f}")
+    print("\n" + "="*80 + "\n")
+
+
 # ============================================================================
 # SECTION 4: CHOROPLETH DATA AGGREGATION
 # ============================================================================
@@ -189,6 +321,23 @@ def get_available_metrics():
     }
 
 
+@cached
+def get_countries(df):
+    """
+    Return the sorted names of all countries in the dataset.
+    
+    Args:
+        df (pd.DataFrame | SQLDataset): Cleaned dataset
+    
+    Returns:
+        list: Country names
+    """
+    if isinstance(df, SQLDataset):
+        return sorted(country for (country,) in df.counts(['Country']))
+    return sorted(df['Country'].unique().tolist())
+
+
+@cached
 def get_choropleth_data(df, metric):
     """
     Prepare one metric per country for choropleth visualization.
@@ -222,13 +371,25 @@ def get_choropleth_data(df, metric):
     
     column, target_value = metric_mappings[metric]
     
+    if isinstance(df, SQLDataset):
+        counts = df.counts(['Country'], conditions=[(column, target_value)])
+        result_list = [
+            {
+                'Country': country,
+                'metric_value': round((count_yes / total * 100) if total > 0 else 0, 2),
+                'respondents': total
+            }
+            for (country,), (total, count_yes) in counts.items()
+        ]
+        return pd.DataFrame(result_list).sort_values('Country').reset_index(drop=True)
+    
     # Group by country and calculate percentage
     result_list = []
     for country in df['Country'].unique():
         country_df = df[df['Country'] == country]
         
-        count_yes = (country_df[column] == target_value).sum()
-        total = len(country_df)
+        count_yes = count_rows(country_df, country_df[column] == target_value)
+        total = count_rows(country_df)
         percentage = (count_yes / total * 100) if total > 0 else 0
         
         result_list.append({
@@ -241,6 +402,7 @@ def get_choropleth_data(df, metric):
     return result_df
 
 
+@cached
 def get_country_metric_value(df, country, metric):
     """
     Get metric value and respondent count for one country (for popup display).
@@ -265,6 +427,16 @@ def get_country_metric_value(df, country, metric):
     
     column, target_value = metric_mappings[metric]
     
+    if isinstance(df, SQLDataset):
+        (total, count_yes), = df.counts(where={'Country': country} if country else None,
+                                        conditions=[(column, target_value)]).values()
+        if total == 0:
+            return {'metric_value': 0.0, 'respondents': 0}
+        return {
+            'metric_value': round((count_yes / total * 100) if total > 0 else 0, 2),
+            'respondents': total
+        }
+    
     # Filter to country data
     if country:
         country_df = df[df['Country'] == country]
@@ -275,8 +447,8 @@ def get_country_metric_value(df, country, metric):
         return {'metric_value': 0.0, 'respondents': 0}
     
     # Calculate metric for this country only
-    count_yes = (country_df[column] == target_value).sum()
-    total = len(country_df)
+    count_yes = count_rows(country_df, country_df[column] == target_value)
+    total = count_rows(country_df)
     percentage = (count_yes / total * 100) if total > 0 else 0
     
     return {
@@ -286,10 +458,146 @@ def get_country_metric_value(df, country, metric):
 
 
 # ============================================================================
-# SECTION 5: RADAR CHART DATA AGGREGATION
+# SECTION 5: GROUPED COUNTS (batched per-country aggregation)
 # ============================================================================
 
-def get_radar_data(df, country1=None, country2=None):
+@cached
+def get_group_counts(df, columns):
+    """
+    Count respondents per country and combination of values of columns, in one pass.
+    
+    The per-country chart functions below derive their percentages from these
+    counts, so a comparison of any number of countries costs a single grouped
+    aggregation over the dataset (cached), no matter how many countries it shows.
+    
+    Args:
+        df (pd.DataFrame | SQLDataset): Cleaned dataset
+        columns (tuple): Columns to group by within each country
+    
+    Returns:
+        dict: Country -> {tuple of column values: (weighted) count}, and under the
+              key None the same counts over all respondents. Rows without a
+              country only count towards all respondents. Counts of sample
+              frames are fractional; round them only after summing.
+    
+    Example:
+        >>> get_group_counts(df_clean, ('self_employed', 'Days_Indoors'))['Canada'][('No', '1-14 days')]
+        1457
+    """
+    keys = ['Country', *columns]
+    
+    if isinstance(df, SQLDataset):
+        flat = {values: n for values, (n,) in df.counts(keys).items()}
+    else:
+        # One bincount over the combined category codes of all key columns
+        # (code 0 of each column stands for a missing value)
+        codes, labels = zip(*(get_column_codes(df, column) for column in keys))
+        shape = tuple(len(values) + 1 for values in labels)
+        combined = np.ravel_multi_index(tuple(c.astype(np.int64) + 1 for c in codes), shape)
+        weights = df[WEIGHT_COLUMN].to_numpy(dtype='float64') if WEIGHT_COLUMN in df.columns else None
+        sums = np.bincount(combined, weights=weights, minlength=int(np.prod(shape)))
+        
+        present = np.flatnonzero(sums)
+        lookups = [[None, *values.tolist()] for values in labels]
+        flat = {
+            tuple(lookup[code] for lookup, code in zip(lookups, key_codes)): n
+            for *key_codes, n in zip(*np.unravel_index(present, shape), sums[present].tolist())
+        }
+    
+    everyone = {}
+    result = {}
+    for (country, *values), n in flat.items():
+        values = tuple(values)
+        everyone[values] = everyone.get(values, 0) + n
+        # A missing country is None too: keep it out of the all respondents key
+        if country is not None:
+            result.setdefault(country, {})[values] = n
+    result[None] = everyone
+    return result
+
+
+def _share(count, total):
+    """Percentage of count in total, from (weighted) counts rounded like count_rows()."""
+    count, total = int(round(count)), int(round(total))
+    return round((count / total * 100) if total > 0 else 0.0, 2)
+
+
+def _group_shares(counts, groups, value_order):
+    """
+    Percentages of the categories of the second grouped column within groups of the first.
+    
+    Each group's total includes all of its rows, also those with values outside value_order.
+    
+    Args:
+        counts (dict): One country's entry of get_group_counts() over two columns
+        groups (dict): Result key -> value of the first column
+        value_order (list): Categories of the second column to report
+    
+    Returns:
+        dict: Result key -> {category: percentage}
+    """
+    result = {}
+    for key, group_value in groups.items():
+        total = sum(n for (group, _), n in counts.items() if group == group_value)
+        result[key] = {category: _share(counts.get((group_value, category), 0), total) for category in value_order}
+    return result
+
+
+def _comparison_countries(countries):
+    """
+    Names of the compared countries; None stands for all respondents ("Global").
+    
+    A leading None (or no countries at all) shows all respondents; None in later
+    positions marks an empty comparison slot and is skipped.
+    """
+    first, *rest = countries or (None,)
+    return [first] + [country for country in rest if country]
+
+
+# ============================================================================
+# SECTION 6: RADAR CHART DATA AGGREGATION
+# ============================================================================
+
+# Metrics shown on the radar chart and their axis labels
+RADAR_METRICS = [
+    'growing_stress_rate',
+    'high_mood_swings_rate',
+    'coping_struggles_rate',
+    'social_weakness_rate'
+]
+
+RADAR_LABELS = [
+    'Growing Stress',
+    'High Mood Swings',
+    'Coping Struggles',
+    'Social Weakness'
+]
+
+
+@cached
+def get_radar_country_values(df, country=None):
+    """
+    Radar metric values for one country (cached, so a comparison reuses them).
+    
+    Args:
+        df (pd.DataFrame): Cleaned dataframe from clean_and_convert_types()
+        country (str, optional): Country name, or None for all respondents
+    
+    Returns:
+        list: Percentages in the order of RADAR_METRICS
+    """
+    targets = [get_available_metrics()[metric] for metric in RADAR_METRICS]
+    counts = get_group_counts(df, tuple(column for column, _ in targets)).get(country, {})
+    total = sum(counts.values())
+    
+    values = []
+    for position, (_, target_value) in enumerate(targets):
+        count_yes = sum(n for key, n in counts.items() if key[position] == target_value)
+        values.append(_share(count_yes, total))
+    return values
+
+
+def get_radar_data(df, *countries):
     """
     Prepare data for radar chart visualization (4 mental health metrics).
     
@@ -297,76 +605,72 @@ def get_radar_data(df, country1=None, country2=None):
     
     Args:
         df (pd.DataFrame): Cleaned dataframe from clean_and_convert_types()
-        country1 (str): First country name
-        country2 (str, optional): Second country name for comparison overlay
+        *countries (str): Country names to overlay; a leading None (or none at
+                          all) shows all respondents as "Global"
     
     Returns:
         dict: Structure for Plotly radar chart with keys:
               - 'metrics': list of metric names
-              - 'country1': dict with 'name' and 'values' (list of percentages)
-              - 'country2': dict with 'name' and 'values' (or None if not provided)
+              - 'countries': list of dicts with 'name' and 'values' (list of percentages)
     
     Example:
         >>> radar_data = get_radar_data(df_clean, 'United States', 'Canada')
         >>> radar_data
         {
             'metrics': ['Growing Stress', 'High Mood Swings', 'Coping Struggles', 'Social Weakness'],
-            'country1': {'name': 'United States', 'values': [33.5, 31.2, 47.5, 31.3]},
-            'country2': {'name': 'Canada', 'values': [33.8, 31.1, 47.2, 31.4]}
+            'countries': [
+                {'name': 'United States', 'values': [33.5, 31.2, 47.5, 31.3]},
+                {'name': 'Canada', 'values': [33.8, 31.1, 47.2, 31.4]}
+            ]
         }
     """
-    radar_metrics = [
-        'growing_stress_rate',
-        'high_mood_swings_rate',
-        'coping_struggles_rate',
-        'social_weakness_rate'
-    ]
-    
-    metric_labels = [
-        'Growing Stress',
-        'High Mood Swings',
-        'Coping Struggles',
-        'Social Weakness'
-    ]
-    
-    # Get values for country1
-    country1_values = []
-    for metric in radar_metrics:
-        result = get_country_metric_value(df, country1, metric)
-        country1_values.append(result['metric_value'])
-    
-    if country1 is None:
-        country1 = "Global"
-        
-    radar_data = {
-        'metrics': metric_labels,
-        'country1': {
-            'name': country1,
-            'values': country1_values
-        },
-        'country2': None
+    return {
+        'metrics': RADAR_LABELS,
+        'countries': [
+            {'name': country or "Global", 'values': get_radar_country_values(df, country)}
+            for country in _comparison_countries(countries)
+        ]
     }
-    
-    # Get values for country2 if provided
-    if country2:
-        country2_values = []
-        for metric in radar_metrics:
-            result = get_country_metric_value(df, country2, metric)
-            country2_values.append(result['metric_value'])
-        
-        radar_data['country2'] = {
-            'name': country2,
-            'values': country2_values
-        }
-    
-    return radar_data
 
 
 # ============================================================================
-# SECTION 6: BUTTERFLY CHART DATA AGGREGATION
+# SECTION 7: BUTTERFLY CHART DATA AGGREGATION
 # ============================================================================
 
-def get_butterfly_data(df, country1=None, country2=None):
+# Logical order for Days_Indoors (least to most time indoors)
+DAYS_INDOORS_ORDER = [
+    'Go out Every day',
+    '1-14 days',
+    '15-30 days',
+    '31-60 days',
+    'More than 2 months'
+]
+
+# Butterfly sides -> self_employed value
+EMPLOYMENT_TYPES = {
+    'employed': 'No',
+    'self_employed': 'Yes'
+}
+
+
+@cached
+def get_butterfly_country_data(df, country=None):
+    """
+    Aggregate butterfly data for one country (cached, so a comparison reuses it).
+    
+    Args:
+        df (pd.DataFrame): Cleaned dataframe from clean_and_convert_types()
+        country (str, optional): Country name, or None for all respondents
+    
+    Returns:
+        dict: {'employed': {...}, 'self_employed': {...}}, each with percentages
+              per Days_Indoors category
+    """
+    counts = get_group_counts(df, ('self_employed', 'Days_Indoors')).get(country, {})
+    return _group_shares(counts, EMPLOYMENT_TYPES, DAYS_INDOORS_ORDER)
+
+
+def get_butterfly_data(df, *countries):
     """
     Prepare data for butterfly chart (employment status vs days indoors).
     
@@ -376,102 +680,64 @@ def get_butterfly_data(df, country1=None, country2=None):
     
     Args:
         df (pd.DataFrame): Cleaned dataframe from clean_and_convert_types()
-        country1 (str): First country name
-        country2 (str, optional): Second country name for stacked comparison
+        *countries (str): Country names shown side by side; a leading None (or
+                          none at all) shows all respondents as "Global"
     
     Returns:
         dict: Structure for Plotly butterfly chart with keys:
               - 'days_indoors_order': list of Days_Indoors categories in logical order
-              - 'country1': dict with 'name' and nested dicts for 'employed' and 'self_employed'
-                           Each contains percentages per Days_Indoors category
-              - 'country2': dict with same structure (or None if not provided)
+              - 'countries': list of dicts with 'name' and nested dicts for 'employed'
+                             and 'self_employed', each with percentages per Days_Indoors category
     
     Example:
         >>> butterfly_data = get_butterfly_data(df_clean, 'United States')
         >>> butterfly_data
         {
             'days_indoors_order': ['Go out Every day', '1-14 days', '15-30 days', '31-60 days', 'More than 2 months'],
-            'country1': {
+            'countries': [{
                 'name': 'United States',
                 'employed': {'Go out Every day': 33.5, '1-14 days': 28.2, ...},
                 'self_employed': {'Go out Every day': 35.1, '1-14 days': 26.8, ...}
-            },
-            'country2': None
+            }]
         }
     """
-    # Logical order for Days_Indoors (least to most time indoors)
-    days_indoors_order = [
-        'Go out Every day',
-        '1-14 days',
-        '15-30 days',
-        '31-60 days',
-        'More than 2 months'
-    ]
-    
-    def aggregate_butterfly_for_country(country_df):
-        """Helper function to aggregate butterfly data for one country."""
-        employment_types = {
-            'employed': 'No',        # self_employed == 'No'
-            'self_employed': 'Yes'   # self_employed == 'Yes'
-        }
-        
-        result = {}
-        
-        for emp_type, emp_value in employment_types.items():
-            emp_df = country_df[country_df['self_employed'] == emp_value]
-            total_emp = len(emp_df)
-            
-            # Calculate percentages for each Days_Indoors category
-            percentages = {}
-            for day_cat in days_indoors_order:
-                count = (emp_df['Days_Indoors'] == day_cat).sum()
-                pct = (count / total_emp * 100) if total_emp > 0 else 0.0
-                percentages[day_cat] = round(pct, 2)
-            
-            result[emp_type] = percentages
-        
-
-        return result
-    
-    # Get data for country1
-    if country1:
-        country1_df = df[df['Country'] == country1]
-        country1_name = country1
-    else:
-        country1_df = df
-        country1_name = "Global"
-
-    country1_agg = aggregate_butterfly_for_country(country1_df)
-    
-    butterfly_data = {
-        'days_indoors_order': days_indoors_order,
-        'country1': {
-            'name': country1_name,
-            'employed': country1_agg['employed'],
-            'self_employed': country1_agg['self_employed']
-        },
-        'country2': None
+    return {
+        'days_indoors_order': DAYS_INDOORS_ORDER,
+        'countries': [
+            {'name': country or "Global", **get_butterfly_country_data(df, country)}
+            for country in _comparison_countries(countries)
+        ]
     }
-    
-    # Get data for country2 if provided
-    if country2:
-        country2_df = df[df['Country'] == country2]
-        country2_agg = aggregate_butterfly_for_country(country2_df)
-        
-        butterfly_data['country2'] = {
-            'name': country2,
-            'employed': country2_agg['employed'],
-            'self_employed': country2_agg['self_employed']
-        }
-    
-    return butterfly_data
 
 
 # ============================================================================
-# SECTION 7: STACKED BAR CHART DATA AGGREGATION
+# SECTION 8: STACKED BAR CHART DATA AGGREGATION
 # ============================================================================
 
-def get_stacked_bar_data(df, country1=None, country2=None):
+# Logical order for Social_Weakness
+SOCIAL_WEAKNESS_ORDER = ['No', 'Maybe', 'Yes']
+
+# Logical order for mental health interview responses
+INTERVIEW_RESPONSES_ORDER = ['No', 'Maybe', 'Yes']
+
+
+@cached
+def get_stacked_bar_country_data(df, country=None):
+    """
+    Aggregate stacked bar data for one country (cached, so a comparison reuses it).
+    
+    Args:
+        df (pd.DataFrame): Cleaned dataframe from clean_and_convert_types()
+        country (str, optional): Country name, or None for all respondents
+    
+    Returns:
+        dict: Social_Weakness category -> percentages per mental_health_interview response
+    """
+    counts = get_group_counts(df, ('Social_Weakness', 'mental_health_interview')).get(country, {})
+    return _group_shares(counts, {cat: cat for cat in SOCIAL_WEAKNESS_ORDER}, INTERVIEW_RESPONSES_ORDER)
+
+
+def get_stacked_bar_data(df, *countries):
     """
     Prepare data for horizontal stacked bar chart (mental health interview vs social weakness).
     
@@ -480,16 +746,15 @@ def get_stacked_bar_data(df, country1=None, country2=None):
     
     Args:
         df (pd.DataFrame): Cleaned dataframe from clean_and_convert_types()
-        country1 (str): First country name
-        country2 (str, optional): Second country name for stacked display below
+        *countries (str): Country names, one subplot each from top to bottom; a
+                          leading None (or none at all) shows all respondents as "Global"
     
     Returns:
         dict: Structure for Plotly horizontal stacked bar chart with keys:
               - 'social_weakness_order': list of Social_Weakness categories in logical order
               - 'interview_responses': list of mental_health_interview response types
-              - 'country1': dict with 'name' and nested dicts for each mental_health_interview response
-                           Each contains percentages per social weakness category
-              - 'country2': dict with same structure (or None if not provided)
+              - 'countries': list of dicts with 'name' and nested dicts for each
+                             Social_Weakness category with percentages per interview response
     
     Example:
         >>> stacked_data = get_stacked_bar_data(df_clean, 'United States')
@@ -497,69 +762,564 @@ def get_stacked_bar_data(df, country1=None, country2=None):
         {
             'social_weakness_order': ['No', 'Maybe', 'Yes'],
             'interview_responses': ['No', 'Maybe', 'Yes'],
-            'country1': {
+            'countries': [{
                 'name': 'United States',
                 'No': {'No': 48.1, 'Maybe': 18.5, 'Yes': 19.2},
                 'Maybe': {'No': 45.2, 'Maybe': 20.1, 'Yes': 19.4},
                 'Yes': {'No': 42.3, 'Maybe': 22.1, 'Yes': 18.8}
-            },
-            'country2': None
+            }]
         }
     """
-    # Logical order for Social_Weakness
-    social_weakness_order = ['No', 'Maybe', 'Yes']
+    return {
+        'interview_responses': INTERVIEW_RESPONSES_ORDER,
+        'social_weakness_order': SOCIAL_WEAKNESS_ORDER,
+        'countries': [
+            {'name': country or "Global", **get_stacked_bar_country_data(df, country)}
+            for country in _comparison_countries(countries)
+        ]
+    }
+
+
+# ============================================================================
+# SECTION 9: AGGREGATE CACHE WARM-UP
+# ============================================================================
+
+def warm_aggregate_cache(df):
+    """
+    Precompute every aggregate the dashboard can request without a comparison pair.
     
-    # Logical order for mental health interview responses
-    interview_responses_order = ['No', 'Maybe', 'Yes']
+    Fills the in-process cache with all choropleth metrics, the per-country popup
+    values, the single-country and "Global" secondary chart data and the
+    all-respondents association table. Called in the server master before forking
+    so workers inherit a warm cache.
     
-    def aggregate_stacked_bar_for_country(country_df):
-        """Helper function to aggregate stacked bar data for one country."""
-        result = {}
+    Args:
+        df (pd.DataFrame): Cleaned dataframe from clean_and_convert_types()
+    
+    Returns:
+        int: Number of countries warmed
+    """
+    countries = get_countries(df)
+    
+    with track_memory('warm_aggregate_cache'):
+        for metric in get_available_metrics():
+            get_choropleth_data(df, metric)
+            for country in countries:
+                get_country_metric_value(df, country, metric)
+        
+        for country in [None] + countries:
+            get_radar_data(df, country)
+            get_butterfly_data(df, country)
+            get_stacked_bar_data(df, country)
         
-        for weakness_cat in social_weakness_order:
-            weakness_df = country_df[country_df['Social_Weakness'] == weakness_cat]
-            total = len(weakness_df)
+        get_association_table(df)
+    
+    return len(countries)
+
+
+# ============================================================================
+# SECTION 10: TABLES BEHIND THE CHARTS (exports and API)
+# ============================================================================
+
+@cached
+def get_choropleth_table(df):
+    """
+    All choropleth metrics per country in one wide table.
+    
+    Args:
+        df (pd.DataFrame): Cleaned dataframe from clean_and_convert_types()
+    
+    Returns:
+        pd.DataFrame: Columns [Country, respondents, <one column per metric>]
+    
+    Example:
+        >>> get_choropleth_table(df_clean).columns[:3].tolist()
+        ['Country', 'respondents', 'self_employment_rate']
+    """
+    table = None
+    for metric in get_available_metrics():
+        metric_df = get_choropleth_data(df, metric).rename(columns={'metric_value': metric})
+        if table is None:
+            table = metric_df[['Country', 'respondents', metric]]
+        else:
+            table = table.merge(metric_df[['Country', metric]], on='Country', how='left')
+    return table
+
+
+@cached
+def get_choropleth_matrix(df):
+    """
+    All choropleth metrics per country as plain lists, for metric switching in the browser.
+    
+    Args:
+        df (pd.DataFrame): Cleaned dataframe from clean_and_convert_types()
+    
+    Returns:
+        dict: {'countries': [...], 'respondents': [...],
+               'metrics': {metric: [values in the order of countries]}}
+    """
+    table = get_choropleth_table(df)
+    return {
+        'countries': table['Country'].tolist(),
+        'respondents': table['respondents'].tolist(),
+        'metrics': {metric: table[metric].tolist() for metric in get_available_metrics()},
+    }
+
 
-            percentages = {}
-            for response in interview_responses_order:
-                count = (weakness_df['mental_health_interview'] == response).sum()
-                pct = (count / total * 100) if total > 0 else 0.0
-                percentages[response] = round(pct, 2)
+def get_country_chart_table(df, chart, countries=None):
+    """
+    Long-format table of one secondary chart's values for several countries.
+    
+    Args:
+        df (pd.DataFrame): Cleaned dataframe from clean_and_convert_types()
+        chart (str): 'radar', 'butterfly' or 'stacked_bar'
+        countries (list, optional): Country names; None for every country.
+                                    None inside the list stands for all respondents.
+    
+    Returns:
+        pd.DataFrame: One row per country and chart value, e.g. for 'radar'
+                      [Country, metric, value]
+    
+    Raises:
+        ValueError: If chart is unknown
+    """
+    if countries is None:
+        countries = get_countries(df)
+    
+    rows = []
+    for country in countries:
+        name = country if country else 'All'
+        if chart == 'radar':
+            for label, value in zip(RADAR_LABELS, get_radar_country_values(df, country)):
+                rows.append({'Country': name, 'metric': label, 'value': value})
+        elif chart == 'butterfly':
+            for employment, percentages in get_butterfly_country_data(df, country).items():
+                for days_indoors, pct in percentages.items():
+                    rows.append({'Country': name, 'employment': employment,
+                                 'days_indoors': days_indoors, 'percentage': pct})
+        elif chart == 'stacked_bar':
+            for weakness, percentages in get_stacked_bar_country_data(df, country).items():
+                for response, pct in percentages.items():
+                    rows.append({'Country': name, 'social_weakness': weakness,
+                                 'interview_response': response, 'percentage': pct})
+        else:
+            raise ValueError(f"Unknown chart '{chart}', expected 'radar', 'butterfly' or 'stacked_bar'")
+    
+    return pd.DataFrame(rows)
 
-            result[weakness_cat] = percentages
 
-        return result
+def filter_rows(df, filters):
+    """
+    Return the positions of the rows matching all filters.
+    
+    Args:
+        df (pd.DataFrame): Cleaned dataframe from clean_and_convert_types()
+        filters (dict): Column name -> list of accepted values
+    
+    Returns:
+        np.ndarray: Row positions (only the positions are built, not a filtered copy)
     
-    # Get data for country1
-    if country1:
-        country1_df = df[df['Country'] == country1]
-        country1_name = country1
+    Raises:
+        KeyError: If a filter names an unknown column
+    """
+    mask = pd.Series(True, index=df.index)
+    for column, values in filters.items():
+        if column not in df.columns or column == WEIGHT_COLUMN:
+            raise KeyError(column)
+        mask &= df[column].isin(values)
+    return mask.to_numpy().nonzero()[0]
 
-    else:
-        country1 = "Global"
-        country1_df = df
-        country1_name = "Global"
-
-    country1_agg = aggregate_stacked_bar_for_country(country1_df)
-    
-    stacked_data = {
-        'interview_responses': interview_responses_order,
-        'social_weakness_order': social_weakness_order,
-        'country1': {
-            'name': country1_name,
-            **country1_agg
-        },
-        'country2': None
+
+# ============================================================================
+# SECTION 11: APPROXIMATE AGGREGATION (progressive mode)
+# ============================================================================
+
+# Rows sampled per country for estimates
+SAMPLE_PER_COUNTRY = 400
+
+
+@cached
+def get_stratified_sample(df, per_country=SAMPLE_PER_COUNTRY):
+    """
+    Draw up to per_country random rows of every country, weighted to stand for all rows.
+    
+    Each sampled row gets a weight of (country respondents / sampled respondents),
+    times its own weight in deduplicated frames, so the regular aggregation
+    functions run unchanged on the sample and return estimates of the exact values.
+    
+    Args:
+        df (pd.DataFrame): Cleaned dataframe from clean_and_convert_types()
+        per_country (int): Maximum rows drawn per country
+    
+    Returns:
+        pd.DataFrame: Sampled rows with a float WEIGHT_COLUMN
+    """
+    codes = df['Country'].cat.codes.to_numpy() if isinstance(df['Country'].dtype, pd.CategoricalDtype) \
+        else pd.factorize(df['Country'])[0]
+    row_weights = df[WEIGHT_COLUMN].to_numpy(dtype='float64') if WEIGHT_COLUMN in df.columns \
+        else np.ones(len(df))
+    
+    # Shuffle, group by country (stable), keep the first per_country rows of each group
+    rng = np.random.default_rng(0)
+    shuffled = rng.permutation(len(df))
+    grouped = shuffled[np.argsort(codes[shuffled], kind='stable')]
+    grouped_codes = codes[grouped]
+    rank = np.arange(len(grouped)) - np.searchsorted(grouped_codes, grouped_codes, side='left')
+    chosen = np.sort(grouped[rank < per_country])
+    
+    n_codes = codes.max() + 1 if len(codes) else 0
+    population = np.bincount(codes, weights=row_weights, minlength=n_codes)
+    sampled = np.bincount(codes[chosen], weights=row_weights[chosen], minlength=n_codes)
+    expansion = population / np.where(sampled > 0, sampled, 1)
+    
+    sample = df.iloc[chosen].copy()
+    sample[WEIGHT_COLUMN] = row_weights[chosen] * expansion[codes[chosen]]
+    return sample
+
+
+def estimate_error_bound(weights, value):
+    """
+    Approximate 95% error bound of a percentage estimated from weighted sample rows.
+    
+    Uses the effective sample size of the weights (Kish) and a finite population
+    correction, so a group that was sampled completely has a bound of 0.
+    
+    Args:
+        weights (pd.Series): Sample weights of the rows the percentage is taken over
+        value (float): Estimated percentage (0-100)
+    
+    Returns:
+        float: Bound in percentage points (value is within +/- bound)
+    """
+    n = len(weights)
+    total = weights.sum()
+    if n == 0 or total <= 0:
+        return 0.0
+    
+    n_effective = total ** 2 / (weights ** 2).sum()
+    correction = max(0.0, 1 - n / total)
+    share = value / 100
+    return round(float(1.96 * np.sqrt(share * (1 - share) / n_effective * correction) * 100), 2)
+
+
+def get_choropleth_estimate(df, metric, per_country=SAMPLE_PER_COUNTRY):
+    """
+    Estimate get_choropleth_data() from the stratified sample.
+    
+    Args:
+        df (pd.DataFrame): Cleaned dataframe from clean_and_convert_types()
+        metric (str): One of get_available_metrics().keys()
+        per_country (int): Sample rows per country
+    
+    Returns:
+        pd.DataFrame: Columns [Country, metric_value, respondents, error]; respondents
+                      are exact, error is the bound of metric_value in percentage points
+    """
+    sample = get_stratified_sample(df, per_country)
+    estimate = get_choropleth_data(sample, metric).copy()
+    weights = sample.groupby('Country', observed=True)[WEIGHT_COLUMN]
+    estimate['error'] = [
+        estimate_error_bound(weights.get_group(country), value)
+        for country, value in zip(estimate['Country'], estimate['metric_value'])
+    ]
+    return estimate
+
+
+def get_global_estimates(df, per_country=SAMPLE_PER_COUNTRY):
+    """
+    Estimate the all-respondents ("Global") secondary chart data from the stratified sample.
+    
+    Args:
+        df (pd.DataFrame): Cleaned dataframe from clean_and_convert_types()
+        per_country (int): Sample rows per country
+    
+    Returns:
+        dict: {'radar': (data, errors), 'butterfly': (data, errors), 'stacked_bar': (data, errors)},
+              data as from get_radar_data() etc. and errors with the layout of the
+              per-country values, e.g. [bound per radar metric]
+    """
+    sample = get_stratified_sample(df, per_country)
+    weights = sample[WEIGHT_COLUMN]
+    
+    radar = get_radar_data(sample)
+    radar_errors = [estimate_error_bound(weights, value) for value in radar['countries'][0]['values']]
+    
+    butterfly = get_butterfly_data(sample)
+    butterfly_errors = {
+        emp_type: {
+            day_cat: estimate_error_bound(weights[sample['self_employed'] == emp_value], pct)
+            for day_cat, pct in butterfly['countries'][0][emp_type].items()
+        }
+        for emp_type, emp_value in EMPLOYMENT_TYPES.items()
     }
     
-    # Get data for country2 if provided
-    if country2:
-        country2_df = df[df['Country'] == country2]
-        country2_agg = aggregate_stacked_bar_for_country(country2_df)
-        
-        stacked_data['country2'] = {
-            'name': country2,
-            **country2_agg
+    stacked = get_stacked_bar_data(sample)
+    stacked_errors = {
+        weakness_cat: {
+            response: estimate_error_bound(weights[sample['Social_Weakness'] == weakness_cat], pct)
+            for response, pct in stacked['countries'][0][weakness_cat].items()
         }
+        for weakness_cat in SOCIAL_WEAKNESS_ORDER
+    }
+    
+    return {
+        'radar': (radar, radar_errors),
+        'butterfly': (butterfly, butterfly_errors),
+        'stacked_bar': (stacked, stacked_errors),
+    }
+
+
+# ============================================================================
+# SECTION 12: RESPONSE DRILL-DOWN (server-side paged table)
+# ============================================================================
+
+# Filter operators understood by get_response_page()
+FILTER_OPERATORS = ('=', '!=', '<', '<=', '>', '>=', 'contains', 'datestartswith')
+
+
+@cached
+def get_column_codes(df, column):
+    """
+    Integer codes of a column and the distinct values they stand for.
+    
+    Categorical columns use their own codes; others (Timestamp) are factorized once.
+    
+    Args:
+        df (pd.DataFrame): Cleaned dataframe from clean_and_convert_types()
+        column (str): Column name
+    
+    Returns:
+        tuple: (np.ndarray of codes per row, -1 for missing values; pd.Series of values by code)
+    """
+    values = df[column]
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(), pd.Series(values.cat.categories)
+    codes, uniques = pd.factorize(values, sort=True)
+    return codes, pd.Series(uniques)
+
+
+@cached
+def get_country_row_index(df):
+    """
+    Row positions of every country, so a country's rows are found without a scan.
+    
+    Args:
+        df (pd.DataFrame): Cleaned dataframe from clean_and_convert_types()
+    
+    Returns:
+        dict: Country name -> np.ndarray of row positions (ascending)
+    """
+    codes, countries = get_column_codes(df, 'Country')
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(len(countries) + 1))
+    return {
+        country: order[bounds[code]:bounds[code + 1]]
+        for code, country in enumerate(countries)
+        if bounds[code + 1] > bounds[code]
+    }
+
+
+@cached
+def get_sort_rank(df, column):
+    """
+    Sort key of every row for one column: the rank of its value among the column's values.
+    
+    Computed once per column from the categorical codes (or values), so sorting
+    any subset of rows only compares small integers. Equal values share a rank,
+    missing values rank first (-1).
+    
+    Args:
+        df (pd.DataFrame): Cleaned dataframe from clean_and_convert_types()
+        column (str): Column name
+    
+    Returns:
+        np.ndarray: int32 rank per row position
+    """
+    codes, labels = get_column_codes(df, column)
+    # Categories need not be in sorted order; rank them once
+    label_rank = np.argsort(np.argsort(labels.to_numpy(), kind='stable')).astype(np.int32)
+    return np.where(codes >= 0, label_rank[codes], -1).astype(np.int32)
+
+
+def _filter_mask(values, operator, value):
+    """Boolean mask of values (a pd.Series) passing one filter term."""
+    if operator == 'contains':
+        return values.astype(str).str.contains(str(value), case=False, regex=False)
+    if operator == 'datestartswith':
+        text = values.dt.strftime(TIMESTAMP_FORMAT) if pd.api.types.is_datetime64_any_dtype(values) \
+            else values.astype(str)
+        return text.str.startswith(str(value))
+    
+    if pd.api.types.is_datetime64_any_dtype(values):
+        value = pd.Timestamp(value)
+    else:
+        values, value = values.astype(str), str(value)
+    comparisons = {
+        '=': values.__eq__, '!=': values.__ne__, '<': values.__lt__,
+        '<=': values.__le__, '>': values.__gt__, '>=': values.__ge__,
+    }
+    return comparisons[operator](value).fillna(False)
+
+
+def _filter_positions(df, positions, filters):
+    """Keep the positions whose rows pass all (column, operator, value) filters."""
+    for column, operator, value in filters:
+        # Evaluate the filter on the distinct values only, then match row codes
+        codes, labels = get_column_codes(df, column)
+        matching = np.flatnonzero(_filter_mask(labels, operator, value).to_numpy())
+        positions = positions[np.isin(codes[positions], matching)]
+    return positions
+
+
+def get_response_page(df, country, page, page_size, sort_by=(), filters=()):
+    """
+    One page of a country's respondent rows, sorted and filtered.
+    
+    Only the rows of the requested page are materialised. Deduplicated frames
+    return their unique rows, each with the number of responses in WEIGHT_COLUMN.
+    
+    Args:
+        df (pd.DataFrame | SQLDataset): Cleaned dataset
+        country (str): Country name
+        page (int): Page number (from 0)
+        page_size (int): Rows per page
+        sort_by (sequence): (column, ascending) pairs, most significant first
+        filters (sequence): (column, operator, value) triples, operator from FILTER_OPERATORS
+    
+    Returns:
+        tuple: (pd.DataFrame of the page's rows with Timestamp as text, number of matching rows)
+    
+    Raises:
+        KeyError: If a sort or filter column is unknown
+        ValueError: If a filter operator is unknown
+    
+    Example:
+        >>> rows, total = get_response_page(df_clean, 'Canada', 0, 50, [('Gender', True)],
+        ...                                 [('treatment', '=', 'Yes')])
+    """
+    columns = df.columns if isinstance(df, SQLDataset) else [c for c in df.columns if c != WEIGHT_COLUMN]
+    for column, *_ in list(sort_by) + list(filters):
+        if column not in columns:
+            raise KeyError(column)
+    for _, operator, _ in filters:
+        if operator not in FILTER_OPERATORS:
+            raise ValueError(f"Unknown filter operator {operator!r}, expected one of {FILTER_OPERATORS}")
+    
+    if isinstance(df, SQLDataset):
+        return df.page({'Country': country}, filters, sort_by, page * page_size, page_size)
+    
+    positions = get_country_row_index(df).get(country, np.empty(0, dtype=np.intp))
+    positions = _filter_positions(df, positions, filters)
+    
+    if sort_by:
+        # np.lexsort sorts by the last key first and is stable, so ties keep row order
+        keys = [get_sort_rank(df, column)[positions] * (1 if ascending else -1)
+                for column, ascending in reversed(list(sort_by))]
+        positions = positions[np.lexsort(keys)]
+    
+    rows = df.iloc[positions[page * page_size:(page + 1) * page_size]].copy()
+    rows['Timestamp'] = rows['Timestamp'].dt.strftime(TIMESTAMP_FORMAT)
+    return rows.reset_index(drop=True), len(positions)
+
+
+# ============================================================================
+# SECTION 13: ASSOCIATIONS BETWEEN CATEGORICAL COLUMNS
+# ============================================================================
+
+@cached
+def get_category_code_table(df):
+    """
+    The distinct combinations of values of the categorical columns, as codes with their counts.
     
-    return stacked_data
+    The datasets repeat a few thousand combinations over hundreds of thousands of
+    rows, so contingency tables built from this table cost a bincount over its
+    rows instead of a pass over the dataset.
+    
+    Args:
+        df (pd.DataFrame | SQLDataset): Cleaned dataset
+    
+    Returns:
+        tuple: (list of column names; np.ndarray of codes, one row per combination and
+                one column per name, -1 for missing values; np.ndarray of (weighted)
+                counts per combination; list of pd.Index of values by code per column)
+    """
+    columns = [column for column in CATEGORICAL_COLUMNS if column in df.columns]
+    
+    if isinstance(df, SQLDataset):
+        counts = df.counts(columns)
+        combinations = pd.DataFrame(list(counts), columns=columns)
+        coded = [pd.factorize(combinations[column], sort=True) for column in columns]
+        weights = np.array([n for (n,) in counts.values()], dtype='float64')
+        return columns, np.column_stack([codes for codes, _ in coded]), weights, [pd.Index(values) for _, values in coded]
+    
+    coded = [get_column_codes(df, column) for column in columns]
+    shape = tuple(len(values) + 1 for _, values in coded)
+    combined = np.ravel_multi_index(tuple(codes.astype(np.int64) + 1 for codes, _ in coded), shape)
+    unique, inverse = np.unique(combined, return_inverse=True)
+    
+    row_weights = df[WEIGHT_COLUMN].to_numpy(dtype='float64') if WEIGHT_COLUMN in df.columns else None
+    weights = np.bincount(inverse, weights=row_weights, minlength=len(unique)).astype('float64')
+    codes = np.column_stack(np.unravel_index(unique, shape)) - 1
+    return columns, codes, weights, [pd.Index(values) for _, values in coded]
+
+
+def _chi_square(table):
+    """
+    Chi-square statistic, degrees of freedom and Cramér's V of a contingency table.
+    
+    Empty rows and columns are ignored; V is NaN when fewer than two categories remain.
+    """
+    table = table[table.sum(axis=1) > 0][:, table.sum(axis=0) > 0]
+    n = table.sum()
+    rows, cols = table.shape
+    if n == 0 or min(rows, cols) < 2:
+        return 0.0, 0, np.nan
+    
+    expected = np.outer(table.sum(axis=1), table.sum(axis=0)) / n
+    chi2 = float(((table - expected) ** 2 / expected).sum())
+    cramers_v = np.sqrt(chi2 / (n * (min(rows, cols) - 1)))
+    return round(chi2, 2), (rows - 1) * (cols - 1), round(float(min(cramers_v, 1.0)), 4)
+
+
+@cached
+def get_association_table(df, country=None):
+    """
+    Association strength of every pair of categorical columns (chi-square and Cramér's V).
+    
+    The contingency tables of all pairs are bincounts over the rows of
+    get_category_code_table(), so a country's 120 tables take milliseconds.
+    Rows with a missing value in either column of a pair are left out of its table.
+    
+    Args:
+        df (pd.DataFrame | SQLDataset): Cleaned dataset
+        country (str, optional): Country name, or None for all respondents
+    
+    Returns:
+        pd.DataFrame: One row per column pair [column1, column2, chi2, dof, cramers_v,
+                      respondents]; cramers_v is NaN where a column has a single
+                      value (e.g. Country within one country)
+    
+    Example:
+        >>> get_association_table(df_clean, 'Canada').nlargest(1, 'cramers_v')[['column1', 'column2']]
+                 column1      column2
+        78  Days_Indoors  Mood_Swings
+    """
+    columns, codes, weights, labels = get_category_code_table(df)
+    if country is not None:
+        position = columns.index('Country')
+        matches = np.flatnonzero(labels[position] == country)
+        selected = codes[:, position] == (matches[0] if len(matches) else -2)
+        codes, weights = codes[selected], weights[selected]
+    sizes = [len(values) for values in labels]
+    
+    rows = []
+    for i in range(len(columns)):
+        for j in range(i + 1, len(columns)):
+            present = (codes[:, i] >= 0) & (codes[:, j] >= 0)
+            table = np.bincount(
+                codes[present, i] * sizes[j] + codes[present, j],
+                weights=weights[present], minlength=sizes[i] * sizes[j],
+            ).reshape(sizes[i], sizes[j])
+            rows.append((columns[i], columns[j], *_chi_square(table), int(round(table.sum()))))
+    
+    return pd.DataFrame(rows, columns=['column1', 'column2', 'chi2', 'dof', 'cramers_v', 'respondents'])
@@ -0,0 +1,252 @@
+"""
+Opt-in profiling of live Dash callback requests.
+
+Enabled with MHV_PROFILE=1 (samples a fraction of /_dash-update-component
+requests) and/or MHV_PROFILE_TOKEN=<secret> (profiles every request carrying the
+header "X-Profile: <secret>"). With neither set, no hooks are installed at all.
+
+Work a request hands to helper threads (the chart executor, see app.submit_chart_work())
+is profiled with the request when submitted through attributed(); other work on
+the same threads, e.g. for concurrent requests, is not.
+
+Each profiled request writes to MHV_PROFILE_DIR:
+- <name>.folded: collapsed call stacks ("a;b;c count" per line), readable by
+  flamegraph.pl, speedscope and inferno ("sample" mode), or
+  <name>.prof: cProfile statistics for pstats/snakeviz ("cprofile" mode)
+- <name>.json: the callback's outputs and inputs, duration and sample count
+Only the newest MHV_PROFILE_KEEP profiles are kept.
+"""
+import contextvars
+import cProfile
+import functools
+import json
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+import flask
+
+from . import config
+
+CALLBACK_PATH = "/_dash-update-component"
+
+# Profiler of the request being handled, if it is profiled
+_active_profiler = contextvars.ContextVar("active_profiler", default=None)
+
+
+def _fold(frame):
+    """Return the call stack of frame as a collapsed 'outer;...;inner' string."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler(threading.Thread):
+    """Background thread counting the collapsed stacks of a request every interval seconds."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+        # Helper threads currently running work of the request: thread id -> label
+        self._helpers = {}
+        self._lock = threading.Lock()
+
+    def attach(self, func, *args):
+        """Run func(*args) on the current (helper) thread, sampled as part of the request."""
+        thread = threading.current_thread()
+        with self._lock:
+            self._helpers[thread.ident] = thread.name
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self._helpers.pop(thread.ident, None)
+
+    def _sampled_threads(self):
+        """Return {thread id: label} of the threads working for the request."""
+        with self._lock:
+            return {self.thread_id: None, **self._helpers}
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id, label in self._sampled_threads().items():
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = _fold(frame)
+                self.stacks[f"[{label}];{stack}" if label else stack] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class CallProfiler:
+    """cProfile of a request, including the work it hands to helper threads."""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        # One profile per piece of offloaded work (a profile covers a single thread)
+        self._helpers = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        self.profile.enable()
+
+    def attach(self, func, *args):
+        """Run func(*args) on the current (helper) thread under a profile of its own."""
+        helper = cProfile.Profile()
+        helper.enable()
+        try:
+            return func(*args)
+        finally:
+            helper.disable()
+            with self._lock:
+                self._helpers.append(helper)
+
+    def dump_stats(self, path):
+        """Stop profiling and write the request thread's and helpers' statistics, merged."""
+        self.profile.disable()
+        stats = pstats.Stats(self.profile)
+        with self._lock:
+            for helper in self._helpers:
+                stats.add(helper)
+        stats.dump_stats(path)
+
+
+def attributed(func):
+    """
+    Wrap func so that, run on a helper thread, it is profiled with the current request.
+
+    Call it in the request (or its coroutine) when submitting the work; without an
+    active profile, func is returned unchanged.
+
+    Example:
+        >>> chart_executor.submit(attributed(build_chart), df, ...)
+    """
+    profiler = _active_profiler.get()
+    if profiler is None:
+        return func
+    return functools.partial(profiler.attach, func)
+
+
+def _describe_callback(body):
+    """Return the outputs and inputs of a Dash callback request body."""
+    def describe(items):
+        described = []
+        for item in items or []:
+            for entry in (item if isinstance(item, list) else [item]):
+                value = repr(entry.get("value"))
+                described.append({
+                    "id": entry.get("id"),
+                    "property": entry.get("property"),
+                    "value": value if len(value) <= 200 else value[:200] + "...",
+                })
+        return described
+
+    return {
+        "output": body.get("output"),
+        "inputs": describe(body.get("inputs")),
+        "state": describe(body.get("state")),
+    }
+
+
+def _rotate(directory, keep):
+    """Delete the oldest profiles so that at most keep remain."""
+    metadata = sorted(directory.glob("*.json"), key=lambda p: p.stat().st_mtime)
+    for stale in metadata[:max(0, len(metadata) - keep)]:
+        for path in directory.glob(stale.stem + ".*"):
+            path.unlink(missing_ok=True)
+
+
+def _should_profile():
+    """Decide whether the current request is profiled."""
+    if flask.request.path != CALLBACK_PATH:
+        return False
+    if config.PROFILE_TOKEN and flask.request.headers.get("X-Profile") == config.PROFILE_TOKEN:
+        return True
+    return config.PROFILE and random.random() < config.PROFILE_SAMPLE_RATE
+
+
+def _start_profile():
+    if not _should_profile():
+        return
+
+    if config.PROFILE_MODE == "cprofile":
+        profiler = CallProfiler()
+    else:
+        profiler = StackSampler(threading.get_ident(), config.PROFILE_INTERVAL_MS / 1000)
+    profiler.start()
+    _active_profiler.set(profiler)
+    flask.g.profile = (profiler, time.perf_counter())
+
+
+def _finish_profile(exc):
+    profile = flask.g.pop("profile", None)
+    if profile is None:
+        return
+
+    profiler, started = profile
+    # Request threads are reused: the next request on this one is not profiled
+    _active_profiler.set(None)
+    duration = time.perf_counter() - started
+    body = flask.request.get_json(silent=True) or {}
+    meta = _describe_callback(body)
+
+    directory = Path(__file__).parent.parent / config.PROFILE_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+    outputs = re.sub(r"[^A-Za-z0-9]+", "-", re.sub(r"@[0-9a-f]+", "", meta["output"] or ""))
+    name = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{os.getpid()}-{outputs.strip('-')[:80]}"
+
+    if isinstance(profiler, StackSampler):
+        profiler.stop()
+        samples = sum(profiler.stacks.values())
+        with open(directory / f"{name}.folded", "w") as f:
+            for stack, count in profiler.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+    else:
+        profiler.dump_stats(directory / f"{name}.prof")
+        samples = None
+
+    meta.update({
+        "duration_ms": round(duration * 1000, 2),
+        "samples": samples,
+        "mode": config.PROFILE_MODE,
+        "error": repr(exc) if exc else None,
+    })
+    with open(directory / f"{name}.json", "w") as f:
+        json.dump(meta, f, indent=2)
+
+    _rotate(directory, config.PROFILE_KEEP)
+
+
+def init_profiling(server):
+    """
+    Install the profiling hooks on the Flask server if profiling is configured.
+
+    Args:
+        server (flask.Flask): The Dash app's server
+
+    Returns:
+        bool: True if hooks were installed
+    """
+    if not (config.PROFILE or config.PROFILE_TOKEN):
+        return False
+
+    server.before_request(_start_profile)
+    server.teardown_request(_finish_profile)
+    return True
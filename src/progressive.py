@@ -0,0 +1,106 @@
+"""
+Progressive aggregation: estimates first, exact results shortly after.
+
+With MHV_PROGRESSIVE=1, an aggregate that is not cached yet is computed in a
+background thread. If it finishes within MHV_PROGRESSIVE_BUDGET_MS it is used
+directly; otherwise the caller gets an estimate from a stratified per-country
+sample together with error bounds, and the UI asks for the exact result in a
+follow-up callback, which joins the computation already under way.
+"""
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from . import config
+from .cache import is_cached
+from .preprocessing import (
+    get_choropleth_data, get_choropleth_estimate,
+    get_radar_data, get_butterfly_data, get_stacked_bar_data, get_global_estimates,
+    get_radar_country_values, get_butterfly_country_data, get_stacked_bar_country_data,
+)
+from .sql_backend import SQLDataset
+
+_executor = None
+
+
+def _get_executor():
+    """Create the thread pool lazily, so it is never started in a pre-fork master."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=config.PROGRESSIVE_WORKERS, thread_name_prefix="refine")
+    return _executor
+
+
+def _exact_within_budget(compute):
+    """Start compute() in the background and return its result if it is ready within the budget, else None."""
+    future = _get_executor().submit(compute)
+    try:
+        return future.result(timeout=config.PROGRESSIVE_BUDGET_MS / 1000)
+    except TimeoutError:
+        return None
+
+
+def get_choropleth_progressive(df, metric):
+    """
+    Return the choropleth data of a metric, estimated if the exact data is not ready in time.
+
+    Args:
+        df (pd.DataFrame): Cleaned dataframe from clean_and_convert_types()
+        metric (str): One of get_available_metrics().keys()
+
+    Returns:
+        tuple: (data as from get_choropleth_data(), error bounds per country or None if exact)
+    """
+    # Database-backed datasets answer from indexed queries and have no sample
+    if not config.PROGRESSIVE or isinstance(df, SQLDataset) or is_cached(get_choropleth_data, df, metric):
+        return get_choropleth_data(df, metric), None
+
+    exact = _exact_within_budget(lambda: get_choropleth_data(df, metric))
+    if exact is not None:
+        return exact, None
+
+    estimate = get_choropleth_estimate(df, metric, config.PROGRESSIVE_SAMPLE_PER_COUNTRY)
+    return estimate.drop(columns='error'), estimate['error'].tolist()
+
+
+def _global_exact(df):
+    return {
+        'radar': get_radar_data(df),
+        'butterfly': get_butterfly_data(df),
+        'stacked_bar': get_stacked_bar_data(df),
+    }
+
+
+def get_global_progressive(df):
+    """
+    Return the all-respondents secondary chart data, estimated if not ready in time.
+
+    Args:
+        df (pd.DataFrame): Cleaned dataframe from clean_and_convert_types()
+
+    Returns:
+        tuple: ({'radar', 'butterfly', 'stacked_bar'} data, their error bounds or None if exact)
+    """
+    ready = all(
+        is_cached(func, df, None)
+        for func in (get_radar_country_values, get_butterfly_country_data, get_stacked_bar_country_data)
+    )
+    if not config.PROGRESSIVE or isinstance(df, SQLDataset) or ready:
+        return _global_exact(df), None
+
+    exact = _exact_within_budget(lambda: _global_exact(df))
+    if exact is not None:
+        return exact, None
+
+    estimates = get_global_estimates(df, config.PROGRESSIVE_SAMPLE_PER_COUNTRY)
+    return (
+        {chart: data for chart, (data, _) in estimates.items()},
+        {chart: errors for chart, (_, errors) in estimates.items()},
+    )
+
+
+def max_error(errors):
+    """Return the largest bound in a (nested) structure of error bounds."""
+    if isinstance(errors, dict):
+        return max((max_error(value) for value in errors.values()), default=0.0)
+    if isinstance(errors, (list, tuple)):
+        return max((max_error(value) for value in errors), default=0.0)
+    return float(errors)
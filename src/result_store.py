@@ -0,0 +1,161 @@
+"""
+Shared result stores used as the second tier of the aggregate cache.
+
+Stores map content-addressed string keys to bytes. The SQLite store is a local
+file shared by every worker on the machine and survives restarts; the Redis
+store is an optional remote tier for multi-machine deployments.
+"""
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# Only refresh an entry's access time if it is older than this (seconds),
+# so that cache hits do not turn into a write on every request
+ACCESS_RESOLUTION = 60
+
+
+class SQLiteStore:
+    """
+    Size-bounded key/value store in a local SQLite file.
+
+    Safe to use from several threads and forked processes: each thread of each
+    process opens its own connection, and the database runs in WAL mode so readers
+    never block on a writer. When the stored values exceed max_bytes, the least
+    recently used entries are evicted. The total size is kept in a one-row table
+    that triggers update in the same transaction as each write, so checking the
+    bound does not scan the entries.
+    """
+
+    def __init__(self, path, max_bytes):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+                "size INTEGER NOT NULL, accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+            conn.execute("CREATE TABLE IF NOT EXISTS totals (id INTEGER PRIMARY KEY CHECK (id = 0), size INTEGER NOT NULL)")
+            # Files written before the totals table existed start from their current size
+            conn.execute("INSERT OR IGNORE INTO totals (id, size) SELECT 0, COALESCE(SUM(size), 0) FROM entries")
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries "
+                "BEGIN UPDATE totals SET size = size + NEW.size; END"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries "
+                "BEGIN UPDATE totals SET size = size - OLD.size; END"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS entries_resize AFTER UPDATE OF size ON entries "
+                "BEGIN UPDATE totals SET size = size + NEW.size - OLD.size; END"
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _connect(self):
+        """Return this thread's connection, reopening it after a fork."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        """Return the stored bytes for key, or None."""
+        conn = self._connect()
+        row = conn.execute("SELECT value, accessed FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+
+        now = time.time()
+        if now - row[1] > ACCESS_RESOLUTION:
+            conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def set(self, key, value):
+        """Store bytes under key and evict old entries if the size bound is exceeded."""
+        conn = self._connect()
+        # An upsert rather than INSERT OR REPLACE, whose implicit delete would skip the size triggers
+        conn.execute(
+            "INSERT INTO entries (key, value, size, accessed) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, size = excluded.size, accessed = excluded.accessed",
+            (key, value, len(value), time.time())
+        )
+        self._evict(conn)
+
+    def size(self):
+        """Return the total size of the stored values in bytes."""
+        return self._connect().execute("SELECT size FROM totals").fetchone()[0]
+
+    def _evict(self, conn):
+        """Drop least recently used entries until the store is back under 90% of its bound."""
+        total = conn.execute("SELECT size FROM totals").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        target = self.max_bytes * 0.9
+        stale = []
+        # Walks the access time index and stops as soon as enough is found
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed"):
+            if total <= target:
+                break
+            stale.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM entries WHERE key = ?", stale)
+
+    def clear(self):
+        """Remove all entries."""
+        self._connect().execute("DELETE FROM entries")
+
+
+class RedisStore:
+    """
+    Remote key/value store on Redis (requires the redis package).
+
+    Size bounds are left to the server's maxmemory policy (e.g. allkeys-lru);
+    entries additionally expire after ttl seconds. All keys are stored under
+    prefix, so the database can be shared with other applications.
+    """
+
+    # Keys deleted per SCAN batch by clear()
+    CLEAR_BATCH = 500
+
+    def __init__(self, url, ttl=None, prefix="mhv:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        """Return the stored bytes for key, or None."""
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value):
+        """Store bytes under key."""
+        self.client.set(self.prefix + key, value, ex=self.ttl)
+
+    def clear(self):
+        """Remove all entries of this store (keys under its prefix only)."""
+        batch = []
+        for key in self.client.scan_iter(match=self.prefix + "*", count=self.CLEAR_BATCH):
+            batch.append(key)
+            if len(batch) >= self.CLEAR_BATCH:
+                self.client.delete(*batch)
+                batch = []
+        if batch:
+            self.client.delete(*batch)
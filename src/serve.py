@@ -0,0 +1,128 @@
+"""
+Production server entry point: python -m src.serve
+
+Loads and cleans the dataset and warms the aggregate cache once in the gunicorn
+master, then forks the workers so they inherit that state copy-on-write.
+"""
+import gc
+import math
+
+from gunicorn.app.base import BaseApplication
+
+from . import config
+from .memory import get_rss_mb, get_pss_mb, get_cpu_count, get_available_memory_mb
+
+# Share of available memory the workers are allowed to plan for
+MEMORY_HEADROOM = 0.8
+
+# Private memory of a forked worker relative to the master, if not configured.
+# Most of the dataframe stays shared; touched Python objects and request state do not.
+WORKER_MEMORY_FRACTION = 0.5
+
+
+def plan_concurrency(master_rss_mb):
+    """
+    Pick gunicorn worker and thread counts from available cores and memory.
+
+    Workers follow the usual 2 * cores + 1 rule, capped by how many estimated
+    worker footprints fit into the available memory. When memory is the limit,
+    threads per worker grow to keep the same total concurrency.
+
+    Args:
+        master_rss_mb (float): RSS of the fully loaded master process
+
+    Returns:
+        tuple: (workers, threads)
+    """
+    cores = get_cpu_count()
+    target_concurrency = 2 * cores + 1
+
+    per_worker_mb = config.WORKER_MEMORY_MB or max(master_rss_mb * WORKER_MEMORY_FRACTION, 64)
+    available_mb = get_available_memory_mb()
+    if available_mb is not None:
+        memory_workers = int(available_mb * MEMORY_HEADROOM // per_worker_mb)
+    else:
+        memory_workers = target_concurrency
+
+    workers = config.WORKERS or max(1, min(target_concurrency, memory_workers))
+    threads = config.THREADS or max(2, min(8, math.ceil(target_concurrency / workers)))
+    return workers, threads
+
+
+def _post_fork(server, worker):
+    """Re-enable the garbage collector in the child; the frozen generation stays untouched."""
+    gc.enable()
+
+
+def _master_ready(master_rss, n_rows, n_countries, workers, threads):
+    """Return a gunicorn when_ready hook logging the preloaded state and the concurrency plan."""
+    def when_ready(server):
+        server.log.info(
+            "Master ready: %d rows, %d countries cached, rss=%.1f MB -> %d workers x %d threads",
+            n_rows, n_countries, master_rss, workers, threads
+        )
+    return when_ready
+
+
+def _post_worker_init(worker):
+    """Log the worker's memory footprint once it is ready to serve."""
+    pss = get_pss_mb()
+    worker.log.info(
+        "Worker %s booted: rss=%.1f MB, pss=%s",
+        worker.pid, get_rss_mb(), f"{pss:.1f} MB" if pss is not None else "n/a"
+    )
+
+
+class DashboardApplication(BaseApplication):
+    """Gunicorn application serving an already loaded Flask server."""
+
+    def __init__(self, wsgi_app, options=None):
+        self.wsgi_app = wsgi_app
+        self.options = options or {}
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if key in self.cfg.settings and value is not None:
+                self.cfg.set(key, value)
+
+    def load(self):
+        return self.wsgi_app
+
+
+def main():
+    # Keep the collector from touching (and thereby copying) objects until they are frozen
+    gc.disable()
+
+    # Importing the app loads and cleans the data and builds the initial figures
+    from .app import server
+    from .datasets import get_dataset
+    from .preprocessing import warm_aggregate_cache
+
+    # Not kept in a local: this frame stays on the stack of every forked worker
+    n_rows = len(get_dataset())
+    n_countries = warm_aggregate_cache(get_dataset())
+
+    # Move everything allocated so far into the permanent generation, so that
+    # collections in the workers never write to the shared pages
+    gc.collect()
+    gc.freeze()
+
+    master_rss = get_rss_mb()
+    workers, threads = plan_concurrency(master_rss)
+
+    DashboardApplication(server, {
+        'bind': f"{config.HOST}:{config.PORT}",
+        'workers': workers,
+        'threads': threads,
+        'worker_class': 'gthread',
+        'preload_app': True,
+        'timeout': config.TIMEOUT,
+        'when_ready': _master_ready(master_rss, n_rows, n_countries, workers, threads),
+        'post_fork': _post_fork,
+        'post_worker_init': _post_worker_init,
+    }).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Coalescing of identical concurrent calls (single-flight)."""
+import threading
+
+
+class _Call:
+    """One in-flight computation and the threads waiting for it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Run at most one computation per key at a time.
+
+    The first thread to request a key computes it; threads asking for the same
+    key meanwhile block until it finishes and receive the same result (or the
+    same exception). Nothing is remembered once the call completes, so this is
+    meant to sit in front of a cache, not replace it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """
+        Return fn(), sharing the call with concurrent callers using the same key.
+
+        Args:
+            key: Hashable identity of the computation
+            fn (callable): Zero-argument function computing the result
+
+        Returns:
+            The result of fn()
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self):
+        """Return the number of computations currently running."""
+        with self._lock:
+            return len(self._calls)
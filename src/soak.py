@@ -0,0 +1,149 @@
+"""
+Soak test: replay thousands of callback requests in-process and watch RSS.
+
+    python -m src.soak --requests 5000 --max-growth-mb 20
+
+Random metric changes and country-pair comparisons are posted to the app through
+the Flask test client, exactly as the browser would. RSS is sampled along the
+way; after a warm-up (which fills the caches) it should stay flat. The command
+prints the per-stage memory statistics and exits with status 1 if RSS grew by
+more than --max-growth-mb after the warm-up.
+"""
+import argparse
+import json
+import random
+import sys
+
+from . import config
+
+
+def _outputs(output):
+    """Return the 'outputs' field of a request body for a Dash output string."""
+    if output.startswith(".."):
+        return [dict(zip(("id", "property"), part.rsplit(".", 1))) for part in output[2:-2].split("...")]
+    return dict(zip(("id", "property"), output.rsplit(".", 1)))
+
+
+def _find_output(dependencies, output_id):
+    """Return the output string of the callback that writes output_id first (not as a duplicate)."""
+    for dependency in dependencies:
+        first = dependency["output"].strip(".").split("...")[0]
+        if "@" not in first and first.rsplit(".", 1)[0] == output_id:
+            return dependency["output"]
+    raise LookupError(f"No callback writes {output_id}")
+
+
+def _post(client, output, inputs, state=()):
+    body = {
+        "output": output,
+        "outputs": _outputs(output),
+        "inputs": inputs,
+        "changedPropIds": [f"{i['id']}.{i['property']}" for i in inputs],
+        "state": list(state),
+    }
+    response = client.post("/_dash-update-component", json=body)
+    if response.status_code != 200:
+        raise RuntimeError(f"{output} failed with HTTP {response.status_code}")
+
+
+def run_soak(requests, sample_every, warmup, seed=0):
+    """
+    Replay random callbacks against the app and sample RSS.
+
+    Args:
+        requests (int): Number of callback requests to replay
+        sample_every (int): Sample RSS after every this many requests
+        warmup (float): Fraction of the requests run before growth is measured
+        seed (int): Random seed, so that runs are repeatable
+
+    Returns:
+        dict: {'samples': [(request number, RSS MB)], 'growth_mb', 'slope_mb_per_1k'}
+    """
+    from .memory import get_rss_mb
+    from .layouts import METRIC_OPTIONS
+    from .datasets import get_dataset, get_dataset_names
+    from .preprocessing import get_countries
+    from .app import app
+
+    client = app.server.test_client()
+    dependencies = client.get("/_dash-dependencies").get_json()
+    choropleth_output = _find_output(dependencies, "choropleth")
+    secondary_output = _find_output(dependencies, "stacked-bar")
+
+    metrics = [option["value"] for option in METRIC_OPTIONS]
+    datasets = get_dataset_names()
+    rng = random.Random(seed)
+
+    samples = []
+    for number in range(1, requests + 1):
+        dataset = rng.choice(datasets)
+        dataset_input = {"id": "dataset-dropdown", "property": "value", "value": dataset}
+        if rng.random() < 0.3:
+            # A metric change the browser left to the server (see update_choropleth)
+            metric = rng.choice(metrics)
+            _post(client, choropleth_output, [
+                dataset_input,
+                {"id": "choropleth-fallback-store", "property": "data", "value": {"metric": metric, "dataset": dataset}},
+            ], [{"id": "metric-dropdown", "property": "value", "value": metric}])
+        else:
+            countries = get_countries(get_dataset(dataset)) + [None]
+            _post(client, secondary_output, [
+                {"id": "selected-ctry1-store", "property": "data", "value": rng.choice(countries)},
+                {"id": "selected-ctry2-store", "property": "data", "value": rng.choice(countries)},
+                {"id": "compare-more-dropdown", "property": "value",
+                 "value": rng.sample(countries[:-1], rng.randint(0, 3))},
+                dataset_input,
+            ])
+        if number % sample_every == 0 or number == requests:
+            samples.append((number, get_rss_mb()))
+
+    measured = [(n, rss) for n, rss in samples if n > requests * warmup] or samples[-1:]
+    growth = measured[-1][1] - measured[0][1]
+
+    # Least-squares slope of RSS over the measured requests
+    slope = 0.0
+    if len(measured) > 1:
+        mean_n = sum(n for n, _ in measured) / len(measured)
+        mean_rss = sum(rss for _, rss in measured) / len(measured)
+        var = sum((n - mean_n) ** 2 for n, _ in measured)
+        slope = sum((n - mean_n) * (rss - mean_rss) for n, rss in measured) / var
+
+    return {
+        "samples": samples,
+        "growth_mb": round(growth, 2),
+        "slope_mb_per_1k": round(slope * 1000, 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay callbacks and fail on RSS growth.")
+    parser.add_argument("--requests", type=int, default=2000, help="callback requests to replay")
+    parser.add_argument("--sample-every", type=int, default=100, help="requests between RSS samples")
+    parser.add_argument("--warmup", type=float, default=0.2, help="fraction of requests before measuring")
+    parser.add_argument("--max-growth-mb", type=float, default=20.0, help="allowed RSS growth after warm-up")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    # Callbacks must run in this process, and every stage should be recorded
+    config.BACKGROUND_CALLBACKS = False
+    config.MEMORY_STATS = True
+
+    from .memory import start_tracing, get_memory_report
+    start_tracing()
+
+    result = run_soak(args.requests, args.sample_every, args.warmup, args.seed)
+
+    print(json.dumps(get_memory_report(top=10)["stages"], indent=2))
+    for number, rss in result["samples"]:
+        print(f"{number:>8} requests  {rss:8.1f} MB")
+    print(f"RSS growth after warm-up: {result['growth_mb']} MB "
+          f"({result['slope_mb_per_1k']} MB per 1000 requests)")
+
+    if result["growth_mb"] > args.max_growth_mb:
+        print(f"FAIL: RSS grew by more than {args.max_growth_mb} MB", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,297 @@
+"""
+Out-of-core aggregation on an embedded database file.
+
+With MHV_BACKEND=sqlite (or duckdb, which needs the duckdb package), a dataset is
+not held in memory as a dataframe: its cleaned rows are written once to a
+database file under MHV_SQL_DIR, and the aggregation functions in
+preprocessing.py run as GROUP BY queries that only read the columns and rows
+they need (the Country filter uses an index). Percentages are derived from the
+returned counts exactly as on the pandas path, so both backends give identical
+results. The file is rebuilt when the source CSV's content or the cleaning changes.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+from . import config
+from .cache import set_dataset_version
+from .data_loader import read_source, resolve_path, get_content_version
+
+TABLE = "responses"
+WEIGHT_COLUMN = "weight"
+
+# Bump when the stored layout changes, so that existing files are rebuilt (a change
+# of the cleaning bumps data_loader.CLEANING_VERSION, which rebuilds them too)
+SCHEMA_VERSION = "2"
+
+# CSV rows cleaned and inserted per batch while building a database file
+INGEST_CHUNK_ROWS = 100_000
+
+# Timestamps are stored as text in this format (sorts chronologically)
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def _quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+def _connect(engine, path, read_only):
+    if engine == "duckdb":
+        import duckdb
+        return duckdb.connect(str(path), read_only=read_only)
+    if read_only:
+        return sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+    return sqlite3.connect(path, isolation_level=None)
+
+
+class SQLDataset:
+    """
+    A cleaned dataset stored in a database file, queried instead of a dataframe.
+
+    Passed to the aggregation functions in place of the dataframe; they detect it
+    and use counts() instead of pandas. Safe to use from several threads and
+    forked processes (each thread of each process opens its own read-only connection).
+    """
+
+    def __init__(self, path, engine):
+        self.path = Path(path)
+        self.engine = engine
+        self._local = threading.local()
+        columns = [row[0] for row in self.query(f"SELECT * FROM {TABLE} LIMIT 0", description=True)]
+        self.weighted = WEIGHT_COLUMN in columns
+        self.columns = [column for column in columns if column != WEIGHT_COLUMN]
+
+    def _connection(self):
+        """Return this thread's connection, reopening it after a fork."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = _connect(self.engine, self.path, read_only=True)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def query(self, sql, params=(), description=False):
+        """Run a query and return all rows (or the column description)."""
+        cursor = self._connection().cursor()
+        cursor.execute(sql, list(params))
+        return cursor.description if description else cursor.fetchall()
+
+    def __len__(self):
+        """Number of stored rows (unique rows for a deduplicated dataset)."""
+        return self.query(f"SELECT COUNT(*) FROM {TABLE}")[0][0]
+
+    def _where(self, where):
+        """Return a WHERE clause and its parameters for {column: value} equality filters."""
+        if not where:
+            return "", []
+        clause = " AND ".join(f"{_quote(column)} = ?" for column in where)
+        return f" WHERE {clause}", list(where.values())
+
+    def counts(self, group_by=(), where=None, conditions=()):
+        """
+        Count (weighted) rows per group, in total and matching each condition.
+
+        Args:
+            group_by (sequence): Columns to group by
+            where (dict, optional): Column -> value; only rows equal to all of them count
+            conditions (sequence): (column, value) pairs counted separately
+
+        Returns:
+            dict: Group values tuple -> (total, count per condition); without
+                  group_by the single key is ()
+
+        Example:
+            >>> ds.counts(['Country'], conditions=[('treatment', 'Yes')])[('Canada',)]
+            (22224, 11941)
+        """
+        weight = _quote(WEIGHT_COLUMN) if self.weighted else "1"
+        selects = [_quote(column) for column in group_by]
+        selects.append(f"SUM({weight})")
+        selects += [f"SUM(CASE WHEN {_quote(column)} = ? THEN {weight} ELSE 0 END)" for column, _ in conditions]
+        where_sql, where_params = self._where(where)
+        sql = f"SELECT {', '.join(selects)} FROM {TABLE}{where_sql}"
+        if group_by:
+            sql += " GROUP BY " + ", ".join(_quote(column) for column in group_by)
+
+        params = [value for _, value in conditions] + where_params
+        n_groups = len(group_by)
+        result = {}
+        for row in self.query(sql, params):
+            # SUM over no rows is NULL
+            counts = tuple(int(value or 0) for value in row[n_groups:])
+            result[tuple(row[:n_groups])] = counts
+        return result
+
+    def page(self, where, filters, sort_by, offset, limit):
+        """
+        Return limit rows from offset of the sorted rows matching where and filters.
+
+        Args:
+            where (dict): Column -> value equality filters
+            filters (sequence): (column, operator, value) triples as for
+                                preprocessing.get_response_page()
+            sort_by (sequence): (column, ascending) pairs, most significant first
+            offset (int): Matching rows skipped
+            limit (int): Maximum rows returned
+
+        Returns:
+            tuple: (pd.DataFrame of the rows, number of matching rows)
+        """
+        where_sql, params = self._where(where)
+        clauses = [where_sql[len(" WHERE "):]] if where_sql else []
+        for column, operator, value in filters:
+            quoted = _quote(column)
+            if operator == 'contains':
+                clauses.append(f"INSTR(LOWER({quoted}), ?) > 0")
+                params.append(str(value).lower())
+            elif operator == 'datestartswith':
+                clauses.append(f"SUBSTR({quoted}, 1, {len(str(value))}) = ?")
+                params.append(str(value))
+            else:
+                if column == 'Timestamp':
+                    value = pd.Timestamp(value).strftime(TIMESTAMP_FORMAT)
+                clauses.append(f"{quoted} {operator} ?")
+                params.append(str(value))
+        filter_sql = " WHERE " + " AND ".join(clauses) if clauses else ""
+
+        # Missing values first when ascending, ties in storage order (as on the pandas path)
+        order = [f"{_quote(column)} {'ASC NULLS FIRST' if ascending else 'DESC NULLS LAST'}"
+                 for column, ascending in sort_by]
+        order_sql = " ORDER BY " + ", ".join(order + ["rowid"])
+
+        total = self.query(f"SELECT COUNT(*) FROM {TABLE}{filter_sql}", params)[0][0]
+        cursor = self._connection().cursor()
+        cursor.execute(f"SELECT * FROM {TABLE}{filter_sql}{order_sql} LIMIT ? OFFSET ?", params + [limit, offset])
+        columns = [description[0] for description in cursor.description]
+        return pd.DataFrame(cursor.fetchall(), columns=columns), total
+
+    def iter_frames(self, filters=None, chunk_rows=50_000):
+        """
+        Yield the rows matching filters as dataframes of up to chunk_rows rows.
+
+        Args:
+            filters (dict, optional): Column -> list of accepted values
+            chunk_rows (int): Rows fetched per chunk
+
+        Raises:
+            KeyError: If a filter names an unknown column
+        """
+        clauses, params = [], []
+        for column, values in (filters or {}).items():
+            if column not in self.columns:
+                raise KeyError(column)
+            clauses.append(f"{_quote(column)} IN ({', '.join('?' * len(values))})")
+            params += values
+        sql = f"SELECT * FROM {TABLE}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+
+        cursor = self._connection().cursor()
+        cursor.execute(sql, params)
+        columns = [description[0] for description in cursor.description]
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            frame = pd.DataFrame(rows, columns=columns)
+            if self.weighted:
+                frame = frame.loc[frame.index.repeat(frame[WEIGHT_COLUMN])].drop(columns=WEIGHT_COLUMN)
+            yield frame
+            if len(rows) < chunk_rows:
+                return
+
+
+def _database_path(filepath, engine):
+    digest = hashlib.sha1(str(resolve_path(filepath)).encode()).hexdigest()[:12]
+    return Path(__file__).parent.parent / config.SQL_DIR / f"{Path(filepath).stem}-{digest}.{engine}"
+
+
+def _read_meta(path, engine):
+    """Return the meta entries of a database file, or None if it cannot be read."""
+    try:
+        conn = _connect(engine, path, read_only=True)
+        try:
+            return dict(conn.execute("SELECT key, value FROM meta").fetchall())
+        finally:
+            conn.close()
+    except Exception:
+        return None
+
+
+def _clean_chunk(chunk):
+    """Apply the cleaning of clean_and_convert_types() to raw CSV rows, as storable values."""
+    chunk['self_employed'] = chunk['self_employed'].fillna('Unknown')
+    timestamps = pd.to_datetime(chunk['Timestamp'], format='%m/%d/%Y %H:%M')
+    chunk['Timestamp'] = timestamps.dt.strftime(TIMESTAMP_FORMAT)
+    return chunk.astype(object).where(chunk.notna(), None)
+
+
+def _build(filepath, path, engine, compress, meta):
+    """Write the cleaned rows of filepath to a new database file at path."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.unlink(missing_ok=True)
+
+    conn = _connect(engine, tmp, read_only=False)
+    target = "staging" if compress else TABLE
+    columns = None
+    for chunk in read_source(filepath, dtype=str, chunksize=INGEST_CHUNK_ROWS):
+        chunk = _clean_chunk(chunk)
+        if columns is None:
+            columns = list(chunk.columns)
+            conn.execute(f"CREATE TABLE {target} ({', '.join(_quote(c) + ' TEXT' for c in columns)})")
+        if engine == "duckdb":
+            # Bulk insert straight from the dataframe (row-wise inserts are slow in DuckDB)
+            conn.register("chunk", chunk)
+            conn.execute(f"INSERT INTO {target} SELECT * FROM chunk")
+            conn.unregister("chunk")
+        else:
+            conn.execute("BEGIN")
+            conn.executemany(
+                f"INSERT INTO {target} VALUES ({', '.join('?' * len(columns))})",
+                list(chunk.itertuples(index=False, name=None)),
+            )
+            conn.execute("COMMIT")
+
+    if compress:
+        column_list = ", ".join(_quote(c) for c in columns)
+        # Unique rows in order of first occurrence, like compress_duplicates(), so that
+        # pages list rows with equal sort keys in the same order on both backends
+        conn.execute(
+            f"CREATE TABLE {TABLE} AS SELECT {column_list}, COUNT(*) AS {_quote(WEIGHT_COLUMN)} "
+            f"FROM staging GROUP BY {column_list} ORDER BY MIN(rowid)"
+        )
+        conn.execute("DROP TABLE staging")
+
+    conn.execute(f"CREATE INDEX {TABLE}_country ON {TABLE} ({_quote('Country')})")
+    conn.execute("CREATE TABLE meta (key TEXT, value TEXT)")
+    conn.executemany("INSERT INTO meta VALUES (?, ?)", list(meta.items()))
+    conn.close()
+    os.replace(tmp, path)
+
+
+def open_sql_dataset(filepath, compress=False):
+    """
+    Return the dataset of a CSV file as an SQLDataset, building its database file if needed.
+
+    Args:
+        filepath (str): CSV file (relative to project root)
+        compress (bool): Store unique rows with a weight column (see compress_duplicates())
+
+    Returns:
+        SQLDataset: Dataset marked with the same version as the equivalent dataframe
+    """
+    engine = config.BACKEND
+    path = _database_path(filepath, engine)
+    version = get_content_version(filepath, compress)
+    meta = {'version': version, 'schema': SCHEMA_VERSION}
+
+    if _read_meta(path, engine) != meta:
+        _build(filepath, path, engine, compress, meta)
+
+    dataset = SQLDataset(path, engine)
+    # Same results as the dataframe path, so shared cache entries can be reused across backends
+    set_dataset_version(dataset, version)
+    return dataset
@@ -17,6 +17,30 @@ STACKED_CHART_COLOR = {
     },
 }
 
+# Colours of the third and further compared countries (cycled when there are more)
+EXTRA_COUNTRY_COLORS = ["#4FB3A9", "#F2B134", "#5B8DEF", "#E377C2", "#8C6D31", "#17BECF", "#7F7F7F", "#BCBD22"]
+
+
+def _tint(color, amount):
+    """Blend a #RRGGBB colour with white (amount 0: unchanged, 1: white)."""
+    channels = [int(color[i:i + 2], 16) for i in (1, 3, 5)]
+    return "#" + "".join(f"{round(c + (255 - c) * amount):02X}" for c in channels)
+
+
+def country_color(index):
+    """Colour of the index-th compared country."""
+    if index < len(COUNTRY_COLORS):
+        return COUNTRY_COLORS[f"country{index + 1}"]
+    return EXTRA_COUNTRY_COLORS[(index - len(COUNTRY_COLORS)) % len(EXTRA_COUNTRY_COLORS)]
+
+
+def stacked_colors(index):
+    """Colours per mental_health_interview response of the index-th compared country."""
+    if index < len(STACKED_CHART_COLOR):
+        return STACKED_CHART_COLOR[f"country{index + 1}"]
+    base = country_color(index)
+    return {"No": base, "Maybe": _tint(base, 0.35), "Yes": _tint(base, 0.65)}
+
 FONT = "Murecho"
 FONT_TITLE="Murecho"
 
@@ -0,0 +1,28 @@
+"""
+Shared fixtures. Run the suite from the project root with python -m pytest, so
+that the src package is importable.
+"""
+import pytest
+
+from src.preprocessing import clean_and_convert_types, get_countries
+
+# Small survey edition, so that the suite stays fast
+DATA_PATH = "data/osmi_2016.csv"
+
+
+@pytest.fixture(scope="session")
+def data_path():
+    """CSV file the tests run on (relative to the project root)."""
+    return DATA_PATH
+
+
+@pytest.fixture(scope="session")
+def df(data_path):
+    """Cleaned dataframe of data_path (one row per response)."""
+    return clean_and_convert_types(filepath=data_path)
+
+
+@pytest.fixture(scope="session")
+def countries(df):
+    """Countries of the dataset, sorted."""
+    return get_countries(df)
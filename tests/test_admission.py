@@ -0,0 +1,113 @@
+"""Admission control of the heavy callbacks (src/admission.py)."""
+import asyncio
+import threading
+import time
+
+import pytest
+from werkzeug.exceptions import HTTPException
+
+from src import admission, config
+from src.admission import admitted, admitted_async
+
+
+@pytest.fixture(autouse=True)
+def one_slot(monkeypatch):
+    """One slot and one queue place, with fresh admission state."""
+    monkeypatch.setattr(config, "ADMISSION", True)
+    monkeypatch.setattr(config, "ADMISSION_SLOTS", 1)
+    monkeypatch.setattr(config, "ADMISSION_QUEUE", 1)
+    monkeypatch.setattr(config, "ADMISSION_TIMEOUT_MS", 2000)
+    monkeypatch.setattr(admission, "_slots", None)
+    monkeypatch.setattr(admission, "_queued", 0)
+    monkeypatch.setattr(admission, "_running", 0)
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def hold_slot():
+    """Take the slot in a thread until the returned event is set."""
+    release = threading.Event()
+    thread = threading.Thread(target=lambda: admitted_block(release))
+    thread.start()
+    wait_until(lambda: admission._running == 1)
+    return release, thread
+
+
+def admitted_block(release, log=None):
+    with admitted("test"):
+        if log is not None:
+            log.append("admitted")
+        release.wait()
+
+
+def queue_request():
+    """Start a request that waits in the queue; returns its release event, thread and log."""
+    release, log = threading.Event(), []
+    thread = threading.Thread(target=admitted_block, args=(release, log))
+    thread.start()
+    wait_until(lambda: admission._queued == 1)
+    return release, thread, log
+
+
+def test_full_queue_sheds_with_retry_after():
+    release, holder = hold_slot()
+    queued_release, queued, _ = queue_request()
+
+    with pytest.raises(HTTPException) as shed:
+        with admitted("test"):
+            pass
+    assert shed.value.response.status_code == 503
+    assert shed.value.response.headers["Retry-After"] == "2"
+    assert admission.get_admission_report()["callbacks"]["test"]["shed_queue_full"] >= 1
+
+    release.set()
+    queued_release.set()
+    holder.join()
+    queued.join()
+
+
+def test_queued_request_admitted_when_slot_frees():
+    release, holder = hold_slot()
+    queued_release, queued, log = queue_request()
+    assert log == []
+
+    release.set()
+    wait_until(lambda: log == ["admitted"])
+    assert admission._queued == 0
+    queued_release.set()
+    holder.join()
+    queued.join()
+    assert admission._running == 0
+
+
+def test_cancelled_async_wait_gives_slot_back():
+    release, holder = hold_slot()
+
+    async def give_up_waiting():
+        async def enter():
+            async with admitted_async("test"):
+                pass
+
+        task = asyncio.create_task(enter())
+        while admission._queued == 0:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        # The wait still takes the slot once it frees, and must hand it back
+        release.set()
+        deadline = time.monotonic() + 5
+        while admission._running or admission._queued:
+            assert time.monotonic() < deadline, "slot not given back"
+            await asyncio.sleep(0.01)
+
+    asyncio.run(give_up_waiting())
+    holder.join()
+    assert admission._get_slots().acquire(blocking=False)
+    admission._get_slots().release()
@@ -0,0 +1,70 @@
+"""JSON API (src/api.py)."""
+import flask
+import pytest
+
+from src import api, config, datasets
+from src.api import init_api
+from src.preprocessing import get_radar_country_values
+
+
+@pytest.fixture
+def client(data_path, monkeypatch):
+    """Test client of a server with the API, on the test dataset only."""
+    monkeypatch.setattr(config, "DATASETS", {"Test": data_path})
+    monkeypatch.setattr(config, "API", True)
+    monkeypatch.setattr(api, "_responses", {})
+    datasets.clear_datasets()
+    server = flask.Flask(__name__)
+    init_api(server)
+    yield server.test_client()
+    datasets.clear_datasets()
+
+
+def test_several_countries(client, countries):
+    response = client.get(f"/api/v1/radar?country={countries[1]}&country={countries[0]}")
+    assert response.status_code == 200
+    payload = response.get_json()
+    assert list(payload["countries"]) == [countries[1], countries[0]]
+    df = datasets.get_dataset("Test")
+    assert payload["countries"][countries[0]] == get_radar_country_values(df, countries[0])
+
+    metrics = client.get(f"/api/v1/metrics?country={countries[0]}&country={countries[2]}&metric=treatment_rate").get_json()
+    assert metrics["metrics"] == ["treatment_rate"]
+    assert set(metrics["countries"]) == {countries[0], countries[2]}
+    assert set(metrics["countries"][countries[0]]) == {"respondents", "treatment_rate"}
+
+
+def test_all_countries_by_default(client, countries):
+    assert list(client.get("/api/v1/butterfly").get_json()["countries"]) == countries
+
+
+def test_unknown_country_endpoint_and_metric(client, countries):
+    unknown_country = client.get(f"/api/v1/radar?country={countries[0]}&country=Atlantis")
+    assert unknown_country.status_code == 404
+    assert "Atlantis" in unknown_country.get_json()["error"]
+    assert client.get("/api/v1/unknown").status_code == 404
+    assert client.get("/api/v1/metrics?metric=unknown").status_code == 400
+    assert client.get("/api/v1/radar?dataset=Unknown").status_code == 404
+
+
+def test_etag_and_not_modified(client, countries):
+    response = client.get(f"/api/v1/stacked_bar?country={countries[0]}")
+    etag = response.headers["ETag"]
+
+    revalidated = client.get(f"/api/v1/stacked_bar?country={countries[0]}", headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.data == b""
+
+    other = client.get(f"/api/v1/stacked_bar?country={countries[1]}", headers={"If-None-Match": etag})
+    assert other.status_code == 200
+
+
+def test_response_cache_bounded(client, countries, monkeypatch):
+    monkeypatch.setattr(api, "RESPONSE_CACHE_SIZE", 3)
+    for country in countries[:5]:
+        client.get(f"/api/v1/radar?country={country}")
+
+    # Only the most recent queries are kept
+    assert len(api._responses) == 3
+    cached_countries = [dict(query)["country"] for _, _, query in api._responses]
+    assert cached_countries == [(country,) for country in countries[2:5]]
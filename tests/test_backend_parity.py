@@ -0,0 +1,116 @@
+"""
+The SQL backend must give exactly the results of the pandas path: cached
+results are shared across backends under the same dataset version (see
+sql_backend.open_sql_dataset()).
+
+Every aggregation is run on the cleaned dataframe and on the same CSV opened with
+MHV_BACKEND=sqlite (and duckdb, if installed) in a temporary MHV_SQL_DIR, with
+and without MHV_COMPRESS_DUPLICATES.
+"""
+import pytest
+
+from src import config
+from src.preprocessing import (
+    clean_and_convert_types, get_association_table, get_available_metrics, get_butterfly_data,
+    get_choropleth_data, get_choropleth_matrix, get_choropleth_table, get_countries,
+    get_country_chart_table, get_country_metric_value, get_group_counts, get_radar_data,
+    get_response_page, get_stacked_bar_data,
+)
+from src.sql_backend import open_sql_dataset
+
+
+@pytest.fixture(scope="module", params=[
+    ("sqlite", False), ("sqlite", True), ("duckdb", False), ("duckdb", True),
+], ids=["sqlite-rows", "sqlite-compressed", "duckdb-rows", "duckdb-compressed"])
+def backends(request, tmp_path_factory, data_path):
+    """(cleaned dataframe, SQLDataset) of data_path, deduplicated or not."""
+    engine, compress = request.param
+    if engine == "duckdb":
+        pytest.importorskip("duckdb")
+    patch = pytest.MonkeyPatch()
+    patch.setattr(config, "BACKEND", engine)
+    patch.setattr(config, "SQL_DIR", str(tmp_path_factory.mktemp("sql")))
+    try:
+        yield (clean_and_convert_types(filepath=data_path, compress=compress),
+               open_sql_dataset(data_path, compress=compress))
+    finally:
+        patch.undo()
+
+
+def selections(countries):
+    """Comparison selections: none, one, two, a country twice and several."""
+    return [(), (countries[0],), (None, countries[1]), countries[:2], (countries[2], countries[2]), countries[:6]]
+
+
+def records(rows):
+    """Rows of a page as plain values, missing values as None."""
+    return rows.astype(object).where(rows.notna(), None).to_dict('records')
+
+
+def test_countries(backends):
+    frame, dataset = backends
+    assert get_countries(frame) == get_countries(dataset)
+
+
+@pytest.mark.parametrize('metric', list(get_available_metrics()))
+def test_choropleth(backends, metric):
+    frame, dataset = backends
+    expected, actual = get_choropleth_data(frame, metric), get_choropleth_data(dataset, metric)
+    assert expected.values.tolist() == actual.values.tolist()
+
+    for country in [None, *get_countries(frame), 'Nowhere']:
+        assert get_country_metric_value(frame, country, metric) == get_country_metric_value(dataset, country, metric)
+
+
+def test_choropleth_table(backends):
+    frame, dataset = backends
+    assert get_choropleth_table(frame).values.tolist() == get_choropleth_table(dataset).values.tolist()
+    assert get_choropleth_matrix(frame) == get_choropleth_matrix(dataset)
+
+
+@pytest.mark.parametrize('get_data', [get_radar_data, get_butterfly_data, get_stacked_bar_data])
+def test_comparison_charts(backends, get_data):
+    frame, dataset = backends
+    for countries in selections(get_countries(frame)):
+        assert get_data(frame, *countries) == get_data(dataset, *countries), countries
+
+
+@pytest.mark.parametrize('chart', ['radar', 'butterfly', 'stacked_bar'])
+def test_country_chart_table(backends, chart):
+    frame, dataset = backends
+    assert get_country_chart_table(frame, chart).equals(get_country_chart_table(dataset, chart))
+
+
+def test_group_counts(backends):
+    frame, dataset = backends
+    columns = ('self_employed', 'Days_Indoors')
+    assert get_group_counts(frame, columns) == get_group_counts(dataset, columns)
+
+
+@pytest.mark.parametrize('sort_by, filters', [
+    ((), ()),
+    ([('Gender', True)], ()),
+    ([('Timestamp', False), ('Occupation', True)], ()),
+    ([('Days_Indoors', True)], [('treatment', '=', 'Yes')]),
+    ((), [('Occupation', 'contains', 'stud'), ('Timestamp', '>=', '2014-08-28')]),
+    ((), [('Timestamp', 'datestartswith', '2014-08-27'), ('Gender', '!=', 'Male')]),
+])
+def test_response_page(backends, sort_by, filters):
+    frame, dataset = backends
+    country = get_countries(frame)[0]
+    for page in (0, 1):
+        expected_rows, expected_total = get_response_page(frame, country, page, 25, sort_by, filters)
+        rows, total = get_response_page(dataset, country, page, 25, sort_by, filters)
+        assert total == expected_total
+        assert list(rows.columns) == list(expected_rows.columns)
+        assert records(rows) == records(expected_rows)
+
+
+@pytest.mark.parametrize('scope', [None, 0, 1])
+def test_association_table(backends, scope):
+    frame, dataset = backends
+    country = None if scope is None else get_countries(frame)[scope]
+    expected, actual = get_association_table(frame, country), get_association_table(dataset, country)
+    assert list(actual.columns) == list(expected.columns)
+    assert actual.astype(object).where(actual.notna(), None).values.tolist() == \
+        expected.astype(object).where(expected.notna(), None).values.tolist()
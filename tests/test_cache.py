@@ -0,0 +1,88 @@
+"""Two-tier memoisation (src/cache.py) with a shared SQLite tier."""
+import pandas as pd
+import pytest
+
+from src import cache, config
+from src.cache import cached, cached_figure, set_dataset_version
+from src.result_store import SQLiteStore
+
+calls = []
+
+
+@cached
+def count_rows(df, column):
+    calls.append(column)
+    return {"rows": len(df), "column": column}
+
+
+@cached_figure
+def create_table_figure(data):
+    calls.append("figure")
+    return {"data": [{"type": "table", "cells": {"values": [[data["rows"]]]}}], "layout": {}}
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """A shared SQLite tier for the test, with a known secret."""
+    store = SQLiteStore(tmp_path / "results.sqlite3", max_bytes=1024**2)
+    monkeypatch.setattr(config, "SHARED_CACHE", True)
+    monkeypatch.setattr(config, "SHARED_CACHE_SECRET", "test secret")
+    monkeypatch.setattr(cache, "_shared_store", store)
+    monkeypatch.setattr(cache, "_figure_cache", {})
+    calls.clear()
+    return store
+
+
+def versioned_frame():
+    """A new dataframe object marked with the same dataset version."""
+    df = pd.DataFrame({"Country": ["Canada", "France", "Canada"]})
+    set_dataset_version(df, "test-version")
+    return df
+
+
+def entries(store):
+    return [key for (key,) in store._connect().execute("SELECT key FROM entries")]
+
+
+def test_results_reused_through_shared_tier(store):
+    assert count_rows(versioned_frame(), "Country") == {"rows": 3, "column": "Country"}
+    # Another dataframe of the same version (e.g. in another worker) loads the stored result
+    assert count_rows(versioned_frame(), "Country") == {"rows": 3, "column": "Country"}
+    assert calls == ["Country"]
+
+
+def test_tampered_result_recomputed(store):
+    count_rows(versioned_frame(), "Country")
+    (key,) = entries(store)
+    signed = store.get(key)
+    store.set(key, signed[:-1] + bytes([signed[-1] ^ 1]))
+
+    assert count_rows(versioned_frame(), "Country") == {"rows": 3, "column": "Country"}
+    assert calls == ["Country", "Country"]
+    # The entry was overwritten with a valid one
+    assert cache._verified(store.get(key)) is not None
+
+
+def test_tampered_figure_rebuilt(store):
+    df = versioned_frame()
+    figure = create_table_figure(count_rows(df, "Country"))
+    (key,) = [key for key in entries(store) if key.startswith("create_table_figure:")]
+    store.set(key, b'{"data": [], "layout": {}}')
+    cache._figure_cache.clear()
+
+    assert create_table_figure(count_rows(df, "Country")) == figure
+    assert calls == ["Country", "figure", "figure"]
+
+
+def test_figure_keyed_by_result_origin(store):
+    df = versioned_frame()
+    data = count_rows(df, "Country")
+    create_table_figure(data)
+
+    # Keyed by the call that produced the data, not by its content
+    origin = cache.content_key(count_rows.__qualname__, cache.RESULTS_VERSION, "test-version", ("count_rows", ("Country",), ()))
+    assert cache._origin_key(data) == origin
+    assert cache.content_key("create_table_figure", cache.FIGURES_VERSION, (("result", origin),)) in cache._figure_cache
+
+    # An equal dict that no cached call returned is keyed by its content
+    assert cache._origin_key(dict(data)) is None
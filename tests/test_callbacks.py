@@ -0,0 +1,91 @@
+"""
+The heavy callbacks give the same figures as building them directly, with
+MHV_ASYNC_CALLBACKS off and on.
+
+The mode is fixed when src.app is imported, so each mode runs in its own process.
+"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Calls update_choropleth and update_secondary_graphs through the test client and
+# prints their responses next to the figures built without the callbacks
+SCRIPT = """
+import json
+from src.app import server
+from src.datasets import get_dataset
+from src.figures.choropleth import create_choropleth
+from src.preprocessing import get_choropleth_data, get_countries, get_radar_data, get_butterfly_data, get_stacked_bar_data
+from src.figures.radar import create_radar_chart
+from src.figures.butterfly import create_butterfly_chart
+from src.figures.stacked_bar import create_stacked_bar_chart
+
+client = server.test_client()
+dependencies = client.get("/_dash-dependencies").get_json()
+
+def call(marker, values):
+    dependency = next(d for d in dependencies if marker in d["output"]
+                      and {i["id"] for i in d["inputs"] + d["state"]} == set(values))
+    fill = lambda items: [dict(item, value=values.get(item["id"])) for item in items]
+    outputs = [dict(zip(("id", "property"), o.split("@")[0].rsplit(".", 1)))
+               for o in dependency["output"][2:-2].split("...")]
+    body = {"output": dependency["output"], "outputs": outputs, "inputs": fill(dependency["inputs"]),
+            "state": fill(dependency["state"]), "changedPropIds": [dependency["inputs"][0]["id"] + ".value"]}
+    response = client.post("/_dash-update-component", json=body)
+    assert response.status_code == 200, response.status_code
+    return response.get_json()["response"]
+
+df = get_dataset()
+countries = get_countries(df)
+selection = (countries[0], countries[1], [countries[2]])
+result = {
+    "choropleth": call("choropleth-matrix-store.data", {"dataset-dropdown": None, "choropleth-fallback-store": None,
+                                                      "metric-dropdown": "treatment_rate"}),
+    "secondary": call("secondary-approx.style", {"selected-ctry1-store": selection[0], "selected-ctry2-store": selection[1],
+                                                "compare-more-dropdown": selection[2], "dataset-dropdown": None}),
+    "expected": {
+        "choropleth": create_choropleth(get_choropleth_data(df, "treatment_rate"), "treatment_rate"),
+        "stacked-bar": create_stacked_bar_chart(get_stacked_bar_data(df, selection[0], selection[1], *selection[2])),
+        "butterfly": create_butterfly_chart(get_butterfly_data(df, selection[0], selection[1], *selection[2])),
+        "radar": create_radar_chart(get_radar_data(df, selection[0], selection[1], *selection[2])),
+    },
+}
+print(json.dumps(result))
+"""
+
+
+def run_callbacks(data_path, async_callbacks):
+    env = dict(
+        os.environ,
+        MHV_DATASETS=f"Test={data_path}",
+        MHV_ASYNC_CALLBACKS="1" if async_callbacks else "0",
+        MHV_PROGRESSIVE="0",
+        PYTHONPATH=os.pathsep.join(sys.path),
+    )
+    output = subprocess.run([sys.executable, "-c", SCRIPT], env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def assert_callbacks_match_figures(result):
+    expected = result["expected"]
+    assert result["choropleth"]["choropleth"]["figure"] == expected["choropleth"]
+    assert result["choropleth"]["sel-metric-store"]["data"] == "treatment_rate"
+    for graph_id in ("stacked-bar", "butterfly", "radar"):
+        assert result["secondary"][graph_id]["figure"] == expected[graph_id]
+
+
+def test_sync_callbacks(data_path):
+    assert_callbacks_match_figures(run_callbacks(data_path, async_callbacks=False))
+
+
+def test_async_callbacks_match_sync(data_path):
+    pytest.importorskip("asgiref")
+    result = run_callbacks(data_path, async_callbacks=True)
+    assert_callbacks_match_figures(result)
+
+    sync = run_callbacks(data_path, async_callbacks=False)
+    assert result["choropleth"] == sync["choropleth"]
+    assert result["secondary"] == sync["secondary"]
@@ -0,0 +1,39 @@
+"""
+Every aggregation gives the same result on the cleaned rows and on their
+deduplicated, weighted representation (preprocessing.compress_duplicates()).
+"""
+import pandas as pd
+import pytest
+
+from src.data_loader import read_source
+from src.preprocessing import (
+    analyze_data_quality, compress_duplicates, get_available_metrics, get_butterfly_data,
+    get_choropleth_data, get_radar_data, get_stacked_bar_data,
+)
+
+
+@pytest.fixture(scope="module")
+def compressed(df):
+    frame = compress_duplicates(df)
+    assert len(frame) < len(df)
+    return frame
+
+
+@pytest.mark.parametrize('metric', list(get_available_metrics()))
+def test_choropleth(df, compressed, metric):
+    pd.testing.assert_frame_equal(get_choropleth_data(df, metric), get_choropleth_data(compressed, metric))
+
+
+@pytest.mark.parametrize('get_data', [get_radar_data, get_butterfly_data, get_stacked_bar_data])
+def test_comparison_charts(df, compressed, countries, get_data):
+    for selection in [(), (countries[0],), countries[:2], countries[:5]]:
+        assert get_data(df, *selection) == get_data(compressed, *selection), selection
+
+
+def test_quality_report_of_cleaned_rows(df, compressed):
+    assert analyze_data_quality(df) == analyze_data_quality(compressed)
+
+
+def test_quality_report_of_raw_rows(data_path):
+    raw = read_source(data_path)
+    assert analyze_data_quality(raw) == analyze_data_quality(compress_duplicates(raw))
@@ -0,0 +1,28 @@
+"""Access control of the /_debug/ endpoints (src/debug.py)."""
+import flask
+
+from src import config
+from src.debug import add_debug_route
+
+
+def make_server():
+    server = flask.Flask(__name__)
+    registered = add_debug_route(server, "/_debug/test", "debug_test", lambda: flask.jsonify(ok=True))
+    return server, registered
+
+
+def test_not_registered_without_token(monkeypatch):
+    monkeypatch.setattr(config, "DEBUG_TOKEN", "")
+    server, registered = make_server()
+    assert not registered
+    assert server.test_client().get("/_debug/test").status_code == 404
+
+
+def test_requires_token_header(monkeypatch):
+    monkeypatch.setattr(config, "DEBUG_TOKEN", "secret")
+    server, registered = make_server()
+    client = server.test_client()
+    assert registered
+    assert client.get("/_debug/test").status_code == 404
+    assert client.get("/_debug/test", headers={"X-Debug-Token": "wrong"}).status_code == 404
+    assert client.get("/_debug/test", headers={"X-Debug-Token": "secret"}).get_json() == {"ok": True}
@@ -0,0 +1,84 @@
+"""Drill-down table: filter queries (src/drilldown.py) and response pages (preprocessing.get_response_page())."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.drilldown import parse_filter_query
+from src.preprocessing import TIMESTAMP_FORMAT, get_response_page
+
+COLUMNS = ['Timestamp', 'Gender', 'Occupation']
+
+
+@pytest.mark.parametrize("operator, expected", [
+    ('=', '='), ('eq', '='), ('s=', '='), ('i=', '='),
+    ('!=', '!='), ('ne', '!='),
+    ('<', '<'), ('lt', '<'),
+    ('<=', '<='), ('le', '<='),
+    ('>', '>'), ('gt', '>'),
+    ('>=', '>='), ('ge', '>='),
+    ('contains', 'contains'), ('scontains', 'contains'), ('icontains', 'contains'),
+    ('datestartswith', 'datestartswith'),
+])
+def test_operators(operator, expected):
+    assert parse_filter_query(f'{{Gender}} {operator} Female', COLUMNS) == [('Gender', expected, 'Female')]
+
+
+def test_several_terms_and_quoted_values():
+    query = '{Gender} s= "Female" && {Occupation} icontains \'stud\' && {Timestamp} >= `2014-08-01`'
+    assert parse_filter_query(query, COLUMNS) == [
+        ('Gender', '=', 'Female'), ('Occupation', 'contains', 'stud'), ('Timestamp', '>=', '2014-08-01'),
+    ]
+    assert parse_filter_query('{Occupation} contains "say \\"hi\\""', COLUMNS) == [('Occupation', 'contains', 'say "hi"')]
+
+
+@pytest.mark.parametrize("query", [
+    None,
+    '',
+    'Gender = Female',
+    '{Gender} Female',
+    '{Gender} =',
+    '{Gender} like Female',
+    '{Country} = Canada',
+])
+def test_malformed_terms_ignored(query):
+    assert parse_filter_query(query, COLUMNS) == []
+
+
+def test_malformed_term_skipped_among_valid_ones():
+    assert parse_filter_query('{Gender} like x && {Gender} = Male', COLUMNS) == [('Gender', '=', 'Male')]
+
+
+def expected_page(df, country, page, page_size, sort_by):
+    """The page as sorted by pandas on the values (stable, so ties keep row order)."""
+    rows = df[(df['Country'] == country).to_numpy()]
+    keys = pd.DataFrame({column: rows[column].astype(object) for column, _ in sort_by})
+    order = keys.sort_values([column for column, _ in sort_by],
+                             ascending=[ascending for _, ascending in sort_by], kind='stable').index
+    page_rows = rows.loc[order].iloc[page * page_size:(page + 1) * page_size].copy()
+    page_rows['Timestamp'] = page_rows['Timestamp'].dt.strftime(TIMESTAMP_FORMAT)
+    return page_rows.reset_index(drop=True)
+
+
+@pytest.mark.parametrize("sort_by", [
+    [('Gender', False), ('Timestamp', True)],
+    [('Occupation', True), ('Timestamp', False)],
+])
+def test_multi_column_sort(df, countries, sort_by):
+    country = countries[len(countries) // 2]
+    for column, _ in sort_by:
+        assert df[column].notna().all()
+
+    total = int((df['Country'] == country).sum())
+    for page in (0, 1):
+        rows, count = get_response_page(df, country, page, 25, sort_by)
+        assert count == total
+        pd.testing.assert_frame_equal(rows, expected_page(df, country, page, 25, sort_by))
+
+
+def test_filtered_page(df, countries):
+    country = countries[0]
+    rows, total = get_response_page(df, country, 0, 1000, [('Timestamp', True)], [('Gender', '=', 'Female')])
+    assert total == int(((df['Country'] == country) & (df['Gender'] == 'Female')).sum())
+    assert (rows['Gender'] == 'Female').all()
+    assert list(rows['Timestamp']) == sorted(rows['Timestamp'])
+    assert np.all(rows['Country'] == country)
@@ -0,0 +1,59 @@
+"""Download endpoints (src/export.py): validators, ranges and unknown countries."""
+import flask
+import pytest
+
+from src import config, datasets, export
+from src.export import init_exports
+
+
+@pytest.fixture
+def client(data_path, monkeypatch):
+    """Test client of a server with the exports, on the test dataset only."""
+    monkeypatch.setattr(config, "DATASETS", {"Test": data_path})
+    monkeypatch.setattr(config, "EXPORTS", True)
+    monkeypatch.setattr(export, "_lengths", {})
+    datasets.clear_datasets()
+    server = flask.Flask(__name__)
+    init_exports(server)
+    yield server.test_client()
+    datasets.clear_datasets()
+
+
+def test_etag_and_not_modified(client):
+    response = client.get("/export/choropleth.csv")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    revalidated = client.get("/export/choropleth.csv", headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.data == b""
+
+
+def test_single_range(client):
+    full = client.get("/export/choropleth.csv").data
+
+    response = client.get("/export/choropleth.csv", headers={"Range": "bytes=10-99"})
+    assert response.status_code == 206
+    assert response.headers["Content-Range"] == f"bytes 10-99/{len(full)}"
+    assert response.data == full[10:100]
+
+
+def test_range_before_length_is_known(client):
+    # No complete download yet: the whole file, not a discarded serialization pass
+    response = client.get("/export/choropleth.csv", headers={"Range": "bytes=10-99"})
+    assert response.status_code == 200
+    assert "Content-Range" not in response.headers
+    assert response.data == client.get("/export/choropleth.csv").data
+
+
+def test_if_range_mismatch_sends_whole_file(client):
+    full = client.get("/export/choropleth.csv").data
+
+    response = client.get("/export/choropleth.csv", headers={"Range": "bytes=10-99", "If-Range": '"outdated"'})
+    assert response.status_code == 200
+    assert response.data == full
+
+
+def test_unknown_country(client, countries):
+    assert client.get(f"/export/radar.csv?country={countries[0]}").status_code == 200
+    assert client.get(f"/export/radar.csv?country={countries[0]}&country=Atlantis").status_code == 404
@@ -0,0 +1,88 @@
+"""
+The fast figure path (MHV_FAST_FIGURES=1, the default) must produce exactly the
+figures of the plotly.py builders.
+
+Each fill_* function copies a skeleton that was built once per structure and
+only overwrites the data. A theme or layout change that is not mirrored in the
+fill_* functions therefore shows up here as a difference. Skeletons are primed
+with different data than the figure compared, so the test never compares a
+skeleton with itself.
+"""
+import json
+
+import pytest
+
+from src.figures import skeleton
+from src.figures.association import build_association_heatmap, fill_association_heatmap
+from src.figures.butterfly import build_butterfly_chart, fill_butterfly_chart
+from src.figures.choropleth import build_choropleth, fill_choropleth
+from src.figures.radar import build_radar_chart, fill_radar_chart
+from src.figures.stacked_bar import build_stacked_bar_chart, fill_stacked_bar_chart
+from src.preprocessing import (
+    get_association_table, get_available_metrics, get_butterfly_data, get_choropleth_data,
+    get_radar_data, get_stacked_bar_data,
+)
+
+# Comparison charts: data function, plotly.py builder, fast path
+COMPARISON_CHARTS = {
+    'radar': (get_radar_data, build_radar_chart, fill_radar_chart),
+    'butterfly': (get_butterfly_data, build_butterfly_chart, fill_butterfly_chart),
+    'stacked_bar': (get_stacked_bar_data, build_stacked_bar_chart, fill_stacked_bar_chart),
+}
+
+
+@pytest.fixture(autouse=True)
+def fresh_skeletons():
+    """Start every test without skeletons built by an earlier one."""
+    skeleton._skeletons.clear()
+    yield
+    skeleton._skeletons.clear()
+
+
+def assert_same_figure(build, fill, *args):
+    expected = json.loads(build(*args).to_json())
+    # Round-trip the fast path too: it may hold tuples where the JSON has lists
+    assert json.loads(json.dumps(fill(*args))) == expected
+
+
+# Selections as positions in the sorted countries (None: no country selected):
+# (selection priming the skeleton, selection compared), for 0/1/2/N countries
+SELECTIONS = {
+    'none': ((), ()),
+    'one': ((0,), (1,)),
+    'two': ((0, 1), (2, 3)),
+    'same country twice': ((0, 0), (1, 1)),
+    'first empty': ((None, 0), (None, 1)),
+    'many': ((0, 1, 2), (2, 3, 4)),
+    'many with repeat': ((0, 1, 0), (2, 3, 2)),
+    'ten': (tuple(range(10)), tuple(range(10, 20))),
+}
+
+
+@pytest.mark.parametrize('chart', COMPARISON_CHARTS)
+@pytest.mark.parametrize('case', SELECTIONS)
+def test_comparison_chart_parity(df, countries, chart, case):
+    get_data, build, fill = COMPARISON_CHARTS[chart]
+    primer, selection = (
+        [None if i is None else countries[i] for i in positions] for positions in SELECTIONS[case]
+    )
+
+    fill(get_data(df, *primer))
+    assert_same_figure(build, fill, get_data(df, *selection))
+
+
+@pytest.mark.parametrize('metric', list(get_available_metrics()))
+def test_choropleth_parity(df, metric):
+    # Prime with another metric, so that only the filled data can make them equal
+    other = next(name for name in get_available_metrics() if name != metric)
+    fill_choropleth(get_choropleth_data(df, other), other)
+
+    assert_same_figure(build_choropleth, fill_choropleth, get_choropleth_data(df, metric), metric)
+
+
+def test_association_heatmap_parity(df, countries):
+    fill_association_heatmap(get_association_table(df), "All countries")
+
+    for country in countries[:3]:
+        assert_same_figure(build_association_heatmap, fill_association_heatmap,
+                           get_association_table(df, country), country)
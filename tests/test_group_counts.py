@@ -0,0 +1,21 @@
+"""Grouped counts behind the comparison charts (preprocessing.get_group_counts())."""
+import numpy as np
+
+from src.preprocessing import get_group_counts
+
+COLUMNS = ('self_employed', 'Days_Indoors')
+
+
+def test_all_respondents_counted_once(df):
+    counts = get_group_counts(df, COLUMNS)
+    assert sum(counts[None].values()) == len(df)
+
+
+def test_rows_without_country(df):
+    frame = df.copy()
+    frame.loc[frame.index[:500], 'Country'] = np.nan
+    counts = get_group_counts(frame, COLUMNS)
+
+    # Counted once among all respondents, and under no country
+    assert sum(counts[None].values()) == len(frame)
+    assert sum(sum(country.values()) for name, country in counts.items() if name is not None) == len(frame) - 500
@@ -0,0 +1,59 @@
+"""
+/_dash-layout is served pre-serialized with an ETag, per version of the default dataset.
+
+The default dataset is fixed when src.app is imported, so the app runs in its own process.
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+# Fetches the layout, revalidates it, then drops a country from the CSV and fetches
+# it again once the hot reload check has swapped in the new version
+SCRIPT = """
+import json, sys
+from src.app import server
+from src.datasets import reload_changed
+
+client = server.test_client()
+first = client.get("/_dash-layout")
+revalidated = client.get("/_dash-layout", headers={"If-None-Match": first.headers["ETag"]})
+
+path, country = sys.argv[1], sys.argv[2]
+with open(path) as f:
+    lines = f.readlines()
+with open(path, "w") as f:
+    f.writelines(line for line in lines if f",{country}," not in line)
+reloaded = reload_changed() + reload_changed()
+changed = client.get("/_dash-layout", headers={"If-None-Match": first.headers["ETag"]})
+
+print(json.dumps({
+    "first": [first.status_code, first.headers["ETag"], first.get_data(as_text=True)],
+    "revalidated": [revalidated.status_code, revalidated.get_data(as_text=True)],
+    "reloaded": reloaded,
+    "changed": [changed.status_code, changed.headers.get("ETag"), changed.get_data(as_text=True)],
+}))
+"""
+
+
+def test_layout_etag_follows_dataset_version(tmp_path, data_path, countries):
+    path = tmp_path / "survey.csv"
+    shutil.copy(data_path, path)
+    dropped = countries[0]
+    env = dict(os.environ, MHV_DATASETS=f"Test={path}", PYTHONPATH=os.pathsep.join(sys.path))
+    output = subprocess.run(
+        [sys.executable, "-c", SCRIPT, str(path), dropped], env=env, capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(output.splitlines()[-1])
+
+    status, etag, body = result["first"]
+    assert status == 200
+    assert f'"{dropped}"' in body
+    assert result["revalidated"] == [304, ""]
+
+    assert result["reloaded"] == ["Test"]
+    status, new_etag, new_body = result["changed"]
+    assert status == 200
+    assert new_etag != etag
+    assert f'"{dropped}"' not in new_body
@@ -0,0 +1,62 @@
+"""Speculative prefetch of comparison charts (src/prefetch.py)."""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src import config, prefetch
+from src.cache import is_cached
+from src.preprocessing import get_radar_country_values
+
+
+@pytest.fixture
+def executor(monkeypatch):
+    """A one-thread prefetch pool, kept busy until the returned event is set."""
+    pool = ThreadPoolExecutor(max_workers=1)
+    release = threading.Event()
+    pool.submit(release.wait)
+    monkeypatch.setattr(prefetch, "_executor", pool)
+    monkeypatch.setattr(prefetch, "_pending", prefetch.deque())
+    monkeypatch.setattr(prefetch, "_pending_by_slot", {})
+    monkeypatch.setattr(config, "PREFETCH", True)
+    monkeypatch.setattr(config, "PREFETCH_TOP_N", 3)
+    monkeypatch.setattr(config, "PREFETCH_QUEUE", 20)
+    yield release
+    release.set()
+    pool.shutdown()
+
+
+def test_new_selection_cancels_previous_builds_of_slot(df, countries, executor):
+    prefetch.prefetch_after_selection(df, countries[0], slot=1)
+    first = prefetch._pending_by_slot[1]
+    prefetch.prefetch_after_selection(df, countries[1], slot=2)
+    other_slot = prefetch._pending_by_slot[2]
+    prefetch.prefetch_after_selection(df, countries[2], slot=1, more_countries=[countries[3]])
+
+    assert len(first) == 3
+    assert all(future.cancelled() for future in first)
+    assert not any(future.cancelled() for future in other_slot + prefetch._pending_by_slot[1])
+
+
+def test_builds_full_comparisons(df, countries, executor, monkeypatch):
+    built = []
+    monkeypatch.setattr(prefetch, "_build_comparison", lambda df, countries: built.append(countries))
+    prefetch.prefetch_after_selection(df, countries[0], slot=2, more_countries=[countries[5]])
+    executor.set()
+    for future in prefetch._pending_by_slot[2]:
+        future.result()
+
+    assert len(built) == 3
+    for comparison in built:
+        assert comparison[1:] == (countries[0], countries[5])
+        assert comparison[0] != countries[0]
+
+
+@pytest.mark.parametrize("load, built", [(64.0, False), (0.0, True)])
+def test_cpu_budget(df, countries, monkeypatch, load, built):
+    monkeypatch.setattr(prefetch.os, "getloadavg", lambda: (load, load, load))
+    monkeypatch.setattr(prefetch, "get_cpu_count", lambda: 4)
+    frame = df.copy()
+
+    prefetch._build_comparison(frame, (countries[0], countries[1]))
+    assert is_cached(get_radar_country_values, frame, countries[0]) is built
@@ -0,0 +1,38 @@
+"""Shared result stores (src/result_store.py)."""
+from src.result_store import SQLiteStore
+
+
+def test_sqlite_evicts_least_recently_used(tmp_path):
+    store = SQLiteStore(tmp_path / "results.sqlite3", max_bytes=1000)
+    for i in range(10):
+        store.set(f"key{i}", bytes(100))
+    store._connect().execute("UPDATE entries SET accessed = 0 WHERE key IN ('key0', 'key1')")
+
+    # Over the bound: the two least recently used entries go, back under 90%
+    store.set("key10", bytes(100))
+    assert store.get("key0") is None
+    assert store.get("key1") is None
+    assert all(store.get(f"key{i}") == bytes(100) for i in range(2, 11))
+    assert store.size() == 900
+
+
+def test_sqlite_size_follows_replacements_and_clear(tmp_path):
+    store = SQLiteStore(tmp_path / "results.sqlite3", max_bytes=10_000)
+    store.set("a", bytes(300))
+    store.set("b", bytes(200))
+    store.set("a", bytes(50))
+    assert store.size() == 250
+
+    store.clear()
+    assert store.size() == 0
+    assert store.get("b") is None
+
+
+def test_sqlite_shared_between_instances(tmp_path):
+    path = tmp_path / "results.sqlite3"
+    writer = SQLiteStore(path, max_bytes=10_000)
+    reader = SQLiteStore(path, max_bytes=10_000)
+
+    writer.set("key", b"value")
+    assert reader.get("key") == b"value"
+    assert reader.size() == len(b"value")
@@ -0,0 +1,64 @@
+"""Coalescing of concurrent identical calls (src/singleflight.py)."""
+import threading
+import time
+
+import pytest
+
+from src.singleflight import SingleFlight
+
+THREADS = 8
+
+
+def run_concurrently(flight, fn):
+    """Call flight.do("key", fn) from THREADS threads at once; return their results or exceptions."""
+    barrier = threading.Barrier(THREADS)
+    outcomes = [None] * THREADS
+
+    def call(i):
+        barrier.wait()
+        try:
+            outcomes[i] = flight.do("key", fn)
+        except Exception as e:
+            outcomes[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+
+def test_concurrent_calls_share_one_result():
+    flight = SingleFlight()
+    runs = []
+
+    def compute():
+        runs.append(1)
+        time.sleep(0.2)
+        return object()
+
+    outcomes = run_concurrently(flight, compute)
+    assert len(runs) == 1
+    assert all(outcome is outcomes[0] for outcome in outcomes)
+    assert flight.in_flight() == 0
+
+
+def test_concurrent_calls_share_the_exception():
+    flight = SingleFlight()
+    runs = []
+
+    def fail():
+        runs.append(1)
+        time.sleep(0.2)
+        raise ValueError("failed once")
+
+    outcomes = run_concurrently(flight, fail)
+    assert len(runs) == 1
+    assert all(isinstance(outcome, ValueError) for outcome in outcomes)
+    assert all(outcome is outcomes[0] for outcome in outcomes)
+
+    # Nothing is remembered: the next call runs again
+    with pytest.raises(ValueError):
+        flight.do("key", fail)
+    assert len(runs) == 2
@@ -0,0 +1,83 @@
+"""Dataset versions (data_loader.get_content_version()) and hot reload (datasets.reload_changed())."""
+import os
+import shutil
+
+import pytest
+
+from src import config, data_loader, datasets
+from src.cache import get_dataset_version
+from src.data_loader import get_content_version, get_source_fingerprint
+
+
+@pytest.fixture
+def csv_path(tmp_path, data_path):
+    path = tmp_path / "survey.csv"
+    shutil.copy(data_path, path)
+    return path
+
+
+@pytest.fixture
+def registry(csv_path, monkeypatch):
+    """A registry with the copied CSV as its only dataset."""
+    monkeypatch.setattr(config, "DATASETS", {"Test": str(csv_path)})
+    monkeypatch.setattr(datasets, "_changes", {})
+    datasets.clear_datasets()
+    yield
+    datasets.clear_datasets()
+
+
+def touch(path):
+    """Move the file's modification time forward without changing its content."""
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+def drop_country(path, country):
+    with open(path) as f:
+        lines = f.readlines()
+    with open(path, "w") as f:
+        f.writelines(line for line in lines if f",{country}," not in line)
+    touch(path)
+
+
+def test_touch_keeps_version(csv_path):
+    version, fingerprint = get_content_version(csv_path), get_source_fingerprint(csv_path)
+    touch(csv_path)
+    assert get_source_fingerprint(csv_path) != fingerprint
+    assert get_content_version(csv_path) == version
+
+
+def test_content_change_changes_version(csv_path, countries):
+    version = get_content_version(csv_path)
+    drop_country(csv_path, countries[0])
+    assert get_content_version(csv_path) != version
+
+
+def test_cleaning_version_bump_changes_version(csv_path, monkeypatch):
+    version = get_content_version(csv_path)
+    monkeypatch.setattr(data_loader, "CLEANING_VERSION", data_loader.CLEANING_VERSION + "-next")
+    assert get_content_version(csv_path) != version
+
+
+def test_reload_after_two_stable_checks(csv_path, registry, countries):
+    df = datasets.get_dataset("Test")
+    drop_country(csv_path, countries[0])
+
+    # The first check only notes the change, in case the file is still being written
+    assert datasets.reload_changed() == []
+    assert datasets.get_dataset("Test") is df
+
+    assert datasets.reload_changed() == ["Test"]
+    reloaded = datasets.get_dataset("Test")
+    assert reloaded is not df
+    assert countries[0] not in set(reloaded["Country"])
+    assert get_dataset_version(reloaded) == get_content_version(csv_path) != get_dataset_version(df)
+
+
+def test_touched_file_not_reloaded(csv_path, registry):
+    df = datasets.get_dataset("Test")
+    touch(csv_path)
+
+    assert datasets.reload_changed() == []
+    assert datasets.reload_changed() == []
+    assert datasets.get_dataset("Test") is df